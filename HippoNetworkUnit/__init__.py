@@ -1,9 +1,20 @@
 # HippoNetworkUnit
 
-from . import capabilities
+# The subpackages (capabilities, tests, scores) are imported the first time they are accessed,
+# so that "import HippoNetworkUnit" does not load sciunit, matplotlib, seaborn, pandas or scipy
 
-from . import tests
+import importlib
 
-from . import scores
+__version__ = '0.1.dev'
 
+__all__ = ['capabilities', 'tests', 'scores']
 
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
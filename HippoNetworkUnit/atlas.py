@@ -0,0 +1,205 @@
+# Voxel atlases of CA1, memory-mapped
+
+"""
+A voxel atlas of CA1 is a volume of integer labels (the region or layer of each voxel) and,
+for each m-type, volumes of densities (e.g. of boutons) over the same voxels. These volumes can
+be several GB, so they are memory-mapped from their files (see open_volume) instead of read:
+NumPy (.npy), NRRD (.nrrd, or .nhdr with a detached raw data file; raw encoding only) and raw
+files (given their shape and dtype).
+
+VoxelAtlas reduces them by blocks of slices (so that only one block is in memory at any time)
+with one weighted bincount per block: the sum of a density over the voxels of each layer, its
+fractions in each layer, and the dictionaries of observations or predictions taken by the tests
+(see format_data of the tests and get_CA1_laminar_distribution_synapses_info).
+
+Example:
+    atlas = VoxelAtlas('ca1_labels.nrrd', {1: 'SO', 2: 'SP', 3: 'SR', 4: 'SLM'})
+    prediction = atlas.laminar_distribution(dict((mtype, 'density_%s.nrrd' % mtype) for mtype in MTYPES))
+    model = CA1_laminar_distribution_synapses(name='atlas', CA1_laminar_distribution_synapses_model=prediction)
+"""
+
+import os
+
+import numpy as np
+
+from HippoNetworkUnit.table import LaminarDistributionTable, LAYERS, OUT
+
+# number of voxels reduced at once (bounds the temporary arrays)
+BLOCK_SIZE = 2**24
+
+# largest label of an atlas reduced with a lookup table of the labels
+MAX_LOOKUP = 2**24
+
+# NRRD types and their NumPy dtypes
+NRRD_TYPES = {
+    'signed char': 'i1', 'int8': 'i1', 'int8_t': 'i1',
+    'uchar': 'u1', 'unsigned char': 'u1', 'uint8': 'u1', 'uint8_t': 'u1',
+    'short': 'i2', 'short int': 'i2', 'signed short': 'i2', 'signed short int': 'i2', 'int16': 'i2', 'int16_t': 'i2',
+    'ushort': 'u2', 'unsigned short': 'u2', 'unsigned short int': 'u2', 'uint16': 'u2', 'uint16_t': 'u2',
+    'int': 'i4', 'signed int': 'i4', 'int32': 'i4', 'int32_t': 'i4',
+    'uint': 'u4', 'unsigned int': 'u4', 'uint32': 'u4', 'uint32_t': 'u4',
+    'longlong': 'i8', 'long long': 'i8', 'long long int': 'i8', 'signed long long': 'i8',
+    'signed long long int': 'i8', 'int64': 'i8', 'int64_t': 'i8',
+    'ulonglong': 'u8', 'unsigned long long': 'u8', 'unsigned long long int': 'u8', 'uint64': 'u8', 'uint64_t': 'u8',
+    'float': 'f4', 'double': 'f8',
+}
+
+
+def _read_nrrd_header(path):
+    """ (fields of the header of a NRRD file, offset of its data) """
+
+    fields = dict()
+    with open(path, 'rb') as file_:
+        magic = file_.readline()
+        if not magic.startswith(b'NRRD'):
+            raise ValueError("%s is not a NRRD file" % path)
+        for line in file_:
+            line = line.decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            if line.startswith('#') or ':=' in line:
+                continue
+            key, _, value = line.partition(':')
+            fields[key.strip().lower()] = value.strip()
+        offset = file_.tell()
+    return fields, offset
+
+
+def _open_nrrd(path):
+    fields, offset = _read_nrrd_header(path)
+    try:
+        dtype = np.dtype(NRRD_TYPES[fields['type'].lower()])
+        shape = tuple(int(size) for size in fields['sizes'].split())[::-1]  # NRRD lists the fastest axis first
+    except KeyError as error:
+        raise ValueError("Unsupported or missing NRRD field in %s: %s" % (path, error))
+    if fields.get('encoding', 'raw').lower() != 'raw':
+        raise ValueError("%s is not memory-mappable: only the raw NRRD encoding is supported, not '%s'"
+                         % (path, fields['encoding']))
+    if dtype.itemsize > 1:
+        dtype = dtype.newbyteorder('>' if fields.get('endian', 'little').lower() == 'big' else '<')
+
+    data_file = fields.get('data file', fields.get('datafile'))
+    if data_file is not None:
+        path = os.path.join(os.path.dirname(path), data_file)
+        offset = 0
+    byte_skip = int(fields.get('byte skip', fields.get('byteskip', 0)))
+    if byte_skip == -1:
+        # the data are at the end of the file
+        offset = os.path.getsize(path) - int(np.prod(shape)) * dtype.itemsize
+    else:
+        offset += byte_skip
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+
+def open_volume(path, shape=None, dtype=None, offset=0):
+    """
+    Memory-mapped (read-only) volume of the file `path`: .npy, .nrrd or .nhdr, or raw data of the
+    given `shape` (C order) and `dtype` starting at byte `offset`. Arrays are returned as they are.
+    """
+
+    if isinstance(path, np.ndarray):
+        return path
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        return np.load(path, mmap_mode='r')
+    if extension in ('.nrrd', '.nhdr'):
+        return _open_nrrd(path)
+    if shape is None or dtype is None:
+        raise ValueError("The shape and dtype of the raw volume %s must be given" % path)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=tuple(shape))
+
+
+class VoxelAtlas(object):
+    """
+    Atlas of the volume of labels `labels` (file or array), whose voxels are in the layers given by
+    `label_layers` {label: layer}. Voxels with other labels are OUT, if OUT is one of `layers`,
+    and are left out otherwise.
+    """
+
+    def __init__(self, labels, label_layers, layers=LAYERS, block_size=BLOCK_SIZE):
+        self.labels = open_volume(labels)
+        if self.labels.dtype.kind not in 'iu':
+            raise ValueError("The labels of an atlas must be integers, not %s" % self.labels.dtype)
+        self.layers = tuple(layers)
+        self.block_size = block_size
+        layer_index = dict((layer, j) for j, layer in enumerate(self.layers))
+        try:
+            label_codes = dict((int(label), layer_index[layer]) for label, layer in label_layers.items())
+        except KeyError as error:
+            raise ValueError("Unknown layer %s. Expected: %s" % (error, ", ".join(self.layers)))
+
+        # layer codes of the labels (len(layers) for the voxels left out): by a lookup table,
+        # unless the labels are too large for one
+        self._other = layer_index.get(OUT, len(self.layers))
+        self._labels = np.array(sorted(label_codes), dtype=np.int64)
+        self._label_codes = np.array([label_codes[label] for label in self._labels], dtype=np.intp)
+        self._lookup = None
+        if len(self._labels) and 0 <= self._labels[0] and self._labels[-1] < MAX_LOOKUP:
+            self._lookup = np.full(self._labels[-1] + 2, self._other, dtype=np.intp)
+            self._lookup[self._labels] = self._label_codes
+
+    def _blocks(self, volumes):
+        """ Blocks of slices (along the first axis) of the labels and of the given volumes """
+
+        n_slices = self.labels.shape[0]
+        step = max(1, self.block_size // max(1, int(np.prod(self.labels.shape[1:]))))
+        for start in range(0, n_slices, step):
+            yield self.labels[start:start + step], [volume[start:start + step] for volume in volumes]
+
+    def _codes(self, labels):
+        labels = np.asarray(labels).ravel()
+        if self._lookup is not None:
+            codes = self._lookup[np.clip(labels, 0, len(self._lookup) - 1)]
+            codes[labels < 0] = self._other
+            return codes
+        codes = np.full(len(labels), self._other, dtype=np.intp)
+        if len(self._labels):
+            positions = np.searchsorted(self._labels, labels).clip(0, len(self._labels) - 1)
+            found = self._labels[positions] == labels
+            codes[found] = self._label_codes[positions[found]]
+        return codes
+
+    def _sums(self, densities):
+        """ Sums (densities x layers) of the densities over the voxels of each layer, in one pass """
+
+        volumes = [open_volume(density) for density in densities]
+        for volume in volumes:
+            if volume.shape != self.labels.shape:
+                raise ValueError("The density volume has shape %s, not that of the labels %s"
+                                 % (volume.shape, self.labels.shape))
+        sums = np.zeros((max(len(volumes), 1), len(self.layers) + 1))
+        for labels, blocks in self._blocks(volumes):
+            codes = self._codes(labels)
+            if not volumes:
+                sums[0] += np.bincount(codes, minlength=len(self.layers) + 1)
+            for i, block in enumerate(blocks):
+                sums[i] += np.bincount(codes, weights=np.asarray(block, dtype=float).ravel(),
+                                       minlength=len(self.layers) + 1)
+        return sums[:, :len(self.layers)]
+
+    def layer_sums(self, density=None):
+        """
+        Sum of `density` (a volume or file with the shape of the labels) over the voxels of each
+        layer, or their number of voxels if density is None
+        """
+
+        return self._sums([] if density is None else [density])[0]
+
+    def layer_fractions(self, density=None):
+        """ Fractions of `density` (or of the voxels) in each layer """
+
+        sums = self.layer_sums(density)
+        return sums / sums.sum()
+
+    def laminar_distribution(self, densities, key='value'):
+        """
+        Dictionary {mtype: {layer: {key: fraction}}} of the densities {mtype: volume or file} of the
+        m-types, reduced in one pass over the atlas: use key 'value' for predictions, and 'mean'
+        for observations (with layers without OUT)
+        """
+
+        mtypes = list(densities)
+        sums = self._sums([densities[mtype] for mtype in mtypes])[:len(mtypes)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fractions = sums / sums.sum(axis=1, keepdims=True)
+        return LaminarDistributionTable(fractions, mtypes, self.layers).to_dict(key)
@@ -0,0 +1,272 @@
+# Content-addressed caches of HippoNetworkUnit
+
+"""
+ContentCache memoizes the result of a function of JSON-like data (nested dicts, lists, strings
+and numbers), such as the observation and prediction dictionaries formatted by the tests,
+under a stable hash of their content: calling it again with equal data (even a different
+object, e.g. re-read from the same JSON file) costs a hash and a dictionary lookup.
+
+The entries are kept in memory with least-recently-used eviction and, optionally, on disk
+(one pickle file per entry) so that they are shared by later runs and other processes.
+The on-disk tier is enabled by giving a directory, or through the environment variable
+HIPPONETWORKUNIT_CACHE_DIR for the default caches of the package.
+
+The cached values are shared by all the callers: the arrays they contain are made read-only.
+
+ResultStore is a persistent store of the results of the tests (scores, p-values, figures),
+an SQLite database of pickled values with a bounded total size: the least recently used
+entries are evicted first. SQLite serializes the writes, so a store can be shared by several
+threads and worker processes. Its default instance, `result_store`, is only created when
+HIPPONETWORKUNIT_CACHE_DIR is set.
+"""
+
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# environment variable with the directory of the on-disk tier of the default caches
+CACHE_DIR_VARIABLE = 'HIPPONETWORKUNIT_CACHE_DIR'
+
+# maximum number of formatted observations/predictions kept in memory
+FORMAT_CACHE_SIZE = 256
+
+# maximum total size (bytes) of the pickled results of the default result store
+RESULT_STORE_SIZE = 256 * 2**20
+
+# seconds between two updates of the access time of an entry of a result store
+ACCESS_RESOLUTION = 60.0
+
+
+def content_hash(data, *namespace):
+    """
+    Stable (across processes and runs) hex digest of JSON-like data. The order of the keys of
+    the dictionaries is part of the content, since the tests list the layers in that order.
+    `namespace` (strings) distinguishes the results of different functions of the same data.
+    """
+
+    digest = hashlib.sha1()
+    for part in namespace:
+        digest.update(str(part).encode('utf-8') + b'\0')
+    digest.update(json.dumps(data, default=repr, separators=(',', ':')).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _freeze(value):
+    """ Makes the arrays of a cached value read-only """
+
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _freeze(item)
+    return value
+
+
+class ContentCache(object):
+    """
+    LRU cache of at most `maxsize` values in memory, with an optional on-disk tier in `directory`
+    """
+
+    def __init__(self, maxsize=128, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # only the configuration is pickled (e.g. to send a test to worker processes)
+        return {'maxsize': self.maxsize, 'directory': self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state['maxsize'], state['directory'])
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pkl')
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as file_:
+                return pickle.load(file_)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _dump(self, key, value):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written to a temporary file and renamed, so readers never see partial entries
+            descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(descriptor, 'wb') as file_:
+                pickle.dump(value, file_, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)
+        except OSError:
+            pass
+
+    def get(self, key, default=None):
+        """ Value of `key` (in memory or on disk), or `default` """
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = self._load(key)
+        if value is None:
+            with self._lock:
+                self.misses += 1
+            return default
+        self._insert(key, _freeze(value))
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def _insert(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        """ Stores `value` (made read-only) under `key` """
+
+        _freeze(value)
+        self._insert(key, value)
+        self._dump(key, value)
+        return value
+
+    def get_or_compute(self, data, function, *namespace):
+        """
+        Returns function(data), computed only if no equal data (in the same namespace) has
+        been seen before
+        """
+
+        key = content_hash(data, *namespace)
+        value = self.get(key)
+        if value is None:
+            value = self.set(key, function(data))
+        return value
+
+    def clear(self):
+        """ Empties the memory tier (the on-disk entries are kept) """
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResultStore(object):
+    """
+    Persistent store of pickled results in the SQLite database `path`, holding at most
+    `max_bytes` of pickled values (least recently used entries are evicted first)
+    """
+
+    def __init__(self, path, max_bytes=RESULT_STORE_SIZE, timeout=60.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {'path': self.path, 'max_bytes': self.max_bytes, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_bytes'], state['timeout'])
+
+    def _connection(self):
+        """ Connection of the current thread and process (created the first time) """
+
+        if getattr(self._local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            try:
+                connection.execute('PRAGMA journal_mode=WAL')
+            except sqlite3.DatabaseError:
+                pass
+            connection.execute('CREATE TABLE IF NOT EXISTS results '
+                               '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return self._local.connection
+
+    def get(self, key, default=None):
+        """ Value of `key`, or `default` """
+
+        connection = self._connection()
+        row = connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        try:
+            value = pickle.loads(row[0])
+        except Exception:
+            # e.g. written by a version of the package whose classes no longer exist
+            return default
+        now = time.time()
+        connection.execute('UPDATE results SET accessed = ? WHERE key = ? AND accessed < ?',
+                           (now, key, now - ACCESS_RESOLUTION))
+        return value
+
+    def set(self, key, value):
+        """ Stores `value` under `key`, evicting the least recently used entries if needed """
+
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return value
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                               (key, sqlite3.Binary(blob), len(blob), time.time()))
+            total = connection.execute('SELECT TOTAL(size) FROM results').fetchone()[0]
+            if total > self.max_bytes:
+                evicted = []
+                for old_key, size in connection.execute('SELECT key, size FROM results ORDER BY accessed'):
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append((old_key,))
+                    total -= size
+                connection.executemany('DELETE FROM results WHERE key = ?', evicted)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return value
+
+    def clear(self):
+        """ Removes all the entries """
+
+        self._connection().execute('DELETE FROM results')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+
+def _default_directory(name):
+    directory = os.environ.get(CACHE_DIR_VARIABLE)
+    return os.path.join(directory, name) if directory else None
+
+
+format_cache = ContentCache(FORMAT_CACHE_SIZE, _default_directory('format'))
+
+result_store = (ResultStore(os.path.join(os.environ[CACHE_DIR_VARIABLE], 'results.sqlite'))
+                if os.environ.get(CACHE_DIR_VARIABLE) else None)
@@ -1,15 +1,31 @@
 # Loads Python classes for capabilities needed in HippoNetworkUnit
 
 # capabilities/
-# from . import cap_ProvidesCA1NeuritePathDistanceInfo
-# from . import cap_Provides_CA1_laminar_distribution_synapses_info
+import importlib
 
-from os.path import dirname, basename, isfile
-import glob
+from .. import registry
 
-files = glob.glob(dirname(__file__)+"/cap_*.py")
-modules = [ basename(f)[:-3] for f in files if isfile(f)]
+"""
+NOTE: Capabilities are listed in HippoNetworkUnit.registry (or registered by other packages
+through entry points) and their modules are only imported the first time they are accessed.
+"""
 
-for module in modules:
-    exec("from %s import *" % module)
 
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    try:
+        value = registry.resolve('capabilities', name)
+    except KeyError:
+        try:
+            return importlib.import_module('.' + name, __name__)
+        except ImportError as error:
+            if getattr(error, 'name', None) != __name__ + '.' + name:
+                raise
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(registry.names('capabilities')))
@@ -0,0 +1,30 @@
+import sciunit
+
+#==============================================================================
+
+class Provides_CA1_laminar_distribution_synapses_per_neuron_info(sciunit.Capability):
+    """
+    Indicates that the model returns structural information for each of its neurons, namely:
+    the number of synapses of each neuron, of the m-types (AA, BP, BS, CCKBC, Ivy, OLM, PC, PPA, SCA, Tri),
+    in each of the four layers of CA1 subregion of Hippocampus (SO, SP, SR, SLM) and what is OUT
+    """
+
+    def get_CA1_laminar_distribution_synapses_per_neuron_info(self):
+        """ Must return a dictionary of the form:
+        {
+        "counts": array (neurons x layers) with the number of synapses of each neuron in each layer,
+        "mtypes": array (neurons) with the m-type of each neuron ("AA", "BP", ..., or integer codes),
+        "mtype_names": names of the m-types, if "mtypes" holds integer codes (optional),
+        "layers": names of the layers, the columns of "counts" (optional, by default
+                  ("SO", "SP", "SR", "SLM", "OUT"))
+        }
+        """
+        raise NotImplementedError()
+
+    def get_CA1_laminar_distribution_synapses_per_neuron(self):
+        """ Returns the per-neuron synapses counts and m-types of the model, as a dictionary
+            (see get_CA1_laminar_distribution_synapses_per_neuron_info)
+        """
+        CA1_laminar_distribution_synapses_per_neuron_info = self.get_CA1_laminar_distribution_synapses_per_neuron_info()
+
+        return CA1_laminar_distribution_synapses_per_neuron_info
@@ -0,0 +1,359 @@
+# Native bar charts of the scores, written without matplotlib
+
+"""
+Writes the bar chart of the scores of the m-type cells (bars colored by rank with the 'Reds'
+palette, annotated with the p-values), as drawn by the tests with seaborn, directly as SVG or
+PNG from the data, without importing matplotlib: an order of magnitude faster and with a
+constant, small memory footprint, e.g. for sweeps over many models.
+
+SVG text is left to the viewer's sans-serif font; PNG text is drawn with a built-in 5x7 bitmap
+font. Several panels (e.g. one per score type) can be laid side by side in one chart.
+
+Heatmaps of the scores of many models (rows) and m-types (columns), e.g. to summarize a sweep
+in a single file, are written in the same way with write_heatmap.
+
+Example:
+    write_bar_chart('PearsonChiSquaredScore_plot.svg', [panel_from_dataframe(scores_cell_df)])
+"""
+
+import struct
+import zlib
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+FORMATS = ('svg', 'png')
+
+# colors of the 'Reds' colormap (ColorBrewer), interpolated as matplotlib does
+REDS = ('#fff5f0', '#fee0d2', '#fcbba1', '#fc9272', '#fb6a4a', '#ef3b2c', '#cb181d', '#a50f15', '#67000d')
+
+TEXT_COLOR = '#000000'
+
+# size (pixels at 100 dpi) of a panel
+PANEL_WIDTH, PANEL_HEIGHT = 640, 480
+
+# 5x7 bitmap font of the PNG charts: 7 rows of 5 bits (2 hex digits per row)
+GLYPH_WIDTH, GLYPH_HEIGHT = 5, 7
+FONT = {
+    '0': '0e11131519110e', '1': '040c040404040e', '2': '0e11010204081f', '3': '1f02040201110e',
+    '4': '02060a121f0202', '5': '1f101e0101110e', '6': '0608101e11110e', '7': '1f010204080808',
+    '8': '0e11110e11110e', '9': '0e11110f01020c', 'A': '0e1111111f1111', 'B': '1e11111e11111e',
+    'C': '0e11101010110e', 'D': '1c12111111121c', 'E': '1f10101e10101f', 'F': '1f10101e101010',
+    'G': '0e11101711110f', 'H': '1111111f111111', 'I': '0e04040404040e', 'J': '0702020202120c',
+    'K': '11121418141211', 'L': '1010101010101f', 'M': '111b1515111111', 'N': '11111915131111',
+    'O': '0e11111111110e', 'P': '1e11111e101010', 'Q': '0e11111115120d', 'R': '1e11111e141211',
+    'S': '0f10100e01011e', 'T': '1f040404040404', 'U': '1111111111110e', 'V': '11111111110a04',
+    'W': '1111111515150a', 'X': '11110a040a1111', 'Y': '1111110a040404', 'Z': '1f01020408101f',
+    'a': '00000e010f110f', 'b': '1010161911111e', 'c': '00000e1010110e', 'd': '01010d1311110f',
+    'e': '00000e111f100e', 'f': '0609081c080808', 'g': '000f11110f010e', 'h': '10101619111111',
+    'i': '04000c0404040e', 'j': '0200060202120c', 'k': '10101214181412', 'l': '0c04040404040e',
+    'm': '00001a15151111', 'n': '00001619111111', 'o': '00000e1111110e', 'p': '00001e111e1010',
+    'q': '00000d130f0101', 'r': '00001619101010', 's': '00000e100e011e', 't': '08081c08080906',
+    'u': '0000111111130d', 'v': '00001111110a04', 'w': '0000111115150a', 'x': '0000110a040a11',
+    'y': '000011110f010e', 'z': '00001f0204081f', '.': '00000000000c0c', ',': '000000000c0408',
+    ':': '000c0c000c0c00', '-': '0000001f000000', '+': '0004041f040400', '=': '00001f001f0000',
+    '_': '0000000000001f', '(': '02040808080402', ')': '08040202020408', '%': '18190204081303',
+    '/': '00010204081000', '?': '0e110102040004',}
+
+
+def _hex_to_rgb(color):
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def reds_palette(n):
+    """
+    n colors of the 'Reds' colormap, from light to dark, excluding its extremes
+    (as seaborn.color_palette('Reds', n))
+    """
+
+    anchors = np.array([_hex_to_rgb(color) for color in REDS], dtype=float)
+    positions = np.linspace(0, 1, n + 2)[1:-1] * (len(REDS) - 1)
+    rgb = np.array([np.interp(positions, np.arange(len(REDS)), anchors[:, i]) for i in range(3)]).T
+    return ['#%02x%02x%02x' % tuple(int(round(value)) for value in color) for color in rgb]
+
+
+def reds_colors(fractions):
+    """ Colors of the 'Reds' colormap at the given fractions (0 to 1; NaN gives light gray) """
+
+    anchors = np.array([_hex_to_rgb(color) for color in REDS], dtype=float)
+    fractions = np.asarray(fractions, dtype=float).ravel()
+    positions = np.clip(np.nan_to_num(fractions), 0, 1) * (len(REDS) - 1)
+    rgb = np.array([np.interp(positions, np.arange(len(REDS)), anchors[:, i]) for i in range(3)]).T
+    return ['#%02x%02x%02x' % tuple(int(round(value)) for value in color) if np.isfinite(fraction) else '#d9d9d9'
+            for color, fraction in zip(rgb, fractions)]
+
+
+def nice_ticks(vmin, vmax, n=5):
+    """ Round tick values (about n of them) covering [vmin, vmax] """
+
+    if not np.isfinite(vmax - vmin) or vmax <= vmin:
+        return [vmin] if np.isfinite(vmin) else [0.0]
+    raw = (vmax - vmin) / n
+    magnitude = 10 ** np.floor(np.log10(raw))
+    step = min(m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= raw)
+    start = np.ceil(vmin / step - 1e-9) * step
+    return [round(tick, 12) + 0.0 for tick in np.arange(start, vmax + step * 1e-9, step)]
+
+
+def _format_tick(value):
+    return '%.10g' % value
+
+
+def panel_from_dataframe(scores_cell_df):
+    """
+    Panel (labels, values, p-values or None, x label) of a DataFrame of scores of the tests,
+    indexed by m-type, with the score in its first column and optionally a 'p-value' column
+    """
+
+    score_label = scores_cell_df.columns[0]
+    pvalues = list(scores_cell_df['p-value']) if 'p-value' in scores_cell_df else None
+    return [str(label) for label in scores_cell_df.index], list(scores_cell_df[score_label]), pvalues, score_label
+
+
+class SVGCanvas(object):
+    """ Drawing primitives writing SVG elements """
+
+    def __init__(self, width, height, scale=1.0):
+        self.width, self.height = width, height
+        self.font_size = 12 * scale
+        self.char_width = 0.6 * self.font_size
+        self.text_height = self.font_size
+        self.elements = []
+
+    def rect(self, x, y, width, height, color):
+        self.elements.append('<rect x="%.2f" y="%.2f" width="%.2f" height="%.2f" fill="%s"/>'
+                             % (x, y, width, height, color))
+
+    def text(self, x, y, string, anchor='start', rotate=False):
+        """ Text vertically centered at y (horizontally, if rotated) """
+        transform = ' transform="rotate(-90 %.2f %.2f)"' % (x, y) if rotate else ''
+        self.elements.append('<text x="%.2f" y="%.2f" font-size="%.1f" text-anchor="%s" '
+                             'dominant-baseline="central"%s>%s</text>'
+                             % (x, y, self.font_size, anchor, transform, escape(string)))
+
+    def tobytes(self):
+        return ('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" viewBox="0 0 %d %d" '
+                'font-family="sans-serif" fill="%s">\n<rect width="100%%" height="100%%" fill="#ffffff"/>\n%s\n</svg>\n'
+                % (self.width, self.height, self.width, self.height, TEXT_COLOR,
+                   '\n'.join(self.elements))).encode('utf-8')
+
+
+class PNGCanvas(object):
+    """ Drawing primitives on an RGB array, written as PNG """
+
+    def __init__(self, width, height, scale=1.0):
+        self.width, self.height = int(round(width)), int(round(height))
+        self.pixels = np.full((self.height, self.width, 3), 255, dtype=np.uint8)
+        self.glyph_scale = max(1, int(round(2 * scale)))
+        self.char_width = (GLYPH_WIDTH + 1) * self.glyph_scale
+        self.text_height = GLYPH_HEIGHT * self.glyph_scale
+
+    def _fill(self, x0, y0, x1, y1, color, mask=None):
+        x0, y0, x1, y1 = int(round(x0)), int(round(y0)), int(round(x1)), int(round(y1))
+        cx0, cy0, cx1, cy1 = max(x0, 0), max(y0, 0), min(x1, self.width), min(y1, self.height)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return
+        region = self.pixels[cy0:cy1, cx0:cx1]
+        if mask is None:
+            region[...] = _hex_to_rgb(color)
+        else:
+            region[mask[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]] = _hex_to_rgb(color)
+
+    def rect(self, x, y, width, height, color):
+        # at least one pixel wide, as the (thin) axis lines and ticks
+        self._fill(x, y, x + max(width, 1), y + max(height, 1), color)
+
+    def _text_mask(self, string):
+        mask = np.zeros((GLYPH_HEIGHT, (GLYPH_WIDTH + 1) * len(string)), dtype=bool)
+        for i, char in enumerate(string):
+            rows = bytes.fromhex(FONT.get(char, FONT['?']) if char != ' ' else '00' * GLYPH_HEIGHT)
+            bits = np.unpackbits(np.frombuffer(rows, dtype=np.uint8)[:, np.newaxis], axis=1)[:, -GLYPH_WIDTH:]
+            mask[:, i * (GLYPH_WIDTH + 1):i * (GLYPH_WIDTH + 1) + GLYPH_WIDTH] = bits
+        return np.kron(mask, np.ones((self.glyph_scale, self.glyph_scale), dtype=bool))
+
+    def text(self, x, y, string, anchor='start', rotate=False):
+        """ Text vertically centered at y (horizontally, if rotated) """
+        mask = self._text_mask(string)
+        if rotate:
+            mask = np.rot90(mask)
+            height, width = mask.shape
+            offset = {'start': 0, 'middle': height / 2.0, 'end': height}[anchor]
+            x0, y0 = x - width / 2.0, y - height + offset
+        else:
+            height, width = mask.shape
+            offset = {'start': 0, 'middle': width / 2.0, 'end': width}[anchor]
+            x0, y0 = x - offset, y - height / 2.0
+        x0, y0 = int(round(x0)), int(round(y0))
+        self._fill(x0, y0, x0 + width, y0 + height, TEXT_COLOR, mask)
+
+    def tobytes(self):
+        def chunk(kind, data):
+            return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+        rows = np.concatenate([np.zeros((self.height, 1), dtype=np.uint8),
+                               self.pixels.reshape(self.height, -1)], axis=1)
+        return (b'\x89PNG\r\n\x1a\n'
+                + chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0))
+                + chunk(b'IDAT', zlib.compress(rows.tobytes(), 6))
+                + chunk(b'IEND', b''))
+
+
+def draw_bar_panel(canvas, left, top, width, height, labels, values, pvalues=None, xlabel='', ylabel='Cell',
+                   scale=1.0):
+    """
+    Draws a horizontal bar chart (one bar per label, colored by the rank of its value, and
+    annotated with the p-values if any) in the given box of the canvas
+    """
+
+    values = np.asarray(values, dtype=float)
+    finite = np.isfinite(values)
+    line = max(1.0, 0.8 * scale)
+    tick = 3.5 * scale
+    pad = 4 * scale
+
+    # margins: tick labels and y label on the left, tick labels and x label below, annotations on the right
+    annotation = 'p = 0.00'
+    margin_left = canvas.text_height + 2 * pad + tick + max(len(label) for label in labels) * canvas.char_width
+    margin_bottom = 2 * canvas.text_height + 3 * pad + tick
+    margin_right = (len(annotation) * canvas.char_width + pad) if pvalues is not None else 2 * pad
+    margin_top = 2 * pad
+    x0, y0 = left + margin_left, top + margin_top
+    plot_width, plot_height = width - margin_left - margin_right, height - margin_top - margin_bottom
+
+    vmin = min(0.0, values[finite].min()) if finite.any() else 0.0
+    vmax = max(0.0, values[finite].max()) if finite.any() else 1.0
+    span = (vmax - vmin) * 1.05 or 1.0
+    vmax = vmin + span
+    ticks = nice_ticks(vmin, vmax)
+
+    def x_of(value):
+        return x0 + (value - vmin) / span * plot_width
+
+    # bars, darker for larger values
+    colors = reds_palette(len(values))
+    rank = np.empty(len(values), dtype=int)
+    rank[np.argsort(np.where(finite, values, -np.inf), kind='stable')] = np.arange(len(values))
+    band = plot_height / float(len(values))
+    for i, (label, value) in enumerate(zip(labels, values)):
+        center = y0 + (i + 0.5) * band
+        if finite[i]:
+            x_start, x_end = sorted((x_of(0.0), x_of(value)))
+            canvas.rect(x_start, center - 0.4 * band, x_end - x_start, 0.8 * band, colors[rank[i]])
+            if pvalues is not None:
+                canvas.text(x_of(value) + pad, center, 'p = %.2f' % pvalues[i])
+        canvas.rect(x0 - tick, center - line / 2, tick, line, TEXT_COLOR)
+        canvas.text(x0 - tick - pad, center, label, anchor='end')
+
+    # axes (left and bottom spines only), ticks and labels
+    canvas.rect(x0 - line / 2, y0, line, plot_height, TEXT_COLOR)
+    canvas.rect(x0 - line / 2, y0 + plot_height - line / 2, plot_width + line / 2, line, TEXT_COLOR)
+    for value in ticks:
+        canvas.rect(x_of(value) - line / 2, y0 + plot_height, line, tick, TEXT_COLOR)
+        canvas.text(x_of(value), y0 + plot_height + tick + pad + canvas.text_height / 2, _format_tick(value),
+                    anchor='middle')
+    canvas.text(x0 + plot_width / 2, top + height - pad - canvas.text_height / 2, xlabel, anchor='middle')
+    canvas.text(left + pad + canvas.text_height / 2, y0 + plot_height / 2, ylabel, anchor='middle', rotate=True)
+
+
+def draw_heatmap_panel(canvas, left, top, width, height, row_labels, column_labels, values, title='',
+                       scale=1.0):
+    """
+    Draws a heatmap of `values` (rows x columns, colored from 0 to their maximum) with a color
+    bar in the given box of the canvas. When the rows are too thin for all their labels, only
+    those of every k-th row (and the last one) are written.
+    """
+
+    values = np.asarray(values, dtype=float).reshape(len(row_labels), len(column_labels))
+    finite = np.isfinite(values)
+    pad = 4 * scale
+    colorbar = 12 * scale
+
+    column_label_height = max(len(str(label)) for label in column_labels) * canvas.char_width
+    y0 = top + canvas.text_height + 2 * pad
+    grid_height = height - (y0 - top) - column_label_height - 2 * pad
+    cell_height = grid_height / float(len(row_labels))
+
+    step = int(np.ceil(1.2 * canvas.text_height / cell_height))
+    shown_rows = list(range(0, len(row_labels), step))
+    if len(shown_rows) > 1:
+        # the last row is always labeled (instead of the previous labeled one, which could overlap it)
+        shown_rows[-1] = len(row_labels) - 1
+    row_label_width = max(len(str(row_labels[i])) for i in shown_rows) * canvas.char_width
+    vmax = values[finite].max() if finite.any() else 1.0
+    vmax = vmax if vmax > 0 else 1.0
+
+    x0 = left + row_label_width + 2 * pad
+    grid_width = width - (x0 - left) - colorbar - len(_format_tick(vmax)) * canvas.char_width - 4 * pad
+
+    canvas.text(x0 + grid_width / 2, top + pad + canvas.text_height / 2, title, anchor='middle')
+
+    cell_width = grid_width / float(len(column_labels))
+    colors = reds_colors(values / vmax)
+    for i in range(len(row_labels)):
+        for j in range(len(column_labels)):
+            canvas.rect(x0 + j * cell_width, y0 + i * cell_height, cell_width, cell_height,
+                        colors[i * len(column_labels) + j])
+    for i in shown_rows:
+        canvas.text(x0 - pad, y0 + (i + 0.5) * cell_height, str(row_labels[i]), anchor='end')
+    for j, label in enumerate(column_labels):
+        canvas.text(x0 + (j + 0.5) * cell_width, y0 + grid_height + pad, str(label), anchor='end', rotate=True)
+
+    # color bar, from 0 (bottom) to the maximum (top)
+    x_bar = x0 + grid_width + 2 * pad
+    steps = 64
+    for k, color in enumerate(reds_colors(np.linspace(1, 0, steps))):
+        canvas.rect(x_bar, y0 + k * grid_height / steps, colorbar, grid_height / steps + 0.5, color)
+    canvas.text(x_bar + colorbar + pad, y0 + canvas.text_height / 2, _format_tick(float('%.3g' % vmax)))
+    canvas.text(x_bar + colorbar + pad, y0 + grid_height - canvas.text_height / 2, '0')
+
+
+def _chart(draw, panels, format, dpi):
+    if format not in FORMATS:
+        raise ValueError("Unknown chart format '%s'. Use one of: %s" % (format, ", ".join(FORMATS)))
+
+    scale = dpi / 100.0
+    width, height = PANEL_WIDTH * scale, PANEL_HEIGHT * scale
+    canvas = (SVGCanvas if format == 'svg' else PNGCanvas)(width * len(panels), height, scale)
+    for i, panel in enumerate(panels):
+        draw(canvas, i * width, 0, width, height, *panel, scale=scale)
+    return canvas.tobytes()
+
+
+def _write(filename, data):
+    with open(filename, 'wb') as file_:
+        file_.write(data)
+    return filename
+
+
+def bar_chart(panels, format='svg', dpi=100):
+    """
+    Bytes of an SVG or PNG chart with the given panels, (labels, values, p-values or None, x label),
+    side by side. `dpi` sets the size of the chart (PANEL_WIDTH x PANEL_HEIGHT per panel at 100 dpi).
+    """
+
+    return _chart(draw_bar_panel, panels, format, dpi)
+
+
+def write_bar_chart(filename, panels, dpi=100):
+    """
+    Writes the chart of the given panels as `filename`, in the format of its extension (.svg or .png)
+    """
+
+    return _write(filename, bar_chart(panels, filename.rsplit('.', 1)[-1].lower(), dpi))
+
+
+def heatmap(panels, format='svg', dpi=100):
+    """
+    Bytes of an SVG or PNG chart with the given heatmap panels,
+    (row labels, column labels, values, title), side by side
+    """
+
+    return _chart(draw_heatmap_panel, panels, format, dpi)
+
+
+def write_heatmap(filename, panels, dpi=100):
+    """
+    Writes the heatmaps of the given panels as `filename`, in the format of its extension (.svg or .png)
+    """
+
+    return _write(filename, heatmap(panels, filename.rsplit('.', 1)[-1].lower(), dpi))
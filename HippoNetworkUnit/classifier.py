@@ -0,0 +1,303 @@
+# Classification of 3-D positions into the layers of CA1
+
+"""
+LayerClassifier assigns points (e.g. the positions of synapses or boutons) to the layers of
+CA1, which are bounded by curved surfaces: the boundaries between OUT and SO, SO and SP, SP and
+SR, SR and SLM, and SLM and OUT, in that order. Each boundary is given as a triangle mesh
+(vertices and triangles) or as points sampled on it with their normals.
+
+A point lies on the positive side of a boundary if it is on the side of the following layers,
+as told by the normal of the nearest point of the boundary (found with a KD-tree per boundary,
+built once). A point beyond k of the boundaries lies in the k-th layer; points before the first
+boundary or beyond the last one are OUT. The result is an array of layer codes, indices in
+`classifier.layers` (SO, SP, SR, SLM, OUT by default), which can be counted by m-type with
+HippoNetworkUnit.synapses or HippoNetworkUnit.neurons.
+
+The KD-tree queries are exact but cost one query per boundary and point. For large numbers of
+points, build_grid(spacing) precomputes the layer of each voxel of a grid over the atlas once
+(it can be saved and loaded with the classifier). Points are then classified by a voxel
+lookup; only those in voxels crossed by a boundary (i.e. whose corners are on different sides
+of it) are queried, for that boundary and within a narrow band around it (which is fast). The
+result is the same as without the grid, as long as the spacing is finer than the folds of the
+boundaries. Points outside the grid are queried exactly, which is about a thousand times
+slower than the lookup: the grid should cover the points, or they can be classified as OUT
+with classify(points, outside_grid='out').
+
+Example:
+    classifier = LayerClassifier([(vertices, triangles) for vertices, triangles in boundary_meshes])
+    classifier.build_grid(spacing=5.0)
+    classifier.save('ca1_layers.npz')
+    ...
+    classifier = LayerClassifier.load('ca1_layers.npz')
+    layer_codes = classifier.classify(synapse_positions)
+"""
+
+from concurrent import futures
+
+import numpy as np
+from scipy import ndimage, spatial
+
+from HippoNetworkUnit.table import LAYERS, OUT
+
+# number of points classified at once (bounds the temporary arrays)
+BATCH_SIZE = 2**20
+
+# grid code of the voxels crossed by a boundary, whose points are classified exactly
+_BOUNDARY = 255
+
+
+def _vertex_normals(vertices, triangles):
+    """ Unit normals of the vertices of a mesh (sum of the normals of their triangles, weighted by area) """
+
+    corners = vertices[triangles]
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals = np.zeros_like(vertices)
+    for k in range(3):
+        np.add.at(normals, triangles[:, k], face_normals)
+    return normals
+
+
+def _surface(boundary):
+    """ (points, unit normals) of a boundary: (vertices, triangles) or (points, normals) """
+
+    points, second = boundary
+    points = np.asarray(points, dtype=float)
+    second = np.asarray(second)
+    if points.ndim != 2 or points.shape[1] != 3:
+        raise ValueError("The points of a boundary must have shape (n, 3), not %s" % (points.shape,))
+    if second.dtype.kind in 'iu':
+        normals = _vertex_normals(points, second)
+    else:
+        normals = np.array(second, dtype=float)
+        if normals.shape != points.shape:
+            raise ValueError("A boundary needs a normal per point")
+    lengths = np.linalg.norm(normals, axis=1)
+    keep = lengths > 0
+    return points[keep], normals[keep] / lengths[keep, None]
+
+
+class LayerClassifier(object):
+    """
+    Classifier of points into the layers between the `boundaries` (len(layers) + 1 of them,
+    from the outer boundary of the first layer to the inner boundary of the last one), each one
+    (vertices, triangles) or (points, normals). The normals are oriented from the first layers
+    to the last ones. Points outside all of the layers are `outside`.
+    """
+
+    def __init__(self, boundaries, layers=LAYERS[:-1], outside=OUT):
+        layers = tuple(layers)
+        if len(boundaries) != len(layers) + 1:
+            raise ValueError("%d layers need %d boundaries, not %d" % (len(layers), len(layers) + 1, len(boundaries)))
+        self.layers = layers + (outside,)
+        self.surfaces = [_surface(boundary) for boundary in boundaries]
+        self.trees = [spatial.cKDTree(points) for points, _ in self.surfaces]
+        self._orient()
+        self.grid = self.sides = self.bands = self.origin = self.spacing = None
+
+    def _orient(self):
+        """ Flips the normals of the boundaries which point towards the first layers """
+
+        for i, (points, normals) in enumerate(self.surfaces):
+            # towards the nearest points of the next boundary (away from those of the previous one),
+            # on average over a sample of the points
+            sample = slice(None, None, max(1, len(points) // 1000))
+            if i + 1 < len(self.surfaces):
+                _, nearest = self.trees[i + 1].query(points[sample])
+                direction = self.surfaces[i + 1][0][nearest] - points[sample]
+            else:
+                _, nearest = self.trees[i - 1].query(points[sample])
+                direction = points[sample] - self.surfaces[i - 1][0][nearest]
+            if np.einsum('ij,ij->', direction, normals[sample]) < 0:
+                self.surfaces[i] = (points, -normals)
+
+    # ----------------------------------------------------------------------
+
+    def _codes(self, beyond):
+        """ Layer codes of the points beyond `beyond` boundaries """
+
+        codes = (beyond - 1).astype(np.int8)
+        codes[(beyond == 0) | (beyond == len(self.surfaces))] = len(self.layers) - 1
+        return codes
+
+    def _side(self, i, points, nearest):
+        """ Whether the points are beyond the i-th boundary, given their nearest points on it """
+
+        surface_points, normals = self.surfaces[i]
+        return np.einsum('ij,ij->i', points - surface_points[nearest], normals[nearest]) >= 0
+
+    def classify_exact(self, points, n_workers=1):
+        """
+        Layer codes (indices in self.layers) of the points (n, 3), with the KD-trees only.
+        Queries of points far from the boundaries are slow: use classify for many points.
+        """
+
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        beyond = np.zeros(len(points), dtype=np.int8)
+        for i, tree in enumerate(self.trees):
+            beyond += self._side(i, points, tree.query(points, workers=n_workers)[1])
+        return self._codes(beyond)
+
+    def build_grid(self, spacing, bounds=None, n_workers=1):
+        """
+        Precomputes the layer of each voxel (of side `spacing`) of the box `bounds` ((min xyz),
+        (max xyz); by default that of the boundaries) to classify points by voxel lookup
+        """
+
+        if bounds is None:
+            all_points = np.concatenate([points for points, _ in self.surfaces])
+            bounds = (all_points.min(axis=0), all_points.max(axis=0))
+        low, high = (np.asarray(bound, dtype=float) for bound in bounds)
+        shape = tuple(np.maximum(np.ceil((high - low) / spacing).astype(int), 1))
+        axes = [low[k] + spacing * np.arange(shape[k] + 1) for k in range(3)]
+        corners_shape = tuple(n + 1 for n in shape)
+
+        # Side of each boundary (one bit per boundary) of the voxel corners: exact within a band
+        # around the boundary, wider than a voxel and than the gaps between its points, and that of
+        # any of them for each connected region of corners out of the band (which it cannot cross)
+        sides = np.zeros(corners_shape, dtype=np.min_scalar_type(2**len(self.surfaces) - 1))
+        bands = np.empty(len(self.surfaces))
+        for i, tree in enumerate(self.trees):
+            surface_points = self.surfaces[i][0]
+            sampling = np.median(tree.query(surface_points[:10000], k=2)[0][:, 1])
+            bands[i] = spacing * np.sqrt(3) + 2 * sampling
+            side = np.zeros(corners_shape, dtype=bool)
+            far = np.zeros(corners_shape, dtype=bool)
+            for j in range(corners_shape[0]):
+                plane = np.stack(np.meshgrid([axes[0][j]], axes[1], axes[2], indexing='ij'), axis=-1).reshape(-1, 3)
+                distance, nearest = tree.query(plane, distance_upper_bound=bands[i], workers=n_workers)
+                near = np.isfinite(distance)
+                plane_side = np.zeros(len(plane), dtype=bool)
+                plane_side[near] = self._side(i, plane[near], nearest[near])
+                side[j] = plane_side.reshape(corners_shape[1:])
+                far[j] = ~near.reshape(corners_shape[1:])
+            regions, n_regions = ndimage.label(far)
+            if n_regions:
+                labels, first = np.unique(regions.ravel(), return_index=True)
+                first = first[labels > 0]
+                region_points = np.stack([axes[k][index] for k, index in
+                                          enumerate(np.unravel_index(first, corners_shape))], axis=1)
+                region_side = self._side(i, region_points, tree.query(region_points, workers=n_workers)[1])
+                side[far] = np.concatenate([[False], region_side])[regions[far]]
+            sides |= side.astype(sides.dtype) << i
+
+        # layers of the corners, then of the voxels: that of their corners, if they all agree
+        beyond = np.zeros(corners_shape, dtype=np.int8)
+        for i in range(len(self.surfaces)):
+            beyond += (sides >> i) & 1
+        corners = self._codes(beyond)
+        grid = corners[:-1, :-1, :-1].astype(np.uint8)
+        for di, dj, dk in np.ndindex(2, 2, 2):
+            if di or dj or dk:
+                grid[corners[di:di + shape[0], dj:dj + shape[1], dk:dk + shape[2]] != corners[:-1, :-1, :-1]] = _BOUNDARY
+
+        self.grid, self.sides, self.bands, self.origin, self.spacing = grid, sides, bands, low, float(spacing)
+        return self
+
+    def _classify_in_grid(self, points, voxels, n_workers=1):
+        """
+        Layer codes of points in voxels crossed by a boundary: the side of the boundaries which
+        cross the voxel is found within their band, that of the others is the one of the corners
+        """
+
+        corner_sides = [self.sides[tuple((voxels + offset).T)] for offset in np.ndindex(2, 2, 2)]
+        crossing = np.zeros_like(corner_sides[0])
+        for corner_side in corner_sides[1:]:
+            crossing |= corner_side ^ corner_sides[0]
+        beyond = np.zeros(len(points), dtype=np.int8)
+        for i, tree in enumerate(self.trees):
+            side = ((corner_sides[0] >> i) & 1).astype(bool)
+            crossed = np.flatnonzero((crossing >> i) & 1)
+            if len(crossed):
+                distance, nearest = tree.query(points[crossed], distance_upper_bound=self.bands[i], workers=n_workers)
+                near = np.isfinite(distance)
+                side[crossed[near]] = self._side(i, points[crossed[near]], nearest[near])
+            beyond += side
+        return self._codes(beyond)
+
+    def _voxels(self, points):
+        """ (flat index in the grid of the voxel of each point, clipped to it; whether it is inside) """
+
+        flat = np.zeros(len(points), dtype=np.intp)
+        inside = np.ones(len(points), dtype=bool)
+        # one axis at a time, without temporary arrays of shape (n, 3); negative indices wrap
+        # to large unsigned ones, out of the grid
+        for k, stride in enumerate(np.cumprod((1,) + self.grid.shape[:0:-1])[::-1]):
+            index = np.floor((points[:, k] - self.origin[k]) / self.spacing).astype(np.intp)
+            inside &= index.astype(np.uintp) < self.grid.shape[k]
+            flat += index * stride
+        return flat, inside
+
+    def _classify_batch(self, batch, n_workers=1, outside_grid='exact'):
+        if self.grid is None:
+            return self.classify_exact(batch, n_workers)
+        flat, inside = self._voxels(batch)
+        codes = self.grid.ravel().take(flat, mode='clip')
+        near = np.flatnonzero(inside & (codes == _BOUNDARY))
+        if len(near):
+            voxels = np.floor((batch[near] - self.origin) / self.spacing).astype(np.intp)
+            codes[near] = self._classify_in_grid(batch[near], voxels, n_workers)
+        if not np.all(inside):
+            if outside_grid == 'exact':
+                codes[~inside] = self.classify_exact(batch[~inside], n_workers)
+            else:
+                codes[~inside] = len(self.layers) - 1
+        return codes
+
+    def classify(self, points, batch_size=BATCH_SIZE, n_workers=1, outside_grid='exact'):
+        """
+        Layer codes (indices in self.layers) of the points (n, 3), with the grid if it was built,
+        in batches of at most `batch_size` points classified by `n_workers` threads.
+        The points outside the grid are classified exactly (outside_grid='exact'), which is orders
+        of magnitude slower than the grid lookup (thousands of points per second far from the
+        boundaries): build the grid over the bounds of the points, or classify them as outside
+        (outside_grid='out') if the grid covers the layers.
+        """
+
+        if outside_grid not in ('exact', 'out'):
+            raise ValueError("outside_grid must be 'exact' or 'out', not '%s'" % outside_grid)
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        codes = np.empty(len(points), dtype=np.int8)
+        if n_workers > 1:
+            # at least one batch per thread
+            batch_size = max(1, min(batch_size, -(-len(points) // n_workers)))
+
+        def classify_batch(start, n_workers=1):
+            codes[start:start + batch_size] = self._classify_batch(points[start:start + batch_size], n_workers,
+                                                                   outside_grid)
+
+        starts = range(0, len(points), batch_size)
+        if n_workers > 1 and len(starts) > 1:
+            # numpy and the KD-tree queries release the GIL
+            with futures.ThreadPoolExecutor(n_workers) as executor:
+                for _ in executor.map(classify_batch, starts):
+                    pass
+        else:
+            for start in starts:
+                classify_batch(start, n_workers)
+        return codes
+
+    # ----------------------------------------------------------------------
+
+    def save(self, path):
+        """ Saves the boundaries and the grid, if any, to the .npz file `path` """
+
+        arrays = dict(layers=np.array(self.layers))
+        for i, (points, normals) in enumerate(self.surfaces):
+            arrays['points_%d' % i], arrays['normals_%d' % i] = points, normals
+        if self.grid is not None:
+            arrays.update(grid=self.grid, sides=self.sides, bands=self.bands, origin=self.origin,
+                          spacing=np.array(self.spacing))
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """ Classifier saved with save """
+
+        with np.load(path) as arrays:
+            layers = [str(layer) for layer in arrays['layers']]
+            boundaries = [(arrays['points_%d' % i], arrays['normals_%d' % i]) for i in range(len(layers))]
+            classifier = cls(boundaries, layers[:-1], layers[-1])
+            if 'grid' in arrays:
+                classifier.grid, classifier.sides, classifier.bands = arrays['grid'], arrays['sides'], arrays['bands']
+                classifier.origin, classifier.spacing = arrays['origin'], float(arrays['spacing'])
+        return classifier
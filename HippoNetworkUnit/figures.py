@@ -0,0 +1,120 @@
+# Figures of the tests of HippoNetworkUnit
+
+"""
+The figures are drawn on Figure objects, not managed by pyplot, and saved with the
+non-interactive canvas of their format, so the tests never need a display. Since matplotlib
+(and seaborn) are not thread-safe, they are drawn and saved one at a time (see new_figure).
+
+Saving a figure takes much longer than computing the scores, so the tests can also render
+their figures in a background thread (figures_mode 'background'): judge then returns as soon as
+the scores are computed, with a PendingFigure for each figure in score.related_data.
+At most MAX_PENDING_FIGURES figures wait to be rendered; further ones block the judgement
+until there is room, so memory stays bounded. flush_figures() waits for all of them, e.g. at
+the end of a sweep (they are also completed before the interpreter exits).
+In figures_mode 'none', e.g. in the inner loop of an optimizer, no figure is drawn at all.
+
+The default mode of the tests is given by the environment variable HIPPONETWORKUNIT_FIGURES.
+"""
+
+import os
+import threading
+import contextlib
+from concurrent import futures
+
+from matplotlib.figure import Figure
+
+FIGURES_MODES = ('sync', 'background', 'none')
+
+FIGURES_MODE = os.environ.get('HIPPONETWORKUNIT_FIGURES', 'sync')
+
+# maximum number of figures waiting to be rendered in the background
+MAX_PENDING_FIGURES = 32
+
+# matplotlib (and seaborn) are not thread-safe: the figures are drawn and saved one at a time
+_plot_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_PENDING_FIGURES)
+# futures of the figures being rendered, discarded by the background thread when they are done
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def new_figure(**kwargs):
+    """
+    New Figure (with the given Figure arguments), drawn under the plot lock and cleared on exit
+    so that its artists are freed even if it is still referenced
+    """
+
+    with _plot_lock:
+        fig = Figure(**kwargs)
+        try:
+            yield fig
+        finally:
+            fig.clear()
+
+
+class PendingFigure(object):
+    """
+    Handle of a figure being rendered in the background
+    """
+
+    def __init__(self, filename, future):
+        self.filename = filename
+        self.future = future
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        """ Waits until the figure is saved and returns its filename (raises the rendering errors) """
+        self.future.result(timeout)
+        return self.filename
+
+    def __repr__(self):
+        return '<PendingFigure %s (%s)>' % (self.filename, 'done' if self.done() else 'pending')
+
+
+def _release(future):
+    with _pending_lock:
+        _pending.discard(future)
+    _slots.release()
+
+
+def render_in_background(function, filename, *args):
+    """
+    Schedules function(*args, filename), which saves the figure `filename`, in the background
+    thread and returns its PendingFigure. Blocks while MAX_PENDING_FIGURES figures are waiting.
+    """
+
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(1, thread_name_prefix='HippoNetworkUnit-figures')
+    _slots.acquire()
+    try:
+        future = _executor.submit(function, *(args + (filename,)))
+    except BaseException:
+        _slots.release()
+        raise
+    with _pending_lock:
+        _pending.add(future)
+    # (called at once, in this thread, if the figure is already saved)
+    future.add_done_callback(_release)
+    return PendingFigure(filename, future)
+
+
+def flush_figures(timeout=None):
+    """
+    Waits until all the figures scheduled so far are saved. Raises the first rendering error, if any.
+    """
+
+    with _pending_lock:
+        pending = list(_pending)
+    done, not_done = futures.wait(pending, timeout)
+    if not_done:
+        raise futures.TimeoutError("%d figures are still being rendered" % len(not_done))
+    for future in done:
+        future.result()
@@ -0,0 +1,171 @@
+# Laminar distributions of the axonal boutons of reconstructed morphologies
+
+"""
+read_swc loads a morphology from an SWC file into flat arrays (one row per sample point: its
+id, type, position, radius and the row of its parent, -1 for the roots). The segments of a
+morphology join each point to its parent; their lengths are computed at once
+(segment_lengths).
+
+The axonal boutons of a neuron are estimated from the length of its axon in each layer of
+CA1, with a uniform bouton density along the axon (boutons per um): each segment is divided
+into pieces of at most `resolution` um, whose midpoints are assigned to layers by a layer
+classifier (see HippoNetworkUnit.classifier.LayerClassifier; any object with `classify(points)`
+returning the layer codes and `layers`), all of them in one call.
+
+count_boutons does it for all the morphologies of a directory, with a pool of worker processes,
+and morphology_model makes of the counts a CA1_laminar_distribution_synapses model, with the
+fraction of the boutons of each m-type in each layer (see HippoNetworkUnit.neurons). The m-type
+of a morphology is, by default, the name of the subdirectory it is in (e.g. morphologies/PC/*.swc).
+
+Example:
+    classifier = LayerClassifier.load('ca1_layers.npz')
+    model = morphology_model('morphologies', classifier, name='reconstructions', n_workers=32)
+    score = CA1_laminar_distribution_synapses_PearsonTest(observation=observation).judge(model)
+"""
+
+import os
+import glob
+import collections
+from concurrent import futures
+
+import numpy as np
+
+# SWC types of the sample points
+SOMA, AXON, BASAL_DENDRITE, APICAL_DENDRITE = 1, 2, 3, 4
+
+# default number of boutons per um of axon
+BOUTON_DENSITY = 0.2
+
+# default maximum length (um) of the pieces of the segments assigned to a layer
+RESOLUTION = 5.0
+
+Morphology = collections.namedtuple('Morphology', ['ids', 'types', 'points', 'radii', 'parents'])
+Morphology.__doc__ = """
+Morphology as flat arrays over its sample points: SWC ids and types, positions (n, 3), radii and
+rows of the parents (-1 for the roots)
+"""
+
+
+def read_swc(path):
+    """ Morphology of the SWC file `path` """
+
+    with open(path, 'rb') as file_:
+        lines = [line.partition(b'#')[0] for line in file_]
+    values = np.array(b' '.join(lines).split(), dtype=float)
+    if values.size % 7:
+        raise ValueError("%s is not an SWC file: its rows must have 7 columns" % path)
+    values = values.reshape(-1, 7)
+
+    ids = values[:, 0].astype(np.int64)
+    parent_ids = values[:, 6].astype(np.int64)
+    order = np.argsort(ids)
+    rows = order[np.searchsorted(ids, parent_ids, sorter=order).clip(0, len(ids) - 1)] if len(ids) else parent_ids
+    parents = np.where(parent_ids < 0, -1, rows)
+    missing = (parent_ids >= 0) & (ids[parents] != parent_ids)
+    if np.any(missing):
+        raise ValueError("%s: unknown parent %d" % (path, parent_ids[missing][0]))
+    return Morphology(ids, values[:, 1].astype(np.int64), values[:, 2:5], values[:, 5], parents)
+
+
+def segment_lengths(morphology):
+    """ Length of the segment from each point to its parent (0.0 for the roots) """
+
+    has_parent = morphology.parents >= 0
+    lengths = np.zeros(len(morphology.ids))
+    lengths[has_parent] = np.linalg.norm(morphology.points[has_parent]
+                                         - morphology.points[morphology.parents[has_parent]], axis=1)
+    return lengths
+
+
+def layer_lengths(morphology, classifier, types=(AXON,), resolution=RESOLUTION):
+    """
+    Length of the neurites of the given SWC `types` in each of the layers of the classifier:
+    the segments are divided into pieces of at most `resolution`, assigned to the layer of
+    their midpoints
+    """
+
+    selected = (morphology.parents >= 0) & np.isin(morphology.types, types)
+    ends = morphology.points[selected]
+    starts = morphology.points[morphology.parents[selected]]
+    lengths = np.linalg.norm(ends - starts, axis=1)
+
+    pieces = np.maximum(np.ceil(lengths / resolution).astype(np.intp), 1)
+    segment = np.repeat(np.arange(len(lengths)), pieces)
+    # position of the midpoint of each piece along its segment, in (0, 1)
+    offset = np.arange(len(segment)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    along = (offset + 0.5) / pieces[segment]
+    midpoints = starts[segment] + along[:, None] * (ends[segment] - starts[segment])
+
+    codes = np.asarray(classifier.classify(midpoints))
+    return np.bincount(codes, weights=lengths[segment] / pieces[segment], minlength=len(classifier.layers))
+
+
+def bouton_counts(morphology, classifier, bouton_density=BOUTON_DENSITY, resolution=RESOLUTION):
+    """ Expected number of axonal boutons of the morphology in each of the layers of the classifier """
+
+    return bouton_density * layer_lengths(morphology, classifier, (AXON,), resolution)
+
+
+# ==============================================================================
+# directories of morphologies
+
+# the classifier of a worker process (set by _initialize_worker)
+_worker_classifier = None
+
+
+def _initialize_worker(classifier):
+    global _worker_classifier
+    _worker_classifier = classifier
+
+
+def _count_file(path, bouton_density, resolution, classifier=None):
+    return bouton_counts(read_swc(path), classifier or _worker_classifier, bouton_density, resolution)
+
+
+def _mtype_of(path, mtypes):
+    if mtypes is None:
+        return os.path.basename(os.path.dirname(path))
+    if callable(mtypes):
+        return mtypes(path)
+    return mtypes[os.path.splitext(os.path.basename(path))[0]]
+
+
+def count_boutons(directory, classifier, mtypes=None, bouton_density=BOUTON_DENSITY, resolution=RESOLUTION,
+                  n_workers=None, chunk_size=16):
+    """
+    Bouton counts of all the .swc files of `directory` (and of its subdirectories) with
+    `n_workers` processes (all the CPUs by default). The m-types of the files are the names of
+    their subdirectories, or given by `mtypes`: a dictionary {file name without extension:
+    m-type} or a function of the path. Returns (paths, m-types, counts (files x layers)).
+    """
+
+    paths = sorted(glob.glob(os.path.join(directory, '**', '*.swc'), recursive=True))
+    if not paths:
+        raise ValueError("No .swc files in %s" % directory)
+    mtype_names = [_mtype_of(path, mtypes) for path in paths]
+
+    n_workers = min(n_workers or os.cpu_count() or 1, len(paths))
+    if n_workers == 1:
+        counts = [_count_file(path, bouton_density, resolution, classifier) for path in paths]
+    else:
+        # the classifier (with its grid) is sent once to each worker
+        with futures.ProcessPoolExecutor(n_workers, initializer=_initialize_worker,
+                                         initargs=(classifier,)) as executor:
+            counts = list(executor.map(_count_file, paths, [bouton_density] * len(paths),
+                                       [resolution] * len(paths), chunksize=chunk_size))
+    return paths, mtype_names, np.array(counts).reshape(len(paths), len(classifier.layers))
+
+
+def morphology_model(directory, classifier, name='morphologies', mtypes=None, bouton_density=BOUTON_DENSITY,
+                     resolution=RESOLUTION, n_workers=None):
+    """
+    CA1_laminar_distribution_synapses model with the fractions of the boutons of the
+    morphologies of each m-type in each layer (see count_boutons)
+    """
+
+    from HippoNetworkUnit.neurons import aggregate_neurons
+    from HippoNetworkUnit.utils import CA1_laminar_distribution_synapses
+
+    _, mtype_names, counts = count_boutons(directory, classifier, mtypes, bouton_density, resolution, n_workers)
+    table, _ = aggregate_neurons(counts, mtype_names, classifier.layers)
+    return CA1_laminar_distribution_synapses(name=name, CA1_laminar_distribution_synapses_model=table.to_dict('value'))
@@ -0,0 +1,104 @@
+# Per-neuron laminar distributions
+
+"""
+Circuits with many individually reconstructed (or cloned) neurons can give the number of
+synapses (or boutons) of each neuron in each layer, as an array (neurons x layers) with the
+m-type of each neuron, instead of one averaged distribution per m-type (see the capability
+Provides_CA1_laminar_distribution_synapses_per_neuron_info).
+
+aggregate_neurons groups them by m-type with one weighted bincount per layer (no loop over the
+neurons) into
+- the fractions of the synapses of each m-type in each layer, as a LaminarDistributionTable
+  (see HippoNetworkUnit.table), which the tests score as any other prediction, and
+- NeuronStatistics: the variability of the per-neuron fractions within each m-type (number
+  of neurons, mean and standard deviation of their fractions), for further statistics.
+Neurons without any synapse have no fractions and are left out of the statistics.
+
+Example:
+    table, statistics = aggregate_neurons(counts, mtypes, layers=('SO', 'SP', 'SR', 'SLM', 'OUT'))
+    sem = statistics.std / np.sqrt(statistics.n_neurons[:, None])
+"""
+
+import collections
+
+import numpy as np
+
+from HippoNetworkUnit.table import LaminarDistributionTable, LAYERS
+
+NeuronStatistics = collections.namedtuple('NeuronStatistics', ['mtypes', 'layers', 'n_neurons', 'counts',
+                                                               'mean', 'std'])
+NeuronStatistics.__doc__ = """
+Variability of the laminar distributions of the neurons of each m-type: for the m-types
+(rows) and layers (columns), the number of neurons with synapses (n_neurons), the total number
+of synapses (counts) and the mean and standard deviation (ddof=1; NaN with less than 2 neurons)
+of the per-neuron fractions
+"""
+
+
+def _codes(mtypes, mtype_names):
+    """ (names of the m-types, m-type code of each neuron) """
+
+    mtypes = np.asarray(mtypes)
+    if mtypes.dtype.kind in 'iu':
+        if mtype_names is None:
+            raise ValueError("The names of the m-types must be given with integer m-type codes")
+        if mtypes.size and (mtypes.min() < 0 or mtypes.max() >= len(mtype_names)):
+            raise ValueError("The m-type codes must be in [0, %d)" % len(mtype_names))
+        return [str(name) for name in mtype_names], mtypes
+    names, codes = np.unique(mtypes.astype(str), return_inverse=True)
+    if mtype_names is None:
+        return names.tolist(), codes.ravel()
+    mtype_names = [str(name) for name in mtype_names]
+    order = dict((name, i) for i, name in enumerate(mtype_names))
+    try:
+        remap = np.array([order[name] for name in names.tolist()], dtype=np.intp)
+    except KeyError as error:
+        raise ValueError("Unknown m-type %s" % error)
+    return mtype_names, remap[codes.ravel()]
+
+
+def aggregate_neurons(counts, mtypes, layers=LAYERS, mtype_names=None):
+    """
+    Groups the synapse `counts` (neurons x layers) of the neurons by their `mtypes` (names, or
+    integer codes indexing `mtype_names`) and returns (LaminarDistributionTable of the fractions
+    of each m-type, NeuronStatistics). The m-types are `mtype_names` if given, otherwise those
+    of the neurons in sorted order.
+    """
+
+    counts = np.asarray(counts, dtype=float)
+    layers = tuple(layers)
+    if counts.ndim != 2 or counts.shape[1] != len(layers):
+        raise ValueError("The counts must have shape (neurons, %d layers), not %s" % (len(layers), counts.shape))
+    if len(mtypes) != counts.shape[0]:
+        raise ValueError("There must be one m-type per neuron (%d), not %d" % (counts.shape[0], len(mtypes)))
+    if np.any(counts < 0):
+        raise ValueError("The counts of synapses must not be negative")
+    names, codes = _codes(mtypes, mtype_names)
+    n_mtypes = len(names)
+
+    # total synapses of each neuron, and fractions of the neurons that have any
+    neuron_totals = counts.sum(axis=1)
+    valid = neuron_totals > 0
+    valid_codes = codes[valid]
+    fractions = counts[valid] / neuron_totals[valid, None]
+
+    totals = np.empty((n_mtypes, len(layers)))
+    sum_fractions = np.empty((n_mtypes, len(layers)))
+    sum_squares = np.empty((n_mtypes, len(layers)))
+    for j in range(len(layers)):
+        totals[:, j] = np.bincount(codes, weights=counts[:, j], minlength=n_mtypes)
+        sum_fractions[:, j] = np.bincount(valid_codes, weights=fractions[:, j], minlength=n_mtypes)
+        sum_squares[:, j] = np.bincount(valid_codes, weights=fractions[:, j] ** 2, minlength=n_mtypes)
+    n_neurons = np.bincount(valid_codes, minlength=n_mtypes)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        table_values = totals / totals.sum(axis=1, keepdims=True)
+        mean = sum_fractions / n_neurons[:, None]
+        variance = (sum_squares - n_neurons[:, None] * mean ** 2) / (n_neurons[:, None] - 1)
+    std = np.sqrt(np.clip(variance, 0.0, None))
+    std[n_neurons < 2] = np.nan
+
+    for array in (n_neurons, totals, mean, std):
+        array.flags.writeable = False
+    table = LaminarDistributionTable(table_values, names, layers)
+    return table, NeuronStatistics(table.mtypes, table.layers, n_neurons, totals, mean, std)
@@ -0,0 +1,112 @@
+# Streaming reader of the predictions of many models
+
+"""
+read_predictions(source) reads the predictions of many models from a JSON Lines file (one JSON
+object per line; '-' for the standard input, e.g. a pipe from the simulator) one record at a
+time, so that memory does not grow with the size of the file. Each record is either
+
+    {"name": "model_1", "prediction": {"AA": {"SO": {"value": "0.1"}, ...}, ...}}
+
+or the prediction dictionary alone (then named `name % line number`). Each prediction is
+validated and parsed as soon as it is read, into a LaminarDistributionTable (see
+HippoNetworkUnit.table), which the tests take as it is. Invalid records raise a PredictionError
+giving their line, or are skipped with a warning (errors='skip').
+
+The records are parsed with orjson when it is installed, with json otherwise.
+
+iter_models(source) yields them as CA1_laminar_distribution_synapses models, to be judged one
+after the other or by a sweep, which only reads the file as fast as the models are judged:
+
+    test = CA1_laminar_distribution_synapses_PearsonTest(observation=observation)
+    for result in sweep(test, iter_models('predictions.jsonl'), n_workers=64):
+        print(result.model_name, result.score)
+"""
+
+import sys
+import json
+import warnings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from HippoNetworkUnit.table import LaminarDistributionTable
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+class PredictionError(ValueError):
+    """ Invalid record of a predictions file """
+
+    def __init__(self, source, line, message):
+        ValueError.__init__(self, "%s, line %d: %s" % (source, line, message))
+        self.source = source
+        self.line = line
+
+
+def _lines(source):
+    """ (name of the source, iterator of its lines as bytes, file to close or None) """
+
+    if source == '-':
+        return '<stdin>', iter(sys.stdin.buffer), None
+    if hasattr(source, 'read'):
+        return getattr(source, 'name', repr(source)), iter(source), None
+    file_ = open(source, 'rb')
+    return source, iter(file_), file_
+
+
+def _parse(record, name, layers):
+    """ (name, table) of a decoded record """
+
+    if not isinstance(record, dict):
+        raise ValueError("a record must be a JSON object, not %s" % type(record).__name__)
+    if 'prediction' in record:
+        name = record.get('name', name)
+        record = record['prediction']
+        if not isinstance(record, dict):
+            raise ValueError("'prediction' must be a JSON object")
+    if not record or not all(isinstance(layers_dict, dict) and layers_dict for layers_dict in record.values()):
+        raise ValueError("a prediction must be of the form {mtype: {layer: {'value': X}}}")
+    return str(name), LaminarDistributionTable.from_dict(record, layers)
+
+
+def read_predictions(source, layers=None, name='model_%d', errors='raise'):
+    """
+    Yields (name, LaminarDistributionTable) for each record of the JSON Lines `source` (a file
+    name, '-' for the standard input, or a file object), reading one line at a time.
+    `layers` gives the columns of the tables (by default those of each record, with OUT last).
+    An invalid record raises a PredictionError, or is skipped with a warning if errors='skip'.
+    Blank lines are ignored.
+    """
+
+    if errors not in ('raise', 'skip'):
+        raise ValueError("errors must be 'raise' or 'skip', not '%s'" % errors)
+    source_name, lines, file_ = _lines(source)
+    try:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = _parse(_loads(line), name % number, layers)
+            except (ValueError, TypeError, KeyError, AttributeError, StopIteration) as error:
+                error = PredictionError(source_name, number, error)
+                if errors == 'raise':
+                    raise error
+                warnings.warn(str(error))
+                continue
+            yield record
+    finally:
+        if file_ is not None:
+            file_.close()
+
+
+def iter_models(source, layers=None, name='model_%d', errors='raise'):
+    """
+    Yields a CA1_laminar_distribution_synapses model for each record of `source`
+    (see read_predictions)
+    """
+
+    from HippoNetworkUnit.utils import CA1_laminar_distribution_synapses
+    for model_name, table in read_predictions(source, layers, name, errors):
+        yield CA1_laminar_distribution_synapses(name=model_name, CA1_laminar_distribution_synapses_model=table)
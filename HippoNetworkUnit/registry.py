@@ -0,0 +1,147 @@
+# Registry of the scores, validation-tests and capabilities of HippoNetworkUnit
+
+"""
+Each kind of component (scores, tests, capabilities) has a declarative index mapping the name of
+a class to its location, "module:attribute". A name is resolved, i.e. its module imported, only
+the first time it is used, and the resolved classes are cached; nothing is found by scanning
+the file system, so the package also works when zipped or frozen.
+
+Other packages can add components without them being imported in advance:
+- with an entry point in one of the groups "HippoNetworkUnit.scores", "HippoNetworkUnit.tests"
+  or "HippoNetworkUnit.capabilities", e.g. in their setup.py:
+      entry_points={"HippoNetworkUnit.scores": ["MyScore = mypackage.scores:MyScore"]}
+  Entry points are read (not loaded) once, the first time a name is not found among the
+  built-in components; they cannot replace the built-in ones.
+- at run time, with register("scores", "MyScore", "mypackage.scores:MyScore").
+"""
+
+import importlib
+
+KINDS = ('scores', 'tests', 'capabilities')
+
+ENTRY_POINT_GROUP = 'HippoNetworkUnit.%s'
+
+BUILTIN = {
+    'scores': {
+        'PearsonChiSquaredScore': 'HippoNetworkUnit.scores.score_Pearson_ChiSquared:PearsonChiSquaredScore',
+        'PearsonResult': 'HippoNetworkUnit.scores.score_Pearson_ChiSquared:PearsonResult',
+        'NeymanScore': 'HippoNetworkUnit.scores.score_Neyman:NeymanScore',
+        'NeymanResult': 'HippoNetworkUnit.scores.score_Neyman:NeymanResult',
+        'Log_LikelihoodRatioScore': 'HippoNetworkUnit.scores.score_LogLikelihoodRatio:Log_LikelihoodRatioScore',
+        'Log_LikelihoodRatioResult': 'HippoNetworkUnit.scores.score_LogLikelihoodRatio:Log_LikelihoodRatioResult',
+        'FreemanTukey1Score': 'HippoNetworkUnit.scores.score_FreemanTukey1:FreemanTukey1Score',
+        'FreemanTukey2Score': 'HippoNetworkUnit.scores.score_FreemanTukey2:FreemanTukey2Score',
+        'FreemanTukeyResult': 'HippoNetworkUnit.scores.score_FreemanTukey1:FreemanTukeyResult',
+        'KLdivScore': 'HippoNetworkUnit.scores.score_KullbackLeibler:KLdivScore',
+        'CombinedScore': 'HippoNetworkUnit.scores.score_Combined:CombinedScore',
+    },
+    'tests': {
+        'CA1_laminar_distribution_synapses_PearsonTest':
+            'HippoNetworkUnit.tests.test_CA1_laminar_distribution_synapses_Pearson:'
+            'CA1_laminar_distribution_synapses_PearsonTest',
+        'CA1_laminar_distribution_synapses_NeymanTest':
+            'HippoNetworkUnit.tests.test_CA1_laminar_distribution_synapses_Neyman:'
+            'CA1_laminar_distribution_synapses_NeymanTest',
+        'CA1_laminar_distribution_synapses_GTest':
+            'HippoNetworkUnit.tests.test_CA1_laminar_distribution_synapses_Log_LikelihoodRatio:'
+            'CA1_laminar_distribution_synapses_GTest',
+        'CA1_laminar_distribution_synapses_FreemanTukey1Test':
+            'HippoNetworkUnit.tests.test_CA1_laminar_distribution_synapses_FreemanTukey1:'
+            'CA1_laminar_distribution_synapses_FreemanTukey1Test',
+        'CA1_laminar_distribution_synapses_FreemanTukey2Test':
+            'HippoNetworkUnit.tests.test_CA1_laminar_distribution_synapses_FreemanTukey2:'
+            'CA1_laminar_distribution_synapses_FreemanTukey2Test',
+        'CA1_laminar_distribution_synapses_KLdivTest':
+            'HippoNetworkUnit.tests.test_CA1_laminar_distribution_synapses_KullbackLeibler:'
+            'CA1_laminar_distribution_synapses_KLdivTest',
+        'CA1_laminar_distribution_synapses_MultiScoreTest':
+            'HippoNetworkUnit.tests.test_CA1_laminar_distribution_synapses_MultiScore:'
+            'CA1_laminar_distribution_synapses_MultiScoreTest',
+    },
+    'capabilities': {
+        'Provides_CA1_laminar_distribution_synapses_info':
+            'HippoNetworkUnit.capabilities.cap_Provides_CA1_laminar_distribution_synapses_info:'
+            'Provides_CA1_laminar_distribution_synapses_info',
+        'Provides_CA1_laminar_distribution_synapses_per_neuron_info':
+            'HippoNetworkUnit.capabilities.cap_Provides_CA1_laminar_distribution_synapses_per_neuron_info:'
+            'Provides_CA1_laminar_distribution_synapses_per_neuron_info',
+    },
+}
+
+_registered = dict((kind, dict()) for kind in KINDS)
+_index = dict()
+_resolved = dict((kind, dict()) for kind in KINDS)
+
+
+def _check_kind(kind):
+    if kind not in KINDS:
+        raise ValueError("Unknown kind of component '%s'. Use one of: %s" % (kind, ", ".join(KINDS)))
+
+
+def _entry_points(group):
+    """ Entry points of a group, as (name, "module:attribute") pairs. None of them is loaded """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return []
+    eps = entry_points()
+    eps = eps.select(group=group) if hasattr(eps, 'select') else eps.get(group, [])
+    return [(ep.name, ep.value) for ep in eps]
+
+
+def index(kind):
+    """
+    Returns the (cached) index {name: "module:attribute"} of a kind of component:
+    those of the entry points, the built-in ones and those registered at run time
+    (later ones taking precedence)
+    """
+
+    _check_kind(kind)
+    if kind not in _index:
+        kind_index = dict(_entry_points(ENTRY_POINT_GROUP % kind))
+        kind_index.update(BUILTIN[kind])
+        kind_index.update(_registered[kind])
+        _index[kind] = kind_index
+    return _index[kind]
+
+
+def names(kind):
+    """ Sorted names of the components of a kind """
+    return sorted(index(kind))
+
+
+def register(kind, name, target):
+    """
+    Adds (or replaces) the component `name` of a kind, located at `target` ("module:attribute").
+    The module is not imported until the component is resolved.
+    """
+
+    _check_kind(kind)
+    if ':' not in target:
+        raise ValueError("The target of a component must be of the form 'module:attribute'")
+    _registered[kind][name] = target
+    if kind in _index:
+        _index[kind][name] = target
+    _resolved[kind].pop(name, None)
+
+
+def resolve(kind, name):
+    """
+    Returns the component `name` of a kind, importing its module the first time.
+    Raises KeyError if no component has that name.
+    """
+
+    _check_kind(kind)
+    if name not in _resolved[kind]:
+        if name in _registered[kind]:
+            target = _registered[kind][name]
+        elif name in BUILTIN[kind]:
+            target = BUILTIN[kind][name]
+        else:
+            target = index(kind)[name]
+        module_name, _, attribute = target.partition(':')
+        value = importlib.import_module(module_name)
+        for part in attribute.split('.'):
+            value = getattr(value, part)
+        _resolved[kind][name] = value
+    return _resolved[kind][name]
@@ -1,17 +1,32 @@
 # Loads Python classes for scores to be used in HippoNetworkUnit
 
 # scores/
-from os.path import dirname, basename, isfile
-import glob
+import importlib
+
+from .. import registry
 
 """
-NOTE: All score files must have a prefix "score_" and extension ".py".
-Only these would be loaded.
+NOTE: Scores are listed in HippoNetworkUnit.registry (or registered by other packages
+through entry points) and their modules are only imported the first time they are accessed.
+Helper modules of this package (e.g. divergence, fastpath) are imported by name.
 """
-files = glob.glob(dirname(__file__)+"/score_*.py")
-modules = [ basename(f)[:-3] for f in files if isfile(f)]
 
-for module in modules:
-    exec("from %s import *" % module)
+
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    try:
+        value = registry.resolve('scores', name)
+    except KeyError:
+        try:
+            return importlib.import_module('.' + name, __name__)
+        except ImportError as error:
+            if getattr(error, 'name', None) != __name__ + '.' + name:
+                raise
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    globals()[name] = value
+    return value
 
 
+def __dir__():
+    return sorted(set(globals()) | set(registry.names('scores')))
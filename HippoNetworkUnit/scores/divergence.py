@@ -0,0 +1,221 @@
+# Shared NumPy kernels for the goodness-of-fit scores in HippoNetworkUnit
+
+# scores/
+"""
+Vectorized building blocks used by the `compute_batch` methods of the score classes.
+
+All functions work along the last axis of their inputs, so an observation/prediction
+pair can be a single distribution (layers,), a matrix (m-types x layers) or a stack of
+matrices (models x m-types x layers). Entries that are NaN in either the observation
+or the prediction are excluded from the statistic and from the degrees of freedom,
+as the `compute` methods do for a single m-type.
+"""
+
+import numpy as np
+from collections import namedtuple
+
+from . import chi2_survival
+
+DivergenceResult = namedtuple('DivergenceResult', ('statistic', 'statistic_n', 'pvalue'))
+
+# Scores computed by `compute_divergences`, named as the score classes
+SCORE_TYPES = ('PearsonChiSquaredScore', 'NeymanScore', 'Log_LikelihoodRatioScore',
+               'FreemanTukey1Score', 'FreemanTukey2Score', 'KLdivScore')
+
+# Ways of obtaining the p-value of a Chi-squared statistic:
+# 'asymptotic': scipy.stats.distributions.chi2.sf
+# 'closed_form': cached closed-form evaluators of chi2_survival (same values, up to 1e-13)
+# 'exact': exact multinomial test of exact_multinomial, for small counts (accepts n_counts, eps)
+# 'montecarlo': parametric bootstrap of montecarlo (accepts n_counts, seed, n_workers, rtol, atol, ...)
+PVALUE_METHODS = ('asymptotic', 'closed_form', 'exact', 'montecarlo')
+
+# Fractions are turned into percentages (counts out of 100) before computing the statistics
+SCALE = 100.0
+
+
+def prepare_batch(observation, prediction, scale=SCALE, check_bounds=True):
+    """
+    Returns float copies of observation and prediction (multiplied by `scale`, with
+    NaN entries set to 0.0), the boolean mask of valid entries and the degrees of
+    freedom of each distribution.
+    """
+
+    obs_values = np.array(observation, dtype=float)
+    pred_values = np.array(prediction, dtype=float)
+    obs_values, pred_values = np.broadcast_arrays(obs_values, pred_values)
+    obs_values = obs_values.copy()
+    pred_values = pred_values.copy()
+
+    mask = ~(np.isnan(obs_values) | np.isnan(pred_values))
+    obs_values[~mask] = 0.0
+    pred_values[~mask] = 0.0
+
+    if check_bounds:
+        assert(obs_values.max(initial=0.0) <= 1.00 and pred_values.max(initial=0.0) <= 1.00), \
+            "Probabiltity values should not be larger than 1.0"
+
+    if scale is not None:
+        obs_values *= scale
+        pred_values *= scale
+
+    dof = mask.sum(axis=-1) - 1  # degrees of freedom for the Chi-squared distribution
+
+    return obs_values, pred_values, mask, dof
+
+
+def sum_terms(terms, mask):
+    """
+    Adds up the per-layer terms of a statistic, ignoring the masked (NaN) layers.
+    """
+
+    return np.where(mask, terms, 0.0).sum(axis=-1)
+
+
+def normalize_statistic(stat, dof):
+    """
+    Normalizes a statistic respect to the mean and std of the Chi-squared distribution
+    """
+
+    chisq_mean = dof
+    chisq_std = np.sqrt(2*dof)
+    return np.abs(stat-chisq_mean)/chisq_std
+
+
+def chi2_pvalue(stat, dof, pvalue_method='asymptotic'):
+    """
+    Asymptotic p-value of a statistic following the Chi-squared distribution
+    """
+
+    if pvalue_method == 'asymptotic':
+        from scipy.stats import distributions
+        return distributions.chi2.sf(stat, dof)
+    elif pvalue_method == 'closed_form':
+        return chi2_survival.chi2_sf(stat, dof)
+    raise ValueError("Unknown Chi-squared p-value method '%s'" % pvalue_method)
+
+# ==============================================================================
+# Per-layer terms of each statistic. Observation (obs) and prediction (pred) are
+# already scaled and have their masked entries set to 0.0
+
+
+def pearson_terms(obs, pred):
+    """ Terms of scipy.stats.power_divergence(f_obs=obs, f_exp=pred, lambda_='pearson') """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (obs - pred)**2 / pred
+
+
+def neyman_terms(obs, pred):
+    """ Terms of scipy.stats.power_divergence(f_obs=pred, f_exp=obs, lambda_='neyman') """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pred * ((pred / obs)**-2 - 1)
+
+
+def log_ratio(obs, pred):
+    """ log(obs/pred), set to 0.0 for the empty layers (obs = 0), whose terms are 0*log(0) = 0 """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(obs > 0, np.log(obs / pred), 0.0)
+
+
+def log_likelihood_terms(obs, pred):
+    """
+    Terms of scipy.stats.power_divergence(f_obs=obs, f_exp=pred, lambda_='log-likelihood'),
+    which are 0.0 for the empty layers also when nothing is predicted in them (scipy gives NaN)
+    """
+    return 2.0 * obs * log_ratio(obs, pred)
+
+
+def freeman_tukey1_terms(obs, pred):
+    """ Terms of the Freeman-Tukey statistic 4*sum((sqrt(obs) - sqrt(pred))**2) """
+    return 4*(np.sqrt(obs) - np.sqrt(pred))**2
+
+
+def freeman_tukey2_terms(obs, pred):
+    """ Terms of the Freeman-Tukey statistic sum((sqrt(pred) + sqrt(pred+1) - sqrt(4*obs+1))**2) """
+    return (np.sqrt(pred) + np.sqrt(pred+1) - np.sqrt(4*obs+1))**2
+
+
+
+# Per-layer terms of the Chi-squared statistics, used by the exact and Monte-Carlo p-values
+TERMS = {'PearsonChiSquaredScore': pearson_terms,
+         'NeymanScore': neyman_terms,
+         'Log_LikelihoodRatioScore': log_likelihood_terms,
+         'FreemanTukey1Score': freeman_tukey1_terms,
+         'FreemanTukey2Score': freeman_tukey2_terms}
+
+# ==============================================================================
+
+
+def compute_divergences(observation, prediction, score_types=SCORE_TYPES, pvalue_method='asymptotic',
+                        **pvalue_options):
+    """
+    Computes several goodness-of-fit statistics on the same observation/prediction arrays in a
+    single pass. Pearson, Neyman and the Log-Likelihood Ratio (G-test) are members of the
+    Cressie-Read power divergence family (lambda = 1, -2, 0), Freeman-Tukey corresponds to
+    lambda = -1/2 and the Kullback-Leibler divergence is the limiting case of the G-test for
+    normalized distributions. Hence the NaN masking, the x100 scaling and the square-root and
+    logarithm terms are computed once and shared by all of them, and the p-values of all the
+    Chi-squared statistics are obtained in a single call to the survival function.
+
+    Returns a dictionary {score_type: DivergenceResult(statistic, statistic_n, pvalue)}.
+    For 'KLdivScore' statistic_n is the divergence itself and pvalue is NaN.
+    `pvalue_method` is one of PVALUE_METHODS, and `pvalue_options` are passed on to it.
+    """
+
+    unknown = set(score_types) - set(SCORE_TYPES)
+    if unknown:
+        raise ValueError("Unknown score types: %s" % ", ".join(sorted(unknown)))
+    if pvalue_method not in PVALUE_METHODS:
+        raise ValueError("Unknown p-value method '%s'. Use one of: %s" % (pvalue_method, ", ".join(PVALUE_METHODS)))
+
+    chisq_types = [score_type for score_type in score_types if score_type != 'KLdivScore']
+    obs_values, pred_values, mask, dof = prepare_batch(observation, prediction,
+                                                       check_bounds=bool(chisq_types))
+
+    if 'FreemanTukey1Score' in score_types or 'FreemanTukey2Score' in score_types:
+        sqrt_pred = np.sqrt(pred_values)
+    if 'FreemanTukey1Score' in score_types:
+        sqrt_obs = np.sqrt(obs_values)
+    if 'Log_LikelihoodRatioScore' in score_types or 'KLdivScore' in score_types:
+        obs_log_ratio = log_ratio(obs_values, pred_values)
+
+    stats = dict()
+    for score_type in score_types:
+        if score_type == 'PearsonChiSquaredScore':
+            terms = pearson_terms(obs_values, pred_values)
+        elif score_type == 'NeymanScore':
+            terms = neyman_terms(obs_values, pred_values)
+        elif score_type == 'Log_LikelihoodRatioScore':
+            terms = 2.0 * obs_values * obs_log_ratio
+        elif score_type == 'FreemanTukey1Score':
+            terms = 4*(sqrt_obs - sqrt_pred)**2
+        elif score_type == 'FreemanTukey2Score':
+            terms = (sqrt_pred + np.sqrt(pred_values+1) - np.sqrt(4*obs_values+1))**2
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                obs_sum = obs_values.sum(axis=-1, keepdims=True)
+                pred_sum = pred_values.sum(axis=-1, keepdims=True)
+                terms = obs_values / obs_sum * (obs_log_ratio + np.log(pred_sum / obs_sum))
+        stats[score_type] = sum_terms(terms, mask)
+
+    results = dict()
+    if chisq_types:
+        stat = np.stack([stats[score_type] for score_type in chisq_types])
+        if pvalue_method == 'exact':
+            from . import exact_multinomial
+            pval = np.stack([exact_multinomial.exact_pvalues(TERMS[score_type], obs_values / SCALE,
+                                                             pred_values / SCALE, mask, **pvalue_options)
+                             for score_type in chisq_types])
+        elif pvalue_method == 'montecarlo':
+            from . import montecarlo
+            pval = montecarlo.montecarlo_pvalues([TERMS[score_type] for score_type in chisq_types],
+                                                 obs_values / SCALE, pred_values / SCALE, mask, **pvalue_options)
+        else:
+            pval = chi2_pvalue(stat, dof, pvalue_method)
+        stat_n = normalize_statistic(stat, dof)
+        for i, score_type in enumerate(chisq_types):
+            results[score_type] = DivergenceResult(stat[i], stat_n[i], pval[i])
+    if 'KLdivScore' in score_types:
+        stat = stats['KLdivScore']
+        results['KLdivScore'] = DivergenceResult(stat, stat, np.full_like(stat, np.nan))
+
+    return results
@@ -0,0 +1,156 @@
+# Allocation-free evaluation of the scores, for optimizers and other hot loops
+
+# scores/
+"""
+FastScorer computes one of the scores of HippoNetworkUnit for plain float64 arrays of a fixed
+shape (m-types x layers, or models x m-types x layers), without quantities, without modifying
+its inputs and without allocating memory once it has been created: all the intermediate arrays
+are preallocated, the bounds are checked with one reduction per input, and the normalized
+statistics and p-values are written into arrays provided by the caller.
+It gives the same values as the compute_batch methods (see divergence.compute_divergences).
+
+Example:
+    scorer = FastScorer('PearsonChiSquaredScore', (10, 5))
+    statistic_n, pvalue = np.empty(10), np.empty(10)
+    for prediction in predictions:
+        scorer.compute_into(observation, prediction, statistic_n, pvalue)
+"""
+
+import numpy as np
+from scipy import special
+
+from . import chi2_survival
+from .divergence import SCORE_TYPES, SCALE
+
+
+class FastScorer(object):
+    """
+    Preallocated workspace computing `score_type` (one of divergence.SCORE_TYPES) for
+    observation/prediction arrays of the given shape. The p-values are obtained with the
+    'closed_form' (default) or 'asymptotic' methods; only 'closed_form' with the same number of
+    valid layers in every distribution is allocation-free.
+    """
+
+    def __init__(self, score_type, shape, pvalue_method='closed_form'):
+        if score_type not in SCORE_TYPES:
+            raise ValueError("Unknown score type '%s'. Use one of: %s" % (score_type, ", ".join(SCORE_TYPES)))
+        if pvalue_method not in ('asymptotic', 'closed_form'):
+            raise ValueError("FastScorer only supports the 'asymptotic' and 'closed_form' p-value methods")
+
+        self.score_type = score_type
+        self.pvalue_method = pvalue_method
+        self.shape = tuple(shape)
+        rows = self.shape[:-1]
+
+        self._obs, self._pred, self._terms, self._work = [np.empty(self.shape) for _ in range(4)]
+        self._invalid, self._valid, self._positive = [np.empty(self.shape, dtype=bool) for _ in range(3)]
+        self._count = np.empty(rows, dtype=np.intp)
+        self._stat, self._dof, self._std, self._work1, self._work2 = [np.empty(rows) for _ in range(5)]
+        self._work1_column = self._work1[..., np.newaxis]
+        self._work2_column = self._work2[..., np.newaxis]
+
+    def _check_buffer(self, array, name):
+        if not (isinstance(array, np.ndarray) and array.dtype == np.float64 and array.shape == self.shape
+                and array.flags.c_contiguous):
+            raise ValueError("%s must be a C-contiguous float64 array of shape %s" % (name, self.shape))
+
+    def compute_into(self, observation, prediction, out_statistic_n, out_pvalue):
+        """
+        Computes the score of observation and prediction (fractions; NaN layers are left out)
+        and writes the normalized statistics and p-values into `out_statistic_n` and `out_pvalue`,
+        float64 arrays with the shape of the leading dimensions. For 'KLdivScore' the divergence is
+        written into `out_statistic_n` and `out_pvalue` is filled with NaN.
+        Returns (out_statistic_n, out_pvalue).
+        """
+
+        self._check_buffer(observation, 'observation')
+        self._check_buffer(prediction, 'prediction')
+        obs, pred, terms, work, invalid = self._obs, self._pred, self._terms, self._work, self._invalid
+
+        if self.score_type != 'KLdivScore':
+            assert not (np.fmax.reduce(observation, axis=None) > 1.00 or np.fmax.reduce(prediction, axis=None) > 1.00), \
+                "Probabiltity values should not be larger than 1.0"
+
+        np.isnan(observation, out=invalid)
+        np.isnan(prediction, out=self._valid)
+        np.logical_or(invalid, self._valid, out=invalid)
+        np.logical_not(invalid, out=self._valid)
+        np.add.reduce(self._valid, axis=-1, out=self._count)
+        np.subtract(self._count, 1, out=self._dof)
+
+        np.multiply(observation, SCALE, out=obs)
+        np.multiply(prediction, SCALE, out=pred)
+        np.copyto(obs, 0.0, where=invalid)
+        np.copyto(pred, 0.0, where=invalid)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._compute_terms(obs, pred, terms, work)
+        np.copyto(terms, 0.0, where=invalid)
+        np.add.reduce(terms, axis=-1, out=self._stat)
+
+        if self.score_type == 'KLdivScore':
+            np.copyto(out_statistic_n, self._stat)
+            out_pvalue.fill(np.nan)
+            return out_statistic_n, out_pvalue
+
+        # Normalizing respect to the mean and std of the Chi-squared distribution
+        np.subtract(self._stat, self._dof, out=out_statistic_n)
+        np.abs(out_statistic_n, out=out_statistic_n)
+        np.multiply(self._dof, 2, out=self._std)
+        np.sqrt(self._std, out=self._std)
+        np.divide(out_statistic_n, self._std, out=out_statistic_n)
+
+        dof = self._count.max() - 1
+        if (self.pvalue_method == 'closed_form' and dof == self._count.min() - 1
+                and 1 <= dof <= chi2_survival.MAX_INPLACE_DOF):
+            chi2_survival.get_chi2_survival(int(dof)).sf_into(self._stat, out_pvalue, self._work1, self._work2)
+        elif self.pvalue_method == 'closed_form':
+            out_pvalue[...] = chi2_survival.chi2_sf(self._stat, self._dof)
+        else:
+            from scipy.stats import distributions
+            out_pvalue[...] = distributions.chi2.sf(self._stat, self._dof)
+
+        return out_statistic_n, out_pvalue
+
+    def _compute_terms(self, obs, pred, terms, work):
+        """ Per-layer terms of the statistic, written into `terms` """
+
+        if self.score_type == 'PearsonChiSquaredScore':
+            np.subtract(obs, pred, out=terms)
+            np.multiply(terms, terms, out=terms)
+            np.divide(terms, pred, out=terms)
+        elif self.score_type == 'NeymanScore':
+            np.divide(pred, obs, out=terms)
+            np.power(terms, -2, out=terms)
+            np.subtract(terms, 1, out=terms)
+            np.multiply(terms, pred, out=terms)
+        elif self.score_type == 'Log_LikelihoodRatioScore':
+            # log(obs/pred) only where obs > 0: the empty layers are 0 (see divergence.log_ratio)
+            np.greater(obs, 0.0, out=self._positive)
+            terms.fill(0.0)
+            np.divide(obs, pred, out=terms, where=self._positive)
+            np.log(terms, out=terms, where=self._positive)
+            np.multiply(terms, obs, out=terms)
+            np.multiply(terms, 2.0, out=terms)
+        elif self.score_type == 'FreemanTukey1Score':
+            np.sqrt(obs, out=terms)
+            np.sqrt(pred, out=work)
+            np.subtract(terms, work, out=terms)
+            np.multiply(terms, terms, out=terms)
+            np.multiply(terms, 4, out=terms)
+        elif self.score_type == 'FreemanTukey2Score':
+            np.sqrt(pred, out=terms)
+            np.add(pred, 1, out=work)
+            np.sqrt(work, out=work)
+            np.add(terms, work, out=terms)
+            np.multiply(obs, 4, out=work)
+            np.add(work, 1, out=work)
+            np.sqrt(work, out=work)
+            np.subtract(terms, work, out=terms)
+            np.multiply(terms, terms, out=terms)
+        else:
+            np.add.reduce(obs, axis=-1, out=self._work1)
+            np.add.reduce(pred, axis=-1, out=self._work2)
+            np.divide(obs, self._work1_column, out=terms)
+            np.divide(pred, self._work2_column, out=work)
+            special.rel_entr(terms, work, out=terms)
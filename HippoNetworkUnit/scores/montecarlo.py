@@ -0,0 +1,116 @@
+# Monte-Carlo (parametric bootstrap) goodness-of-fit p-values
+
+# scores/
+"""
+The p-value of a statistic is estimated by drawing multinomial samples of the observed number
+of counts under the predicted distribution, and counting how often the statistic of a sample
+is at least as large as the observed one:  pvalue = (exceedances + 1) / (samples + 1).
+
+Samples are drawn in blocks of `block_size` for all the distributions (m-types, models) at once,
+and several statistics are evaluated on the same samples. Block b of a distribution uses its own
+random stream, the child SeedSequence(seed, spawn_key=key + (b,)), the key being a hash of the
+observed counts and probabilities of the distribution, and the blocks of each round are spread
+across a process pool. After each round, the statistics of the distributions whose p-values have
+a confidence interval narrower than max(atol, rtol * pvalue) stop being counted (and the
+distributions whose statistics all stopped, being simulated). So the p-value of a distribution
+only depends on the seed: not on the number of workers, nor on the other distributions and
+statistics computed with it (compute and compute_batch give the same p-values).
+"""
+
+import hashlib
+import numpy as np
+import multiprocessing
+from scipy.stats import distributions
+
+from .exact_multinomial import RTOL, count_terms
+
+
+def _simulate_block(task):
+    """
+    Draws one block of multinomial samples and returns, for each statistic and distribution,
+    the number of samples whose statistic exceeds the observed threshold
+    """
+
+    block, entropy, keys, terms_list, n, probabilities, expected, threshold, block_size = task
+
+    samples = np.empty((block_size,) + probabilities.shape, dtype=np.int64)
+    for row, key in enumerate(keys):
+        rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=key + (block,)))
+        samples[:, row] = rng.multinomial(n[row], probabilities[row], size=block_size)
+
+    exceedances = np.empty((len(terms_list), len(n)), dtype=np.int64)
+    for i, terms in enumerate(terms_list):
+        stat = count_terms(terms, samples, expected).sum(axis=-1)
+        exceedances[i] = (stat >= threshold[i]).sum(axis=0)
+    return exceedances
+
+
+def _stream_key(counts, probabilities):
+    """ Spawn key of the random streams of a distribution: a hash of its counts and probabilities """
+
+    digest = hashlib.sha256(np.ascontiguousarray(counts, dtype=np.int64).tobytes()
+                            + np.ascontiguousarray(probabilities, dtype=float).tobytes()).digest()
+    return tuple(int(word) for word in np.frombuffer(digest[:16], dtype=np.uint32))
+
+
+def montecarlo_pvalues(terms_list, observation, prediction, mask, n_counts=100, seed=None, n_workers=1,
+                       block_size=2000, blocks_per_round=8, max_samples=10**6, rtol=0.1, atol=1e-3,
+                       confidence=0.99):
+    """
+    Monte-Carlo p-values of additive statistics (one per function of `terms_list`) for arrays of
+    shape (..., layers) of observed and predicted fractions. The observed counts are
+    round(observation * n_counts), `n_counts` being the number of boutons (synapses) of each
+    distribution: a scalar or an array with the shape of the leading dimensions.
+    Returns an array of shape (len(terms_list), ...).
+    """
+
+    observation = np.asarray(observation, dtype=float)
+    prediction = np.asarray(prediction, dtype=float)
+    shape = observation.shape[:-1]
+    n_layers = observation.shape[-1]
+
+    counts = np.round(np.where(mask, observation, 0.0) * np.asarray(n_counts, dtype=float)[..., np.newaxis])
+    counts = counts.reshape(-1, n_layers).astype(np.int64)
+    probabilities = np.where(mask, prediction, 0.0).reshape(-1, n_layers)
+    n = counts.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        probabilities = probabilities / probabilities.sum(axis=-1, keepdims=True)
+    valid = (n > 0) & np.all(np.isfinite(probabilities), axis=-1) & (mask.reshape(-1, n_layers).sum(axis=-1) > 1)
+    expected = n[:, np.newaxis] * np.where(valid[:, np.newaxis], probabilities, 0.0)
+
+    stat_obs = np.array([count_terms(terms, counts, expected).sum(axis=-1) for terms in terms_list])
+    threshold = stat_obs - RTOL * np.maximum(np.abs(stat_obs), 1.0)
+
+    entropy = np.random.SeedSequence(seed).entropy
+    keys = [_stream_key(counts[row], probabilities[row]) if valid[row] else None for row in range(len(n))]
+    z = distributions.norm.isf((1 - confidence) / 2)
+    # samples and exceedances of each statistic (first axis) of each distribution
+    n_samples = np.zeros((len(terms_list), len(n)), dtype=np.int64)
+    exceedances = np.zeros((len(terms_list), len(n)), dtype=np.int64)
+    active = np.repeat(valid[np.newaxis], len(terms_list), axis=0)
+    block = 0
+
+    pool = multiprocessing.Pool(n_workers) if n_workers > 1 else None
+    try:
+        while np.any(active):
+            rows = np.flatnonzero(np.any(active, axis=0))
+            tasks = [(block + i, entropy, [keys[row] for row in rows], terms_list, n[rows], probabilities[rows],
+                      expected[rows], threshold[:, rows], block_size) for i in range(blocks_per_round)]
+            block += blocks_per_round
+            results = pool.map(_simulate_block, tasks) if pool is not None else map(_simulate_block, tasks)
+            counting = active[:, rows]
+            for result in results:
+                exceedances[:, rows] += np.where(counting, result, 0)
+            n_samples[:, rows] += np.where(counting, block_size * blocks_per_round, 0)
+
+            pval = (exceedances[:, rows] + 1.0) / (n_samples[:, rows] + 1.0)
+            half_width = z * np.sqrt(pval * (1 - pval) / n_samples[:, rows])
+            done = (half_width <= np.maximum(atol, rtol * pval)) | (n_samples[:, rows] >= max_samples)
+            active[:, rows] &= ~done
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    pval = np.where(valid, (exceedances + 1.0) / (n_samples + 1.0), np.nan)
+    return pval.reshape((len(terms_list),) + shape)
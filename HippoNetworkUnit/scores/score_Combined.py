@@ -0,0 +1,26 @@
+import sciunit
+
+import numpy as np
+
+
+class CombinedScore(sciunit.Score):
+    """
+    A combination of several scores computed on the same observation and prediction.
+    A dictionary {score type: score value}, e.g. {'PearsonChiSquaredScore': 0.71, 'KLdivScore': 0.02},
+    each value being the aggregate score (mean absolute value over the m-type cells) of that score type.
+    """
+
+    _allowed_types = (dict,)
+
+    _description = ('A dictionary with the aggregate value of each of the scores computed '
+                    'on the same observation and prediction.')
+
+    def __getitem__(self, score_type):
+        return self.score[score_type]
+
+    @property
+    def sort_key(self):
+        return float(np.mean(list(self.score.values())))
+
+    def __str__(self):
+        return ', '.join('%s = %.5f' % (score_type[:-5], value) for score_type, value in self.score.items())
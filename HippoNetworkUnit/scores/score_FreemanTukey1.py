@@ -3,9 +3,10 @@ import sciunit.utils as utils
 import quantities as pq
 
 import numpy as np
-import scipy
 from collections import namedtuple
 
+from . import divergence
+
 FreemanTukeyResult = namedtuple('FreemanTukeyResult', ('statistic_n', 'pvalue'))
 class FreemanTukey1Score(sciunit.Score):
     """
@@ -19,22 +20,32 @@ class FreemanTukey1Score(sciunit.Score):
                     'It is useful in the case of small counts (frequencies)')
 
     @classmethod
-    def compute(cls, observation, prediction):
+    def compute(cls, observation, prediction, pvalue_method='asymptotic', **pvalue_options):
         """
         Computes a Freeman-Tukey score from an observation and a prediction.
+        `pvalue_method` selects how the p-value is obtained (one of divergence.PVALUE_METHODS),
+        with `pvalue_options` for it (e.g. n_counts for 'exact').
         """
 
         obs_values = observation[~np.isnan(observation)]
         pred_values = prediction[~np.isnan(prediction)]
 
-        assert(all(x<=1.00 for x in obs_values) and all(x<=1.00 for x in pred_values)), \
+        if type(obs_values) is pq.quantity.Quantity:
+            obs_values = obs_values.magnitude
+        if type(pred_values) is pq.quantity.Quantity:
+            pred_values = pred_values.magnitude
+
+        assert(np.all(obs_values <= 1.00) and np.all(pred_values <= 1.00)), \
             "Probabiltity values should not be larger than 1.0"
         obs_values *= 100
-        pred_values *= 100        
+        pred_values *= 100
 
         dof = len(obs_values)-1  # degrees of freedom for the Chi-squared distribution
-        stat = 4*sum((np.sqrt(obs_values) - np.sqrt(pred_values))**2)
-        pval = scipy.stats.distributions.chi2.sf(stat, dof)
+        stat = 4*np.sum((np.sqrt(obs_values) - np.sqrt(pred_values))**2)
+        if pvalue_method in ('exact', 'montecarlo'):
+            pval = cls.compute_batch(observation, prediction, pvalue_method, **pvalue_options).pvalue
+        else:
+            pval = divergence.chi2_pvalue(stat, dof, pvalue_method)
 
         stat = utils.assert_dimensionless(stat)
         pval = utils.assert_dimensionless(pval)
@@ -47,6 +58,22 @@ class FreemanTukey1Score(sciunit.Score):
 
         return FreemanTukey1Score(FreemanTukey_Result)
 
+    @classmethod
+    def compute_batch(cls, observation_matrix, prediction_matrix, pvalue_method='asymptotic', **pvalue_options):
+        """
+        Computes Freeman-Tukey scores for many m-types (and models) in one vectorized pass.
+        Both arguments are arrays of shape (m-types x layers) or (models x m-types x layers).
+        `pvalue_method` selects how the p-values are obtained (one of divergence.PVALUE_METHODS),
+        with `pvalue_options` for it (e.g. n_counts for 'exact').
+        Returns a FreemanTukeyResult of arrays with the shape of the leading dimensions.
+        """
+
+        result = divergence.compute_divergences(observation_matrix, prediction_matrix, (cls.__name__,),
+                                                pvalue_method=pvalue_method, **pvalue_options)
+        result = result[cls.__name__]
+
+        return FreemanTukeyResult(result.statistic_n, result.pvalue)
+
     @property
     def sort_key(self):
         return self.score
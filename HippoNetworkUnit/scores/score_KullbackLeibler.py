@@ -1,10 +1,11 @@
 import sciunit
 import sciunit.utils as utils
-import quantities as pq
 
 import numpy as np
 from scipy.stats import entropy
 
+from . import divergence
+
 class KLdivScore(sciunit.Score):
     """
     A Kullback-Leibler divergence score. A float giving the Kullback-Leibler divergence (KLdiv),
@@ -33,6 +34,18 @@ class KLdivScore(sciunit.Score):
         value = utils.assert_dimensionless(value)
         return KLdivScore(value)
 
+    @classmethod
+    def compute_batch(cls, observation_matrix, prediction_matrix):
+        """
+        Computes KLdiv-scores for many m-types (and models) in one vectorized pass.
+        Both arguments are arrays of shape (m-types x layers) or (models x m-types x layers).
+        Returns an array with the shape of the leading dimensions.
+        """
+
+        result = divergence.compute_divergences(observation_matrix, prediction_matrix, (cls.__name__,))
+
+        return result[cls.__name__].statistic
+
     @property
     def sort_key(self):
         return self.score
@@ -3,9 +3,10 @@ import sciunit.utils as utils
 import quantities as pq
 
 import numpy as np
-from scipy.stats import power_divergence
 from collections import namedtuple
 
+from . import divergence
+
 Log_LikelihoodRatioResult = namedtuple('Log_LikelihoodRatioResult', ('statistic_n', 'pvalue'))
 class Log_LikelihoodRatioScore(sciunit.Score):
     """
@@ -19,39 +20,62 @@ class Log_LikelihoodRatioScore(sciunit.Score):
                     'a Log-Likelihood goodness-of-fit test. Also known as the G-test')
 
     @classmethod
-    def compute(cls, observation, prediction):
+    def compute(cls, observation, prediction, pvalue_method='asymptotic', **pvalue_options):
         """
         Computes a Log-Likelihood Ratio score from an observation and a prediction.
+        `pvalue_method` selects how the p-value is obtained (one of divergence.PVALUE_METHODS),
+        with `pvalue_options` for it (e.g. n_counts for 'exact').
         """
 
         obs_values = observation[~np.isnan(observation)]
         pred_values = prediction[~np.isnan(prediction)]
 
-        assert(all(x<=1.00 for x in obs_values) and all(x<=1.00 for x in pred_values)), \
-            "Probabiltity values should not be larger than 1.0"
-        obs_values *= 100
-        pred_values *= 100
-
         if type(obs_values) is pq.quantity.Quantity:
             obs_values = obs_values.magnitude
         if type(pred_values) is pq.quantity.Quantity:
             pred_values = pred_values.magnitude
 
-        Log_LikelihoodRatio_Result = power_divergence(f_obs=obs_values, f_exp=pred_values, lambda_='log-likelihood')
+        assert(np.all(obs_values <= 1.00) and np.all(pred_values <= 1.00)), \
+            "Probabiltity values should not be larger than 1.0"
+        obs_values *= 100
+        pred_values *= 100
 
-        utils.assert_dimensionless(Log_LikelihoodRatio_Result.statistic)
-        utils.assert_dimensionless(Log_LikelihoodRatio_Result.pvalue)
+        # Same statistic as power_divergence(f_obs=obs_values, f_exp=pred_values, lambda_='log-likelihood'),
+        # but with 0.0 for the empty layers where nothing is predicted either (as in compute_batch)
+        dof = len(obs_values)-1  # degrees of freedom for the Chi-squared distribution
+        stat = divergence.log_likelihood_terms(obs_values, pred_values).sum()
+        if pvalue_method in ('exact', 'montecarlo'):
+            pval = cls.compute_batch(observation, prediction, pvalue_method, **pvalue_options).pvalue
+        else:
+            pval = divergence.chi2_pvalue(stat, dof, pvalue_method)
+
+        utils.assert_dimensionless(stat)
+        utils.assert_dimensionless(pval)
 
         # Obtaining a score value normalized respect to the mean and std of the Chi-squared distribution
-        dof = len(obs_values)-1  # degrees of freedom for the Chi-squared distribution
-        stat = Log_LikelihoodRatio_Result.statistic
         chisq_mean = dof
         chisq_std = np.sqrt(2*dof)
         stat_n = abs(stat-chisq_mean)/chisq_std
-        Log_LikelihoodRatio_result = Log_LikelihoodRatioResult(stat_n, Log_LikelihoodRatio_Result.pvalue)
+        Log_LikelihoodRatio_result = Log_LikelihoodRatioResult(stat_n, pval)
 
         return Log_LikelihoodRatioScore(Log_LikelihoodRatio_result)
 
+    @classmethod
+    def compute_batch(cls, observation_matrix, prediction_matrix, pvalue_method='asymptotic', **pvalue_options):
+        """
+        Computes Log-Likelihood Ratio scores for many m-types (and models) in one vectorized pass.
+        Both arguments are arrays of shape (m-types x layers) or (models x m-types x layers).
+        `pvalue_method` selects how the p-values are obtained (one of divergence.PVALUE_METHODS),
+        with `pvalue_options` for it (e.g. n_counts for 'exact').
+        Returns a Log_LikelihoodRatioResult of arrays with the shape of the leading dimensions.
+        """
+
+        result = divergence.compute_divergences(observation_matrix, prediction_matrix, (cls.__name__,),
+                                                pvalue_method=pvalue_method, **pvalue_options)
+        result = result[cls.__name__]
+
+        return Log_LikelihoodRatioResult(result.statistic_n, result.pvalue)
+
     @property
     def sort_key(self):
         return self.score
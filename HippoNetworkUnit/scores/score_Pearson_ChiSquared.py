@@ -6,6 +6,8 @@ import numpy as np
 from scipy.stats import power_divergence
 from collections import namedtuple
 
+from . import divergence
+
 PearsonResult = namedtuple('PearsonResult', ('statistic_n', 'pvalue'))
 class PearsonChiSquaredScore(sciunit.Score):
     """
@@ -19,25 +21,27 @@ class PearsonChiSquaredScore(sciunit.Score):
                     'of a Pearson''s chi-squared goodness-of-fit test')
 
     @classmethod
-    def compute(cls, observation, prediction):
+    def compute(cls, observation, prediction, pvalue_method='asymptotic', **pvalue_options):
         """
         Computes a Pearson's chi-squared score from an observation and a prediction.
+        `pvalue_method` selects how the p-value is obtained (one of divergence.PVALUE_METHODS),
+        with `pvalue_options` for it (e.g. n_counts for 'exact').
         """
 
         obs_values = observation[~np.isnan(observation)]
         pred_values = prediction[~np.isnan(prediction)]
 
-        assert(all(x<=1.00 for x in obs_values) and all(x<=1.00 for x in pred_values)), \
-            "Probabiltity values should not be larger than 1.0"
-
-        obs_values *= 100
-        pred_values *= 100
-
         if type(obs_values) is pq.quantity.Quantity:
             obs_values = obs_values.magnitude
         if type(pred_values) is pq.quantity.Quantity:
             pred_values = pred_values.magnitude
 
+        assert(np.all(obs_values <= 1.00) and np.all(pred_values <= 1.00)), \
+            "Probabiltity values should not be larger than 1.0"
+
+        obs_values *= 100
+        pred_values *= 100
+
         Pearson_Result = power_divergence(f_obs=obs_values, f_exp=pred_values, lambda_='pearson')
 
         utils.assert_dimensionless(Pearson_Result.statistic)
@@ -46,13 +50,34 @@ class PearsonChiSquaredScore(sciunit.Score):
         # Obtaining a score value normalized respect to the mean and std of the Chi-squared distribution
         dof = len(obs_values)-1  # degrees of freedom for the Chi-squared distribution
         stat = Pearson_Result.statistic
+        pval = Pearson_Result.pvalue
+        if pvalue_method in ('exact', 'montecarlo'):
+            pval = cls.compute_batch(observation, prediction, pvalue_method, **pvalue_options).pvalue
+        elif pvalue_method != 'asymptotic':
+            pval = divergence.chi2_pvalue(stat, dof, pvalue_method)
         chisq_mean = dof
         chisq_std = np.sqrt(2*dof)
         stat_n = abs(stat-chisq_mean)/chisq_std
-        Pearson_result = PearsonResult(stat_n, Pearson_Result.pvalue)
+        Pearson_result = PearsonResult(stat_n, pval)
 
         return PearsonChiSquaredScore(Pearson_result)
 
+    @classmethod
+    def compute_batch(cls, observation_matrix, prediction_matrix, pvalue_method='asymptotic', **pvalue_options):
+        """
+        Computes Pearson's chi-squared scores for many m-types (and models) in one vectorized pass.
+        Both arguments are arrays of shape (m-types x layers) or (models x m-types x layers).
+        `pvalue_method` selects how the p-values are obtained (one of divergence.PVALUE_METHODS),
+        with `pvalue_options` for it (e.g. n_counts for 'exact').
+        Returns a PearsonResult of arrays with the shape of the leading dimensions.
+        """
+
+        result = divergence.compute_divergences(observation_matrix, prediction_matrix, (cls.__name__,),
+                                                pvalue_method=pvalue_method, **pvalue_options)
+        result = result[cls.__name__]
+
+        return PearsonResult(result.statistic_n, result.pvalue)
+
     @property
     def sort_key(self):
         return self.score
@@ -0,0 +1,205 @@
+# Parameter sweeps: one test judged on many models in parallel
+
+"""
+sweep(test, models) judges a test on each of an iterable of models (or of their predictions,
+i.e. the dictionaries returned by get_CA1_laminar_distribution_synapses_info) using a pool of
+worker processes, and yields a SweepResult for each model as soon as it is judged (in order of
+completion; `index` gives the position of the model in the input).
+
+- The test, with its formatted observation, is sent once to each worker, not with every model.
+- Models are sent in chunks of `chunk_size`, and at most `max_pending` chunks are queued at any
+  time, so the input iterable (e.g. a generator over parameter sets) is only consumed as fast
+  as the workers judge the models, and memory does not grow with the size of the sweep.
+- Errors of a model are reported in its SweepResult and do not stop the sweep.
+- With n_workers=1 the models are judged in this process.
+
+Example:
+    test = CA1_laminar_distribution_synapses_PearsonTest(observation=observation)
+    for result in sweep(test, (make_model(params) for params in grid), n_workers=64):
+        print(result.index, result.score)
+
+Instead of (or besides) one figure per model, the collected results can be summarized with
+write_summary in a single figure: a heatmap of the scores (models x m-types) per score type.
+For large sweeps, set the figures_mode of the test to 'none' and only write the summary:
+    test.figures_mode = 'none'
+    write_summary(list(sweep(test, models)), 'summary.png')
+
+It can also be run from the command line, with one JSON file per prediction, or JSON Lines
+files (.jsonl, or '-' for the standard input) holding many of them, which are streamed (see
+HippoNetworkUnit.predictions):
+    python -m HippoNetworkUnit.sweep CA1_laminar_distribution_synapses_PearsonTest observation.json \\
+        predictions/*.json --workers 64 --no-figures --summary summary.png > results.jsonl
+    simulate | python -m HippoNetworkUnit.sweep CA1_laminar_distribution_synapses_PearsonTest observation.json - \\
+        --workers 64 --no-figures > results.jsonl
+"""
+
+import os
+import sys
+import json
+import pickle
+import itertools
+import collections
+from concurrent import futures
+
+import numpy as np
+
+SweepResult = collections.namedtuple('SweepResult', ['index', 'model_name', 'score', 'figures', 'scores_cell', 'error'])
+
+# the test judged by a worker process (set by _initialize_worker)
+_worker_test = None
+
+
+def _initialize_worker(test_pickle):
+    global _worker_test
+    # the workers only save figures to files
+    import matplotlib
+    matplotlib.use('Agg')
+    _worker_test = pickle.loads(test_pickle)
+
+
+def _judge(test, index, model, model_name):
+    """ Judges one model (or prediction dictionary) and returns its SweepResult """
+
+    if isinstance(model, dict):
+        from HippoNetworkUnit.utils import CA1_laminar_distribution_synapses
+        model = CA1_laminar_distribution_synapses(name=model_name % index, CA1_laminar_distribution_synapses_model=model)
+    try:
+        score = test.judge(model)
+        return SweepResult(index, model.name, score.score, score.related_data.get('figures', []),
+                           score.related_data.get('scores_cell'), None)
+    except Exception as error:
+        return SweepResult(index, getattr(model, 'name', None), None, [], None, repr(error))
+
+
+def _judge_chunk(chunk, model_name):
+    from HippoNetworkUnit.figures import flush_figures
+    results = [_judge(_worker_test, index, model, model_name) for index, model in chunk]
+    # the figures rendered in the background are saved before the results are reported
+    flush_figures()
+    return results
+
+
+def sweep(test, models, n_workers=None, chunk_size=4, max_pending=None, model_name='model_%d'):
+    """
+    Judges `test` on each of `models` (sciunit models or prediction dictionaries, the latter being
+    named `model_name % index`) with `n_workers` processes (all the CPUs by default; 1 to judge
+    them in this process) and yields their SweepResults as they are completed.
+    At most `max_pending` (default: 2 * n_workers) chunks of `chunk_size` models are queued.
+    """
+
+    models = enumerate(models)
+    n_workers = n_workers or os.cpu_count() or 1
+
+    if n_workers == 1:
+        for index, model in models:
+            yield _judge(test, index, model, model_name)
+        return
+
+    max_pending = max_pending or 2 * n_workers
+    chunks = iter(lambda: list(itertools.islice(models, chunk_size)), [])
+    with futures.ProcessPoolExecutor(n_workers, initializer=_initialize_worker,
+                                     initargs=(pickle.dumps(test),)) as executor:
+        pending = set()
+        for chunk in itertools.islice(chunks, max_pending):
+            pending.add(executor.submit(_judge_chunk, chunk, model_name))
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for chunk in itertools.islice(chunks, len(done)):
+                pending.add(executor.submit(_judge_chunk, chunk, model_name))
+            for future in done:
+                for result in future.result():
+                    yield result
+
+
+def collect_scores(results):
+    """
+    Scores of the m-types of each model of a sweep, as a dictionary {score type: (model names,
+    m-types, array models x m-types)}, in the order of the models in the sweep (results with
+    errors are left out)
+    """
+
+    results = sorted((result for result in results if result.error is None and result.scores_cell),
+                     key=lambda result: result.index)
+    collected = collections.OrderedDict()
+    for result in results:
+        for score_type, scores_cell_df in result.scores_cell.items():
+            collected.setdefault(score_type, []).append((result.model_name, scores_cell_df[scores_cell_df.columns[0]]))
+
+    summary = collections.OrderedDict()
+    for score_type, rows in collected.items():
+        mtypes = list(rows[0][1].index)
+        summary[score_type] = ([model_name for model_name, _ in rows], mtypes,
+                               np.array([scores.reindex(mtypes).values for _, scores in rows], dtype=float))
+    return summary
+
+
+def write_summary(results, filename, dpi=100):
+    """
+    Writes one figure (.svg or .png) summarizing the results of a sweep: a heatmap of the
+    scores (models x m-types) per score type, side by side. Returns its filename.
+    """
+
+    from HippoNetworkUnit import charts
+
+    panels = [(model_names, mtypes, values, score_type[:-5] + '-score')
+              for score_type, (model_names, mtypes, values) in collect_scores(results).items()]
+    if not panels:
+        raise ValueError("No results to summarize")
+    return charts.write_heatmap(filename, panels, dpi)
+
+
+def main(argv=None):
+    import argparse
+    import HippoNetworkUnit.tests as hpn_tests
+
+    parser = argparse.ArgumentParser(prog='python -m HippoNetworkUnit.sweep',
+                                     description='Judges a test on many predictions, writing one JSON line per model')
+    parser.add_argument('test', help='name of the test, e.g. CA1_laminar_distribution_synapses_PearsonTest')
+    parser.add_argument('observation', help='JSON file with the observation')
+    parser.add_argument('predictions', nargs='+', help="JSON files with the predictions, one per model, or JSON Lines files "
+                                                          "(.jsonl, or '-' for the standard input) with one per line")
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: all CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=4, help='number of models sent to a worker at once')
+    parser.add_argument('--no-figures', action='store_true', help='do not save a figure per model')
+    parser.add_argument('--summary', help='file (.svg or .png) with a heatmap of the scores of all the models')
+    args = parser.parse_args(argv)
+
+    with open(args.observation) as file_:
+        observation = json.load(file_)
+    test = getattr(hpn_tests, args.test)(observation=observation)
+    test.verbose = 0  # stdout only holds the results
+    if args.no_figures:
+        test.figures_mode = 'none'
+
+    def models():
+        from HippoNetworkUnit.utils import CA1_laminar_distribution_synapses
+        from HippoNetworkUnit.predictions import iter_models
+        for filename in args.predictions:
+            if filename == '-' or filename.endswith('.jsonl'):
+                for model in iter_models(filename):
+                    yield model
+                continue
+            with open(filename) as file_:
+                yield CA1_laminar_distribution_synapses(name=os.path.splitext(os.path.basename(filename))[0],
+                                                        CA1_laminar_distribution_synapses_model=json.load(file_))
+
+    results = []
+    for result in sweep(test, models(), n_workers=args.workers, chunk_size=args.chunk_size):
+        if args.summary:
+            results.append(result)
+        score = result.score
+        if isinstance(score, dict):
+            score = dict((key, float(value)) for key, value in score.items())
+        elif score is not None:
+            score = float(score)
+        json.dump({'model': result.model_name, 'score': score, 'figures': result.figures,
+                   'error': result.error}, sys.stdout)
+        sys.stdout.write('\n')
+        sys.stdout.flush()
+
+    if args.summary:
+        write_summary(results, args.summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+# Out-of-core histograms of the synapses of a circuit by m-type and layer
+
+"""
+count_synapses reads a table of synapses (one row per synapse, with the m-type of its
+presynaptic neuron and the layer it lies in) from a local file, in chunks of `chunk_size` rows,
+and counts the synapses of each m-type in each layer. Only one chunk per process is in memory
+at any time, so the peak memory depends on the chunk size, not on the size of the circuit.
+
+Supported files (the columns are given by name):
+- NumPy (.npy): a structured array, memory-mapped
+- HDF5 (.h5, .hdf5; requires h5py): one dataset per column, in the group `group`
+- Parquet (.parquet; requires pyarrow): read by row groups
+The m-types and layers are given either as integer codes (indices in `mtype_names` and
+`layers`) or as names.
+
+With n_workers > 1 the chunks are counted by worker processes, each one adding its counts to
+its own slice of an accumulator in shared memory, which is summed at the end.
+
+synapses_info turns the counts into the dictionary of get_CA1_laminar_distribution_synapses_info:
+
+    counts = count_synapses('circuit.h5', MTYPES, group='synapses', n_workers=32)
+    model = CA1_laminar_distribution_synapses(name='circuit',
+                                              CA1_laminar_distribution_synapses_model=synapses_info(counts, MTYPES))
+"""
+
+import os
+import itertools
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent import futures
+
+import numpy as np
+
+from HippoNetworkUnit.table import LaminarDistributionTable, LAYERS
+
+# default number of rows read at once
+CHUNK_SIZE = 2**20
+
+FORMATS = {'.npy': 'numpy', '.h5': 'hdf5', '.hdf5': 'hdf5', '.parquet': 'parquet'}
+
+
+def _file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError("Unknown synapses file format '%s'. Use one of: %s" % (extension, ", ".join(FORMATS)))
+    return FORMATS[extension]
+
+
+class _Reader(object):
+    """ Chunks of the columns of a synapses file; `tasks` lists them, `read` reads one of them """
+
+    def __init__(self, path, columns, chunk_size, group=None):
+        self.path, self.columns, self.chunk_size, self.group = path, tuple(columns), chunk_size, group
+        self.file_format = _file_format(path)
+        self._file = None
+
+    def _open(self):
+        if self._file is not None:
+            return self._file
+        if self.file_format == 'numpy':
+            self._file = np.load(self.path, mmap_mode='r')
+            if self._file.dtype.names is None:
+                raise ValueError("%s must hold a structured array with the fields: %s"
+                                 % (self.path, ", ".join(self.columns)))
+        elif self.file_format == 'hdf5':
+            import h5py
+            file_ = h5py.File(self.path, 'r')
+            self._file = file_[self.group] if self.group else file_
+        else:
+            import pyarrow.parquet
+            self._file = pyarrow.parquet.ParquetFile(self.path)
+        return self._file
+
+    def tasks(self):
+        """ Chunks to read: (start, stop) rows, or (row group, None) for Parquet files """
+
+        file_ = self._open()
+        if self.file_format == 'parquet':
+            return [(i, None) for i in range(file_.num_row_groups)]
+        if self.file_format == 'numpy':
+            n_rows = len(file_)
+        else:
+            lengths = set(len(file_[column]) for column in self.columns)
+            if len(lengths) != 1:
+                raise ValueError("The columns %s of %s have different lengths" % (", ".join(self.columns), self.path))
+            n_rows = lengths.pop()
+        return [(start, min(start + self.chunk_size, n_rows)) for start in range(0, n_rows, self.chunk_size)]
+
+    def read(self, task):
+        """ Arrays of the columns of a chunk (several of them for a Parquet row group) """
+
+        file_ = self._open()
+        start, stop = task
+        if self.file_format == 'parquet':
+            for batch in file_.iter_batches(batch_size=self.chunk_size, row_groups=[start], columns=list(self.columns)):
+                yield [batch.column(i).to_numpy(zero_copy_only=False) for i in range(len(self.columns))]
+        else:
+            yield [np.asarray(file_[column][start:stop]) for column in self.columns]
+
+    def close(self):
+        if self._file is not None and self.file_format == 'hdf5':
+            getattr(self._file, 'file', self._file).close()
+        self._file = None
+
+    def __getstate__(self):
+        return (self.path, self.columns, self.chunk_size, self.group)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+def _encode(column, names, what):
+    """ Integer codes of a column of names or codes """
+
+    if column.dtype.kind in 'iu':
+        if column.size and (column.min() < 0 or column.max() >= len(names)):
+            raise ValueError("The %s codes must be in [0, %d)" % (what, len(names)))
+        return column
+    if column.dtype.kind == 'O' and column.size and isinstance(column.flat[0], bytes):
+        # variable-length strings of HDF5 files are read by h5py as object arrays of bytes
+        column = column.astype('S')
+    if column.dtype.kind == 'S':
+        # compared as bytes, without decoding the column
+        names = np.array([name.encode('utf-8') for name in names])
+    else:
+        column = column.astype(str)
+        names = np.array(names)
+    order = np.argsort(names)
+    sorted_names = names[order]
+    positions = np.searchsorted(sorted_names, column).clip(0, len(names) - 1)
+    unknown = sorted_names[positions] != column
+    if np.any(unknown):
+        name = column[unknown][0]
+        raise ValueError("Unknown %s '%s'" % (what, name.decode('utf-8') if isinstance(name, bytes) else name))
+    return order[positions]
+
+
+def _histogram(mtype_column, layer_column, mtype_names, layers):
+    """ Counts (m-types x layers) of the synapses of a chunk """
+
+    mtype_codes = _encode(mtype_column, mtype_names, 'm-type')
+    layer_codes = _encode(layer_column, layers, 'layer')
+    index = mtype_codes.astype(np.int64) * len(layers) + layer_codes
+    return np.bincount(index, minlength=len(mtype_names) * len(layers)).reshape(len(mtype_names), len(layers))
+
+
+# state of a worker process (set by _initialize_worker)
+_worker = None
+
+
+def _initialize_worker(reader, mtype_names, layers, memory_name, n_workers, slots):
+    global _worker
+    memory = shared_memory.SharedMemory(name=memory_name)
+    with slots.get_lock():
+        slot = slots.value
+        slots.value += 1
+    accumulator = np.ndarray((n_workers, len(mtype_names), len(layers)), dtype=np.int64, buffer=memory.buf)[slot]
+    _worker = (reader, mtype_names, layers, memory, accumulator)
+
+
+def _count_chunk(task):
+    reader, mtype_names, layers, _, accumulator = _worker
+    for mtype_column, layer_column in reader.read(task):
+        accumulator += _histogram(mtype_column, layer_column, mtype_names, layers)
+
+
+def count_synapses(path, mtype_names, layers=LAYERS, mtype_column='mtype', layer_column='layer',
+                   chunk_size=CHUNK_SIZE, n_workers=1, group=None):
+    """
+    Counts the synapses of the file `path` of each m-type (`mtype_names`) in each of the
+    `layers`, reading the columns `mtype_column` and `layer_column` (in the HDF5 group `group`)
+    by chunks of `chunk_size` rows with `n_workers` processes (None: all the CPUs).
+    Returns an integer array (m-types x layers).
+    """
+
+    mtype_names = [str(name) for name in mtype_names]
+    layers = [str(layer) for layer in layers]
+    reader = _Reader(path, (mtype_column, layer_column), chunk_size, group)
+    try:
+        tasks = reader.tasks()
+    finally:
+        reader.close()
+    n_workers = min(n_workers or os.cpu_count() or 1, max(len(tasks), 1))
+
+    if n_workers == 1:
+        counts = np.zeros((len(mtype_names), len(layers)), dtype=np.int64)
+        try:
+            for chunk in itertools.chain.from_iterable(reader.read(task) for task in tasks):
+                counts += _histogram(chunk[0], chunk[1], mtype_names, layers)
+        finally:
+            reader.close()
+        return counts
+
+    shape = (n_workers, len(mtype_names), len(layers))
+    memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+    try:
+        accumulators = np.ndarray(shape, dtype=np.int64, buffer=memory.buf)
+        accumulators[:] = 0
+        slots = multiprocessing.Value('i', 0)
+        with futures.ProcessPoolExecutor(n_workers, initializer=_initialize_worker,
+                                         initargs=(reader, mtype_names, layers, memory.name, n_workers, slots)) as executor:
+            for _ in executor.map(_count_chunk, tasks):
+                pass
+        counts = accumulators.sum(axis=0)
+        del accumulators
+    finally:
+        memory.close()
+        memory.unlink()
+    return counts
+
+
+def synapses_info(counts, mtype_names, layers=LAYERS):
+    """
+    Dictionary {mtype: {layer: {"value": fraction}}} (see get_CA1_laminar_distribution_synapses_info)
+    of the counts (m-types x layers) of the synapses
+    """
+
+    counts = np.asarray(counts, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fractions = counts / counts.sum(axis=1, keepdims=True)
+    return LaminarDistributionTable(fractions, mtype_names, layers).to_dict('value')
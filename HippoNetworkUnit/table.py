@@ -0,0 +1,182 @@
+# Array-backed table of laminar distributions
+
+"""
+LaminarDistributionTable holds the fractions of synapses (or boutons) of several m-types across
+the layers of Hippocampus CA1 as one 2-D float array (m-types x layers) plus the m-type and
+layer names, so that the tests and scores work on whole arrays instead of nested dictionaries
+of per-value Python objects.
+
+The layers are aligned by name, not by the order of the dictionaries: a table is built with
+explicit layer columns (by default those found in the data, with OUT last) and another table
+is lined up with it with select(mtypes, layers). A missing OUT layer is 0.0 (the observations
+do not give it), other missing layers are NaN (and left out by the scores).
+
+Tables are immutable (their array is read-only), so they can be shared and cached.
+
+Example:
+    observation = LaminarDistributionTable.from_dict(json.load(open('observation.json')))
+    prediction = LaminarDistributionTable.from_dict(model.get_CA1_laminar_distribution_synapses_info())
+    prediction = prediction.select(observation.mtypes, observation.layers)
+"""
+
+import sys
+import json
+from functools import lru_cache
+
+import numpy as np
+
+LAYERS = ('SO', 'SP', 'SR', 'SLM', 'OUT')
+
+OUT = 'OUT'
+
+
+@lru_cache(maxsize=256)
+def _layer_name(layer):
+    layer = str(layer)
+    return OUT if layer.lower() == 'out' else sys.intern(layer)
+
+
+class LaminarDistributionTable(object):
+    """
+    Fractions (m-types x layers) with the names of the m-types and of the layers
+    """
+
+    __slots__ = ('values', 'mtypes', 'layers', '_mtype_index', '_layer_index')
+
+    def __init__(self, values, mtypes, layers=LAYERS):
+        values = np.array(values, dtype=float)
+        mtypes = tuple(sys.intern(str(mtype)) for mtype in mtypes)
+        layers = tuple(_layer_name(layer) for layer in layers)
+        if values.shape != (len(mtypes), len(layers)):
+            raise ValueError("The values must have shape (m-types, layers) = (%d, %d), not %s"
+                             % (len(mtypes), len(layers), values.shape))
+        if len(set(mtypes)) != len(mtypes) or len(set(layers)) != len(layers):
+            raise ValueError("The m-types and the layers of a table must be unique")
+        if np.any(values > 1.0):
+            raise ValueError("Fractions must not be larger than 1.0")
+        values.flags.writeable = False
+        self.values, self.mtypes, self.layers = values, mtypes, layers
+        self._mtype_index = dict((mtype, i) for i, mtype in enumerate(mtypes))
+        self._layer_index = dict((layer, j) for j, layer in enumerate(layers))
+
+    # ----------------------------------------------------------------------
+
+    @classmethod
+    def from_dict(cls, data, layers=None):
+        """
+        Table of a dictionary {mtype: {layer: {"mean" or "value": X}}} (X a number or a string).
+        `layers` gives the columns; by default those found in the data, in order, with OUT last.
+        """
+
+        mtypes = list(data)
+        rows_layers = [tuple(dict0) for dict0 in data.values()]
+        raw = [next(iter(dict1.values())) if isinstance(dict1, dict) else dict1
+               for dict0 in data.values() for dict1 in dict0.values()]
+        if rows_layers and rows_layers.count(rows_layers[0]) == len(rows_layers):
+            # all the m-types give the same layers, in the same order (the usual case)
+            row_names = [_layer_name(layer) for layer in rows_layers[0]]
+            layer_names = None
+        else:
+            row_names = None
+            layer_names = [_layer_name(layer) for row in rows_layers for layer in row]
+
+        if layers is None:
+            found = row_names if layer_names is None else layer_names
+            layers = [layer for layer in dict.fromkeys(found) if layer != OUT] + [OUT]
+        else:
+            layers = [_layer_name(layer) for layer in layers]
+        layer_index = dict((layer, j) for j, layer in enumerate(layers))
+        try:
+            columns = [layer_index[layer] for layer in (row_names if layer_names is None else layer_names)]
+        except KeyError as error:
+            raise ValueError("Unknown layer %s. Expected: %s" % (error, ", ".join(layers)))
+
+        values = np.full((len(mtypes), len(layers)), np.nan)
+        if OUT in layer_index:
+            values[:, layer_index[OUT]] = 0.0
+        raw = np.array(raw, dtype=float)
+        if layer_names is None:
+            values[:, columns] = raw.reshape(len(mtypes), len(columns))
+        else:
+            rows = np.repeat(np.arange(len(mtypes)), [len(row) for row in rows_layers])
+            values[rows, columns] = raw
+        return cls(values, mtypes, layers)
+
+    @classmethod
+    def from_json(cls, source, layers=None):
+        """ Table of a JSON text, or file object, in the dictionary format of from_dict """
+
+        data = json.load(source) if hasattr(source, 'read') else json.loads(source)
+        return cls.from_dict(data, layers)
+
+    @classmethod
+    def from_arrays(cls, values, mtypes, layers=LAYERS):
+        """ Table of an array (m-types x layers) """
+
+        return cls(values, mtypes, layers)
+
+    # ----------------------------------------------------------------------
+
+    def select(self, mtypes=None, layers=None):
+        """
+        Table with the given m-types and layers (in that order), e.g. to line up a prediction with
+        an observation. Raises KeyError if any of them is not in the table.
+        """
+
+        mtypes = self.mtypes if mtypes is None else tuple(mtypes)
+        layers = self.layers if layers is None else tuple(_layer_name(layer) for layer in layers)
+        if mtypes == self.mtypes and layers == self.layers:
+            return self
+        rows = [self._mtype_index[mtype] for mtype in mtypes]
+        columns = [self._layer_index[layer] for layer in layers]
+        return type(self)(self.values[np.ix_(rows, columns)], mtypes, layers)
+
+    def to_dict(self, key='value'):
+        """ Dictionary {mtype: {layer: {key: X}}} of the table """
+
+        return dict((mtype, dict((layer, {key: value}) for layer, value in zip(self.layers, row)))
+                    for mtype, row in zip(self.mtypes, self.values.tolist()))
+
+    def content(self):
+        """ JSON-like content of the table (e.g. to hash it) """
+
+        return {'mtypes': self.mtypes, 'layers': self.layers, 'values': self.values.tolist()}
+
+    # ----------------------------------------------------------------------
+    # read-only mapping of the m-types to their rows
+
+    def __getitem__(self, mtype):
+        return self.values[self._mtype_index[mtype]]
+
+    def __contains__(self, mtype):
+        return mtype in self._mtype_index
+
+    def __iter__(self):
+        return iter(self.mtypes)
+
+    def __len__(self):
+        return len(self.mtypes)
+
+    def keys(self):
+        return list(self.mtypes)
+
+    def items(self):
+        return list(zip(self.mtypes, self.values))
+
+    def __eq__(self, other):
+        return (isinstance(other, LaminarDistributionTable) and self.mtypes == other.mtypes
+                and self.layers == other.layers and np.array_equal(self.values, other.values, equal_nan=True))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return (self.values, self.mtypes, self.layers)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self):
+        return 'LaminarDistributionTable(%d m-types x layers %s)' % (len(self.mtypes), ", ".join(self.layers))
@@ -1,13 +1,32 @@
 # Loads Python classes for validation-tests to be used in HippoNetworkUnit
 
 # tests/
-# from . import test_CA1_laminar_distribution_synapses
-# from . import test_CA1Layers_NeuritePathDistance_MeanSD
-from os.path import dirname, basename, isfile
-import glob
+import importlib
 
-files = glob.glob(dirname(__file__)+"/test_*.py")
-modules = [ basename(f)[:-3] for f in files if isfile(f)]
+from .. import registry
 
-for module in modules:
-    exec("from %s import *" % module)
+"""
+NOTE: Validation-tests are listed in HippoNetworkUnit.registry (or registered by other packages
+through entry points). Their modules import matplotlib, seaborn and pandas, so they are only
+imported the first time one of their classes is accessed.
+"""
+
+
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    try:
+        value = registry.resolve('tests', name)
+    except KeyError:
+        try:
+            return importlib.import_module('.' + name, __name__)
+        except ImportError as error:
+            if getattr(error, 'name', None) != __name__ + '.' + name:
+                raise
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(registry.names('tests')))
@@ -0,0 +1,471 @@
+import sciunit
+
+import HippoNetworkUnit
+import HippoNetworkUnit.capabilities as hpn_cap
+import HippoNetworkUnit.cache as hpn_cache
+import HippoNetworkUnit.figures as hpn_figures
+import HippoNetworkUnit.charts as hpn_charts
+from HippoNetworkUnit.table import LaminarDistributionTable, LAYERS
+from HippoNetworkUnit.neurons import aggregate_neurons
+from HippoNetworkUnit.figures import new_figure
+
+import quantities
+import os
+import contextvars
+
+# For data manipulation
+import numpy as np
+import pandas as pd
+
+# The figures are drawn without pyplot (see HippoNetworkUnit.figures), so the tests never need a display.
+# HIPPONETWORKUNIT_HEADLESS=1 also forces matplotlib to not use any Xwindows backend for the rest of the process.
+import matplotlib
+if os.environ.get('HIPPONETWORKUNIT_HEADLESS', '0') not in ('', '0'):
+    matplotlib.use('Agg')
+import seaborn as sns
+
+# number of models whose last per-m-type results are kept to rescore only the m-types that changed
+PREVIOUS_RESULTS_SIZE = 16
+
+# 'mtype': the models give a distribution per m-type (Provides_CA1_laminar_distribution_synapses_info);
+# 'neuron': they give the counts of each neuron (Provides_CA1_laminar_distribution_synapses_per_neuron_info)
+PREDICTION_MODES = ('mtype', 'neuron')
+
+# capability (in HippoNetworkUnit.capabilities) required of the models in each prediction mode
+PREDICTION_CAPABILITIES = {'mtype': 'Provides_CA1_laminar_distribution_synapses_info',
+                           'neuron': 'Provides_CA1_laminar_distribution_synapses_per_neuron_info'}
+
+# state of the judgement in progress in the current thread (or asyncio task)
+_judgement = contextvars.ContextVar('judgement')
+
+class Judgement(object):
+    """
+    Per-call state of a test: name of the model being judged, per-m-type DataFrames,
+    aggregate score, filenames of the figures and PendingFigures of those being rendered,
+    and the NeuronStatistics of the model in 'neuron' prediction mode
+    """
+
+    def __init__(self):
+        self.model_name = None
+        self.neuron_statistics = None
+        self.scores_cell = None
+        self.score = None
+        self.figures = []
+        self.pending_figures = []
+
+
+# ==============================================================================
+
+class CA1_laminar_distribution_synapses_BaseTest(sciunit.Test):
+    """Base class of the tests of synapses distribution of different m-types (AA, BP, BS, CCKBC, Ivy, OLM, PC, PPA,
+       SCA, Tri) across the layers of Hippocampus CA1 (SO, SP, SR, SLM). Subclasses set `score_type`
+       (one of the scores in HippoNetworkUnit.scores) and the format of the figure they save.
+       The state of each judgement is kept in a per-call Judgement, not in the test, so that one
+       test can judge several models at once from different threads or asyncio tasks.
+       The figures are saved during the judgement, in the background or not at all depending on
+       `figures_mode` ('sync', 'background' or 'none'; see HippoNetworkUnit.figures), with seaborn or,
+       if `figure_renderer` is 'native', with HippoNetworkUnit.charts (figure_format 'svg' or 'png').
+       The results are stored in `result_store` (HippoNetworkUnit.cache.result_store by default, None
+       to disable it) and reused when the test is judged again on the same prediction.
+       In `prediction_mode` 'neuron', the prediction is aggregated from the synapse counts of each neuron
+       of the model (see HippoNetworkUnit.neurons), and the variability of the neurons of each m-type
+       is given in score.related_data["neuron_statistics"]."""
+
+    description = "Tests the synapses distribution of different m-types across the Hippocampus CA1 layers"
+    score_type = None
+    figure_format = 'pdf'
+    figures_mode = hpn_figures.FIGURES_MODE
+    figure_renderer = 'seaborn'
+    prediction_mode = 'mtype'
+    result_store = hpn_cache.result_store
+
+    def __init__(self, observation={}, name="CA1 laminar_distribution_synapses Test"):
+
+        self.units = quantities.dimensionless
+        self.previous_results = hpn_cache.ContentCache(PREVIOUS_RESULTS_SIZE)
+        observation = self.format_data(observation)
+        sciunit.Test.__init__(self, observation, name)
+        self.directory_output = './output/'
+
+    # ----------------------------------------------------------------------
+
+    @property
+    def required_capabilities(self):
+        """
+        Capabilities required of the models (see sciunit.Test): that of the prediction mode
+        (an unknown mode is reported by generate_prediction)
+        """
+
+        capability = PREDICTION_CAPABILITIES.get(self.prediction_mode)
+        return (getattr(hpn_cap, capability),) if capability is not None else ()
+
+    @property
+    def judgement(self):
+        """
+        Judgement in progress in the current thread or task (a new one outside judge)
+        """
+
+        judgement = _judgement.get(None)
+        if judgement is None:
+            judgement = Judgement()
+            _judgement.set(judgement)
+        return judgement
+
+    def judge(self, model, *args, **kwargs):
+        """Implementation of sciunit.Test.judge, with a new Judgement for each call"""
+
+        token = _judgement.set(Judgement())
+        try:
+            return sciunit.Test.judge(self, model, *args, **kwargs)
+        finally:
+            _judgement.reset(token)
+
+    # ----------------------------------------------------------------------
+
+    def format_data(self, data):
+        """
+        This accepts data input in the form:
+        ***** (observation) *****
+        {   "AA":{
+                "SO": {"mean": "X0"},
+                "SP": {"mean": "X1"},
+                "SR": {"mean": "X2"},
+                "SLM":{"mean": "X3"}
+            },
+            "BP": {...},
+            "BS": {...},
+            "CCKBC":{...},
+            "Ivy":{...},
+            "OLM":{...},
+            "PC":{...},
+            "PPA":{...},
+            "SCA":{...},
+            "Tri":{...}
+        }
+        ***** (prediction) *****
+        {   "AA":{
+                "SO": {"value": "X0"},
+                "SP": {"value": "X1"},
+                "SR": {"value": "X2"},
+                "SLM":{"value": "X3"},
+                "out":{"value": "X4"}
+            },
+            "BP": {...},
+            "BS": {...},
+            "CCKBC":{...},
+            "Ivy":{...},
+            "OLM":{...},
+            "PC":{...},
+            "PPA":{...},
+            "SCA":{...},
+            "Tri":{...}
+        }
+        Returns a LaminarDistributionTable (see HippoNetworkUnit.table) with a row per m-type cell
+        (AA, BP, BS, CCKBC, Ivy, OLM, PC, PPA, SCA, Tri) and a column per layer (SO, SP, SR, SLM, OUT),
+        OUT being 0.0 for observation data. Tables are accepted as they are.
+        The formatted data is cached by content (see HippoNetworkUnit.cache): equal inputs are only
+        parsed once, and their (read-only) tables are shared. The version of HippoNetworkUnit is part
+        of the key, so that tables cached on disk by another version are not reused.
+        """
+
+        if isinstance(data, LaminarDistributionTable):
+            return data
+        return hpn_cache.format_cache.get_or_compute(data, self._format_data, 'CA1_laminar_distribution_synapses',
+                                                     HippoNetworkUnit.__version__)
+
+    def _format_data(self, data):
+        """ Parses the observation or prediction data, as described in format_data """
+
+        try:
+            return LaminarDistributionTable.from_dict(data)
+        except (ValueError, TypeError, AttributeError, StopIteration):
+            raise sciunit.Error("Values not in appropriate format. Synapses fraction of an m-type cell"
+                                "must be dimensionless and not larger than 1.0")
+
+    # ----------------------------------------------------------------------
+
+    def validate_observation(self, observation):
+
+        assert isinstance(observation, LaminarDistributionTable), \
+            sciunit.ObservationError("Observation about synapses fraction in each CA1-layer"
+                                     "must be of the form {'mean': XX}")
+
+    # ----------------------------------------------------------------------
+
+    def generate_prediction(self, model, verbose=False):
+        """Implementation of sciunit.Test.generate_prediction"""
+
+        self.judgement.model_name = model.name
+        if self.prediction_mode == 'neuron':
+            return self.aggregate_prediction(model.get_CA1_laminar_distribution_synapses_per_neuron_info())
+        if self.prediction_mode not in PREDICTION_MODES:
+            raise ValueError("Unknown prediction mode '%s'. Use one of: %s"
+                             % (self.prediction_mode, ", ".join(PREDICTION_MODES)))
+        prediction = model.get_CA1_laminar_distribution_synapses_info()
+        prediction = self.format_data(prediction)
+
+        return prediction
+
+    def aggregate_prediction(self, neurons_info):
+        """
+        Prediction (fractions of each m-type) of the per-neuron synapse counts of a model,
+        keeping the variability of the neurons of each m-type in the judgement
+        """
+
+        try:
+            prediction, self.judgement.neuron_statistics = aggregate_neurons(
+                neurons_info['counts'], neurons_info['mtypes'], neurons_info.get('layers', LAYERS),
+                neurons_info.get('mtype_names'))
+        except (KeyError, ValueError, TypeError) as error:
+            raise sciunit.Error("Per-neuron synapses counts not in appropriate format: %s" % error)
+
+        return prediction
+
+    # ----------------------------------------------------------------------
+
+    def stack_data(self, observation, prediction):
+        """
+        Returns the list of m-types and the (m-types x layers) arrays of observation and prediction,
+        the prediction being lined up with the m-types and layers of the observation
+        """
+
+        assert len(observation) == len(prediction), \
+            sciunit.InvalidScoreError(("Difference in # of m-type cells. Cannot continue test"
+                                        "for laminar distribution of synapses across CA1 layers"))
+        try:
+            prediction = prediction.select(observation.mtypes, observation.layers)
+        except KeyError as error:
+            raise sciunit.InvalidScoreError("The prediction has no m-type cell or layer %s" % error)
+
+        return list(observation.mtypes), observation.values, prediction.values
+
+    # ----------------------------------------------------------------------
+
+    def scores_dataframe(self, score_str, mtypes, statistic, pvalue=None):
+        """
+        Returns a DataFrame with the score (and p-value) of each m-type cell
+        """
+
+        score_label = score_str[:-5] + '-score'
+        scores_cell_floats = dict.fromkeys(mtypes, [])
+        for i, key0 in enumerate(mtypes):
+            if pvalue is None:
+                scores_cell_floats[key0] = [statistic[i]]
+            else:
+                scores_cell_floats[key0] = [statistic[i], pvalue[i]]
+
+        index = [score_label] if pvalue is None else [score_label, 'p-value']
+        scores_cell_df = pd.DataFrame(scores_cell_floats, index=index)
+        scores_cell_df = scores_cell_df.transpose()
+
+        return scores_cell_df
+
+    # ----------------------------------------------------------------------
+
+    def plot_scores(self, scores_cell_df, ax=None):
+        """
+        Draws the bar plot of the score of each m-type cell, annotated with the p-values if any
+        """
+
+        score_label = scores_cell_df.columns[0]
+
+        # pal = sns.cubehelix_palette(len(observation))
+        pal = sns.color_palette('Reds', len(scores_cell_df))
+        # the m-types without a score (NaN, e.g. 0/0 terms) rank first, and have no bar
+        rank = [int(value)-1 for value in scores_cell_df[score_label].rank(na_option='top')]
+        axis_obj = sns.barplot(x=scores_cell_df[score_label], y=scores_cell_df.index, palette=np.array(pal)[rank],
+                               ax=ax)
+        axis_obj.set(xlabel=score_label, ylabel='Cell')
+        sns.despine(ax=axis_obj)
+
+        if 'p-value' in scores_cell_df:
+            pvalues = scores_cell_df['p-value'].values[np.isfinite(scores_cell_df[score_label].values)]
+            for p, pvalue in zip(axis_obj.patches, pvalues):
+                    axis_obj.annotate("p = %.2f" % pvalue,
+                    xy=(p.get_x() + p.get_width(), p.get_y() + 0.5),
+                    xytext=(3, 0), textcoords='offset points')
+
+        return axis_obj
+
+    # ----------------------------------------------------------------------
+
+    def output_path(self):
+        """
+        Creates (if needed) and returns the output directory of the current model
+        """
+
+        path_test_output = self.directory_output + self.judgement.model_name + '/'
+        os.makedirs(path_test_output, exist_ok=True)
+
+        return path_test_output
+
+    # ----------------------------------------------------------------------
+
+    def aggregate_scores(self, scores_array):
+        """
+        Aggregates the scores of all m-type cells into a single value
+        """
+
+        return sum(map(abs,scores_array)) / len(scores_array)
+
+    # ----------------------------------------------------------------------
+
+    def result_namespace(self):
+        """
+        Everything, besides observation and prediction, on which the result of the test depends
+        """
+
+        return (type(self).__module__, type(self).__name__, self.score_type.__name__, self.figure_format,
+                os.path.abspath(self.directory_output), self.judgement.model_name, self.figures_mode == 'none',
+                self.figure_renderer, HippoNetworkUnit.__version__)
+
+    # ----------------------------------------------------------------------
+
+    def compute_scores_cell(self, mtypes, observation_matrix, prediction_matrix):
+        """
+        Computes the score of the given m-type cells and returns a dictionary {score type: DataFrame}
+        """
+
+        score_str = self.score_type.__name__
+        scores_batch = self.score_type.compute_batch(observation_matrix, prediction_matrix)
+
+        if isinstance(scores_batch, tuple):
+            scores_cell_df = self.scores_dataframe(score_str, mtypes, scores_batch.statistic_n, scores_batch.pvalue)
+        else:
+            scores_cell_df = self.scores_dataframe(score_str, mtypes, scores_batch)
+
+        return {score_str: scores_cell_df}
+
+    # ----------------------------------------------------------------------
+
+    def render_figure(self, scores_cell, filename):
+        """
+        Draws the scores of all m-type cells and saves the figure as `filename`
+        """
+
+        if self.figure_renderer == 'native':
+            hpn_charts.write_bar_chart(filename, [hpn_charts.panel_from_dataframe(scores_cell[self.score_type.__name__])])
+            return
+
+        with new_figure() as fig:
+            self.plot_scores(scores_cell[self.score_type.__name__], ax=fig.subplots())
+            fig.savefig(filename, dpi=600,)
+
+    # ----------------------------------------------------------------------
+
+    def plot_result(self, scores_cell):
+        """
+        Saves the figures of the scores of all m-type cells (or schedules them, in 'background'
+        figures mode) and returns their filenames
+        """
+
+        if self.figures_mode not in hpn_figures.FIGURES_MODES:
+            raise ValueError("Unknown figures mode '%s'. Use one of: %s"
+                             % (self.figures_mode, ", ".join(hpn_figures.FIGURES_MODES)))
+        if self.figures_mode == 'none':
+            return []
+        if self.figure_renderer == 'native' and self.figure_format not in hpn_charts.FORMATS:
+            raise ValueError("The native figure renderer only writes the formats: %s" % ", ".join(hpn_charts.FORMATS))
+
+        path_test_output = self.output_path()
+        filename = path_test_output + self.score_type.__name__ + '_plot' + '.' + self.figure_format
+        if self.figures_mode == 'background':
+            pending_figure = hpn_figures.render_in_background(self.render_figure, filename, scores_cell)
+            self.judgement.pending_figures.append(pending_figure)
+        else:
+            self.render_figure(scores_cell, filename)
+
+        return [filename]
+
+    # ----------------------------------------------------------------------
+
+    def aggregate_result(self, scores_cell):
+        """
+        Aggregate score of the test
+        """
+
+        scores_cell_df = scores_cell[self.score_type.__name__]
+        return self.aggregate_scores(scores_cell_df[scores_cell_df.columns[0]].array)
+
+    # ----------------------------------------------------------------------
+
+    def compute_result(self, observation, prediction):
+        """
+        Computes the score of each m-type cell, saves the figures and returns a dictionary with
+        the aggregate 'score', the 'figures' and the DataFrame of each score ('scores_cell').
+        Only the m-types whose observation or prediction changed since the previous result for the
+        same model are rescored, and the figures are only saved again if any of them changed.
+        """
+
+        # Computing the score for all (changed) m-type cells (AA, BP, BS, CCKBC, Ivy, OLM, PC, PPA, SCA, Tri) at once
+        mtypes, observation_matrix, prediction_matrix = self.stack_data(observation, prediction)
+        data_keys = [observation_matrix[i].tobytes() + prediction_matrix[i].tobytes() for i in range(len(mtypes))]
+
+        previous_key = (self.judgement.model_name, self.figures_mode == 'none')
+        previous = self.previous_results.get(previous_key)
+        if previous is None:
+            changed = list(range(len(mtypes)))
+        else:
+            changed = [i for i, key0 in enumerate(mtypes) if previous['data_keys'].get(key0) != data_keys[i]]
+            if (not changed and list(previous['data_keys']) == mtypes
+                    and all(os.path.exists(filename) for filename in previous['result']['figures'])):
+                return previous['result']
+
+        if not changed:
+            scores_cell = previous['result']['scores_cell']
+        else:
+            scores_cell = self.compute_scores_cell([mtypes[i] for i in changed],
+                                                   observation_matrix[changed], prediction_matrix[changed])
+        if previous is not None and changed:
+            unchanged = [key0 for i, key0 in enumerate(mtypes) if i not in changed]
+            for score_str, scores_cell_df in scores_cell.items():
+                previous_df = previous['result']['scores_cell'][score_str]
+                scores_cell[score_str] = pd.concat([previous_df.loc[unchanged], scores_cell_df]).loc[mtypes]
+
+        result = {'score': self.aggregate_result(scores_cell), 'figures': self.plot_result(scores_cell),
+                  'scores_cell': scores_cell}
+        self.previous_results.set(previous_key, {'data_keys': dict(zip(mtypes, data_keys)), 'result': result})
+
+        return result
+
+    # ----------------------------------------------------------------------
+
+    def compute_score(self, observation, prediction, verbose=True):
+        """Implementation of sciunit.Test.score_prediction"""
+
+        # print "observation = ", observation, "\n"
+        # print "prediction = ", prediction, "\n"
+
+        # The results are looked up in the result store (see HippoNetworkUnit.cache), if any, by the
+        # content of observation and prediction; they are only reused if their figures still exist
+        result = None
+        if self.result_store is not None:
+            key = hpn_cache.content_hash({'observation': observation.content(), 'prediction': prediction.content()},
+                                         *self.result_namespace())
+            result = self.result_store.get(key)
+            if result is not None and not all(os.path.exists(filename) for filename in result['figures']):
+                result = None
+        if result is None:
+            result = self.compute_result(observation, prediction)
+            if self.result_store is not None:
+                self.result_store.set(key, result)
+
+        if getattr(self, 'verbose', 1):
+            for scores_cell_df in result['scores_cell'].values():
+                print(scores_cell_df, '\n')
+        judgement = self.judgement
+        judgement.scores_cell = result['scores_cell']
+        judgement.figures.extend(result['figures'])
+        judgement.score = result['score']
+
+        return self.score_type(judgement.score)
+
+    # ----------------------------------------------------------------------
+
+    def bind_score(self, score, model, observation, prediction):
+        score.related_data["figures"] = self.judgement.figures
+        score.related_data["scores_cell"] = self.judgement.scores_cell
+        score.related_data["pending_figures"] = self.judgement.pending_figures
+        if self.judgement.neuron_statistics is not None:
+            score.related_data["neuron_statistics"] = self.judgement.neuron_statistics
+        return score
@@ -0,0 +1,81 @@
+import HippoNetworkUnit.scores as hpn_scores
+import HippoNetworkUnit.charts as hpn_charts
+from HippoNetworkUnit.scores import divergence
+from .base_CA1_laminar_distribution_synapses import CA1_laminar_distribution_synapses_BaseTest, new_figure
+
+
+# ==============================================================================
+score_str = 'CombinedScore'
+"""Several scores (by default all those of HippoNetworkUnit.scores.divergence.SCORE_TYPES) are computed
+from one prediction of the model: the prediction is generated and formatted once, and all the statistics
+are evaluated in a single vectorized pass which shares their common intermediate terms.
+Every score gives the same values as the corresponding single-score test."""
+
+class CA1_laminar_distribution_synapses_MultiScoreTest(CA1_laminar_distribution_synapses_BaseTest):
+    """Tests a synapses distribution of different m-types (AA, BP, BS, CCKBC, Ivy, OLM, PC, PPA, SCA, Tri)
+       across the layers of Hippocampus CA1 (SO, SP, SR, SLM) with several scores at once"""
+
+    score_type = eval('hpn_scores.' + score_str)
+    figure_format = 'png'
+
+    def __init__(self, observation={}, name="CA1 laminar_distribution_synapses Test",
+                 score_types=divergence.SCORE_TYPES):
+
+        for score_type in score_types:
+            if score_type not in divergence.SCORE_TYPES:
+                raise ValueError("Unknown score type '%s'. Use any of: %s"
+                                 % (score_type, ", ".join(divergence.SCORE_TYPES)))
+        self.score_types = tuple(score_types)
+        CA1_laminar_distribution_synapses_BaseTest.__init__(self, observation, name)
+
+    # ----------------------------------------------------------------------
+
+    def result_namespace(self):
+        return CA1_laminar_distribution_synapses_BaseTest.result_namespace(self) + self.score_types
+
+    # ----------------------------------------------------------------------
+
+    def compute_scores_cell(self, mtypes, observation_matrix, prediction_matrix):
+        """
+        Computes all the scores of the given m-type cells in one pass
+        """
+
+        results = divergence.compute_divergences(observation_matrix, prediction_matrix, self.score_types)
+
+        scores_cell = dict()
+        for score_type in self.score_types:
+            result = results[score_type]
+            pvalue = None if score_type == 'KLdivScore' else result.pvalue
+            scores_cell[score_type] = self.scores_dataframe(score_type, mtypes, result.statistic_n, pvalue)
+
+        return scores_cell
+
+    # ----------------------------------------------------------------------
+
+    def render_figure(self, scores_cell, filename):
+        """
+        Saves one figure with a panel per score
+        """
+
+        if self.figure_renderer == 'native':
+            hpn_charts.write_bar_chart(filename, [hpn_charts.panel_from_dataframe(scores_cell[score_type])
+                                                  for score_type in self.score_types])
+            return
+
+        with new_figure(figsize=(4 * len(self.score_types), 4)) as fig:
+            axes = fig.subplots(1, len(self.score_types), squeeze=False)
+            for score_type, ax in zip(self.score_types, axes[0]):
+                self.plot_scores(scores_cell[score_type], ax=ax)
+
+            fig.tight_layout()
+            fig.savefig(filename, dpi=600,)
+
+    # ----------------------------------------------------------------------
+
+    def aggregate_result(self, scores_cell):
+        """
+        Dictionary {score type: aggregate value}
+        """
+
+        return dict((score_type, self.aggregate_scores(scores_cell_df[scores_cell_df.columns[0]].array))
+                    for score_type, scores_cell_df in scores_cell.items())
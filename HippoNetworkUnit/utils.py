@@ -2,8 +2,10 @@ import sciunit
 import os
 import json
 
+import HippoNetworkUnit.capabilities as hpn_cap
 
-class CA1_laminar_distribution_synapses(sciunit.Model):
+
+class CA1_laminar_distribution_synapses(sciunit.Model, hpn_cap.Provides_CA1_laminar_distribution_synapses_info):
 
     def __init__(self, name="CA1_laminar_distribution_synapses", CA1_laminar_distribution_synapses_model=None):
 
@@ -15,6 +17,22 @@ class CA1_laminar_distribution_synapses(sciunit.Model):
     def get_CA1_laminar_distribution_synapses_info(self):
         return self.CA1_laminar_distribution_synapses_info
 
+
+class CA1_laminar_distribution_synapses_neurons(sciunit.Model,
+                                                hpn_cap.Provides_CA1_laminar_distribution_synapses_per_neuron_info):
+
+    def __init__(self, name="CA1_laminar_distribution_synapses_neurons", counts=None, mtypes=None, layers=None):
+
+        sciunit.Model.__init__(self, name=name)
+        self.name = name
+        self.description = "HBP Hippocampus CA1's output to test synapses distribution of its neurons across CA1 layers"
+        self.CA1_laminar_distribution_synapses_per_neuron_info = {"counts": counts, "mtypes": mtypes}
+        if layers is not None:
+            self.CA1_laminar_distribution_synapses_per_neuron_info["layers"] = layers
+
+    def get_CA1_laminar_distribution_synapses_per_neuron_info(self):
+        return self.CA1_laminar_distribution_synapses_per_neuron_info
+
 # ==============================================================================
 
 class CA1Layers_NeuritePathDistance(sciunit.Model):
@@ -0,0 +1,65 @@
+# Import-time benchmark for HippoNetworkUnit
+
+"""
+Measures, in fresh interpreters, how long it takes to import HippoNetworkUnit and some of its
+parts, and checks which heavy dependencies each import loads. Run it from the repository root:
+
+    python benchmarks/bench_import_time.py
+
+It exits with status 1 if an import loads a forbidden module or is slower than its budget.
+"""
+
+import os
+import subprocess
+import sys
+import json
+
+REPEAT = 5
+
+# (statement, time budget in seconds, modules that must not be loaded by it)
+CASES = [
+    ("import HippoNetworkUnit", 0.05,
+     ["sciunit", "matplotlib", "seaborn", "pandas", "scipy", "numpy", "HippoNetworkUnit.tests"]),
+    ("import HippoNetworkUnit.scores", 0.05,
+     ["sciunit", "matplotlib", "seaborn", "pandas", "scipy", "numpy", "HippoNetworkUnit.tests"]),
+    ("from HippoNetworkUnit.scores import fastpath", 1.0,
+     ["sciunit", "matplotlib", "seaborn", "pandas", "scipy.stats", "HippoNetworkUnit.tests"]),
+    ("from HippoNetworkUnit.scores import PearsonChiSquaredScore", 5.0,
+     ["matplotlib", "seaborn", "HippoNetworkUnit.tests"]),
+]
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+print(json.dumps({"time": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure(statement):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    times, modules = [], None
+    for _ in range(REPEAT):
+        output = subprocess.check_output([sys.executable, "-c", SCRIPT % statement], env=env, cwd=root)
+        result = json.loads(output.decode().strip().splitlines()[-1])
+        times.append(result["time"])
+        modules = set(result["modules"])
+    return min(times), modules
+
+
+def main():
+    failed = False
+    for statement, budget, forbidden in CASES:
+        elapsed, modules = measure(statement)
+        loaded = [name for name in forbidden if name in modules]
+        status = "ok" if elapsed <= budget and not loaded else "FAIL"
+        failed = failed or status == "FAIL"
+        print("%-60s %8.1f ms (budget %6.0f ms) %s%s" % (statement, 1000*elapsed, 1000*budget, status,
+                                                         " loads: " + ", ".join(loaded) if loaded else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# Memory-regression benchmark for the laminar-distribution tests
+
+"""
+Judges one test on many models (random predictions, each with its own name, so every judgement
+is computed and its figure saved) and checks that the resident memory of the process stays flat:
+the growth between the end of the warm-up and the end of the run must be below a budget.
+Run it from the repository root:
+
+    python benchmarks/bench_memory.py [--models 2000] [--test CA1_laminar_distribution_synapses_PearsonTest]
+
+The figures are written to a temporary directory. It exits with status 1 if the memory grows
+more than the budget.
+"""
+
+import os
+import sys
+import time
+import shutil
+import resource
+import argparse
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MTYPES = ["AA", "BP", "BS", "CCKBC", "Ivy", "OLM", "PC", "PPA", "SCA", "Tri"]
+LAYERS = ["SO", "SP", "SR", "SLM"]
+
+# fraction of the models judged before the reference memory is measured
+WARMUP = 0.1
+
+# maximum growth (MB) of the resident memory after the warm-up
+BUDGET = 20.0
+
+
+def rss():
+    """ Current resident memory of the process, in MB (peak memory if /proc is not available) """
+    try:
+        with open('/proc/self/statm') as file_:
+            return int(file_.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2.0**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2.0**10
+
+
+def distribution(rng, layers, key):
+    """ Random fractions of the layers, all of them at least 0.001 (none is printed as 0.0000) """
+    fractions = rng.dirichlet(np.ones(len(layers))) * (1 - 0.001 * len(layers)) + 0.001
+    return dict((layer, {key: "%.4f" % value}) for layer, value in zip(layers, fractions))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=int, default=2000)
+    parser.add_argument('--test', default='CA1_laminar_distribution_synapses_PearsonTest')
+    parser.add_argument('--budget', type=float, default=BUDGET, help='maximum memory growth (MB)')
+    args = parser.parse_args()
+
+    import HippoNetworkUnit.tests as hpn_tests
+    from HippoNetworkUnit.utils import CA1_laminar_distribution_synapses
+
+    rng = np.random.default_rng(0)
+    observation = dict((mtype, distribution(rng, LAYERS, "mean")) for mtype in MTYPES)
+    test = getattr(hpn_tests, args.test)(observation=observation)
+    test.verbose = 0
+    directory = tempfile.mkdtemp()
+    test.directory_output = directory + '/'
+
+    warmup = max(1, int(WARMUP * args.models))
+    start = time.time()
+    try:
+        for i in range(args.models):
+            prediction = dict((mtype, distribution(rng, LAYERS + ["OUT"], "value")) for mtype in MTYPES)
+            test.judge(CA1_laminar_distribution_synapses(name='model_%d' % i,
+                                                         CA1_laminar_distribution_synapses_model=prediction))
+            shutil.rmtree(os.path.join(directory, 'model_%d' % i))
+            if i + 1 == warmup:
+                reference = rss()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    growth = rss() - reference
+    status = "ok" if growth <= args.budget else "FAIL"
+    print("%s: %d models in %.1f s, memory %.1f MB after warm-up, growth %+.1f MB (budget %.0f MB) %s"
+          % (args.test, args.models, time.time() - start, reference, growth, args.budget, status))
+    return 1 if status == "FAIL" else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+MTYPES = ['AA', 'BP', 'BS', 'CCKBC', 'Ivy', 'OLM', 'PC', 'PPA', 'SCA', 'Tri']
+
+
+@pytest.fixture
+def observation():
+    """ Observation dictionary {mtype: {layer: {"mean": fraction}}} of the ten m-types """
+
+    rng = np.random.default_rng(0)
+    return dict((mtype, dict((layer, {'mean': str(round(value, 4))})
+                             for layer, value in zip(['SO', 'SP', 'SR', 'SLM'], rng.dirichlet(np.ones(4) * 2))))
+                for mtype in MTYPES)
+
+
+@pytest.fixture
+def prediction():
+    """ Prediction dictionary {mtype: {layer: {"value": fraction}}} of the ten m-types """
+
+    rng = np.random.default_rng(1)
+    fractions = rng.dirichlet(np.ones(5) * 2, size=len(MTYPES)) * 0.98 + 0.004  # none is 0.0
+    return dict((mtype, dict((layer, {'value': str(round(value, 4))})
+                             for layer, value in zip(['SO', 'SP', 'SR', 'SLM', 'OUT'], fractions[i])))
+                for i, mtype in enumerate(MTYPES))
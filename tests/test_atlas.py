@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from HippoNetworkUnit.atlas import VoxelAtlas, open_volume
+
+LABEL_LAYERS = {1: 'SO', 2: 'SP', 3: 'SR', 4: 'SLM'}
+SHAPE = (4, 3, 5)
+
+
+@pytest.fixture
+def labels():
+    return np.random.default_rng(0).integers(0, 6, size=SHAPE).astype(np.uint16)
+
+
+@pytest.fixture
+def density():
+    return np.random.default_rng(1).uniform(0, 10, size=SHAPE).astype(np.float32)
+
+
+def expected_sums(labels, density):
+    """ Sums of the density over the voxels of SO, SP, SR, SLM and OUT (labels 0 and 5) """
+
+    sums = [density[labels == label].sum() for label in (1, 2, 3, 4)]
+    return np.array(sums + [density[(labels == 0) | (labels == 5)].sum()])
+
+
+def nrrd_header(array, endian, **fields):
+    lines = ['NRRD0004', '# Complete NRRD file format specification at:', 'type: %s' % {
+        'u2': 'unsigned short', 'f4': 'float'}[array.dtype.str[1:]],
+        'dimension: %d' % array.ndim, 'sizes: %s' % ' '.join(str(size) for size in array.shape[::-1]),
+        'endian: %s' % endian, 'encoding: raw', 'space dimension:=3']
+    lines += ['%s: %s' % (key.replace('_', ' '), value) for key, value in fields.items()]
+    return ('\n'.join(lines) + '\n\n').encode('latin-1')
+
+
+def write_nrrd(path, array, endian='little'):
+    array = array.astype(array.dtype.newbyteorder('<' if endian == 'little' else '>'))
+    path.write_bytes(nrrd_header(array, endian) + array.tobytes())
+    return str(path)
+
+
+@pytest.mark.parametrize('endian', ['little', 'big'])
+def test_attached_nrrd(labels, density, tmp_path, endian):
+    atlas = VoxelAtlas(write_nrrd(tmp_path / 'labels.nrrd', labels, endian), LABEL_LAYERS, block_size=20)
+    volume = open_volume(write_nrrd(tmp_path / 'density.nrrd', density, endian))
+    assert volume.shape == SHAPE and volume.dtype.byteorder == ('<' if endian == 'little' else '>')
+    np.testing.assert_allclose(atlas.layer_sums(volume), expected_sums(labels, density), rtol=1e-6)
+    np.testing.assert_array_equal(atlas.layer_sums(), expected_sums(labels, np.ones(SHAPE)))
+
+
+@pytest.mark.parametrize('endian', ['little', 'big'])
+def test_detached_nrrd(labels, density, tmp_path, endian):
+    # the labels follow 7 bytes of another header; the densities end the file (byte skip -1)
+    data = labels.astype(labels.dtype.newbyteorder('<' if endian == 'little' else '>'))
+    (tmp_path / 'labels.raw').write_bytes(b'HEADER!' + data.tobytes())
+    (tmp_path / 'labels.nhdr').write_bytes(nrrd_header(data, endian, data_file='labels.raw', byte_skip=7))
+    data = density.astype(density.dtype.newbyteorder('<' if endian == 'little' else '>'))
+    (tmp_path / 'density.raw').write_bytes(b'\0' * 13 + data.tobytes())
+    (tmp_path / 'density.nhdr').write_bytes(nrrd_header(data, endian, datafile='density.raw', byteskip=-1))
+
+    atlas = VoxelAtlas(str(tmp_path / 'labels.nhdr'), LABEL_LAYERS)
+    np.testing.assert_array_equal(atlas.labels, labels)
+    np.testing.assert_allclose(atlas.layer_sums(str(tmp_path / 'density.nhdr')), expected_sums(labels, density),
+                               rtol=1e-6)
+
+
+def test_npy_and_raw_volumes(labels, density, tmp_path):
+    np.save(str(tmp_path / 'labels.npy'), labels)
+    density.tofile(str(tmp_path / 'density.raw'))
+    atlas = VoxelAtlas(str(tmp_path / 'labels.npy'), LABEL_LAYERS)
+    volume = open_volume(str(tmp_path / 'density.raw'), SHAPE, np.float32)
+    np.testing.assert_allclose(atlas.layer_sums(volume), expected_sums(labels, density), rtol=1e-6)
+    with pytest.raises(ValueError):
+        open_volume(str(tmp_path / 'density.raw'))
+
+
+def test_large_and_negative_labels(labels, density):
+    # labels too large for a lookup table; the negative ones are OUT
+    large = labels.astype(np.int64) * 2**30 - 2**30
+    atlas = VoxelAtlas(large, dict((label * 2**30 - 2**30, layer) for label, layer in LABEL_LAYERS.items()))
+    assert atlas._lookup is None
+    np.testing.assert_allclose(atlas.layer_sums(density), expected_sums(labels, density), rtol=1e-6)
+    np.testing.assert_allclose(VoxelAtlas(labels.astype(np.int16) - 1, {0: 'SO', 1: 'SP', 2: 'SR', 3: 'SLM'})
+                               .layer_sums(density), expected_sums(labels, density), rtol=1e-6)
+
+
+def test_laminar_distribution(labels, density):
+    atlas = VoxelAtlas(labels, LABEL_LAYERS)
+    prediction = atlas.laminar_distribution({'PC': density, 'BS': np.ones(SHAPE)})
+    fractions = expected_sums(labels, density) / density.sum()
+    assert list(prediction) == ['PC', 'BS'] and list(prediction['PC']) == ['SO', 'SP', 'SR', 'SLM', 'OUT']
+    np.testing.assert_allclose([prediction['PC'][layer]['value'] for layer in prediction['PC']], fractions,
+                               rtol=1e-6)
+    # without OUT, the voxels of other labels are left out
+    observation = VoxelAtlas(labels, LABEL_LAYERS, layers=('SO', 'SP', 'SR', 'SLM')).laminar_distribution(
+        {'PC': density}, key='mean')
+    np.testing.assert_allclose([observation['PC'][layer]['mean'] for layer in ('SO', 'SP', 'SR', 'SLM')],
+                               fractions[:4] / fractions[:4].sum(), rtol=1e-6)
+
+
+def test_invalid_atlases(labels, density, tmp_path):
+    with pytest.raises(ValueError, match='Unknown layer'):
+        VoxelAtlas(labels, {1: 'SA'})
+    with pytest.raises(ValueError):
+        VoxelAtlas(density, LABEL_LAYERS)
+    with pytest.raises(ValueError):
+        VoxelAtlas(labels, LABEL_LAYERS).layer_sums(density[:2])
+    path = tmp_path / 'labels.nrrd'
+    path.write_bytes(nrrd_header(labels, 'little').replace(b'encoding: raw', b'encoding: gzip'))
+    with pytest.raises(ValueError, match='memory-mappable'):
+        open_volume(str(path))
@@ -0,0 +1,62 @@
+import pickle
+
+import numpy as np
+
+import HippoNetworkUnit
+from HippoNetworkUnit import cache, tests
+
+
+def test_format_cache_key_has_the_version(observation, monkeypatch, tmp_path):
+    monkeypatch.setattr(cache, 'format_cache', cache.ContentCache(directory=str(tmp_path)))
+    test = tests.CA1_laminar_distribution_synapses_PearsonTest(observation=observation)
+    assert test.format_data(observation) is test.observation
+    assert (cache.format_cache.hits, cache.format_cache.misses) == (1, 1)
+
+    # the tables cached on disk by another version are not reused
+    monkeypatch.setattr(HippoNetworkUnit, '__version__', HippoNetworkUnit.__version__ + '.post1')
+    cache.format_cache.clear()
+    test.format_data(observation)
+    assert (cache.format_cache.hits, cache.format_cache.misses) == (0, 1)
+
+
+class Clock(object):
+    """ time module whose time() advances by one second at each call """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1.0
+        return self.now
+
+
+def test_result_store_evicts_the_least_recently_used(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache, 'time', Clock())
+    monkeypatch.setattr(cache, 'ACCESS_RESOLUTION', 0.0)
+    value = b'x' * 1000
+    size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    store = cache.ResultStore(str(tmp_path / 'results.sqlite'), max_bytes=2 * size)
+    store.set('a', value)
+    store.set('b', value)
+    assert store.get('a') == value  # 'b' is now the least recently used
+    store.set('c', value)
+    assert (store.get('a'), store.get('b'), store.get('c')) == (value, None, value)
+    assert len(store) == 2
+
+    # values larger than the store are not kept
+    store.set('d', b'x' * 3000)
+    assert store.get('d', 'missing') == 'missing' and len(store) == 2
+
+
+def test_result_store_reopens(tmp_path):
+    path = str(tmp_path / 'store' / 'results.sqlite')
+    store = cache.ResultStore(path)
+    store.set('key', {'score': np.arange(3.0)})
+
+    # as sent to a worker process: a new connection to the same database
+    reopened = pickle.loads(pickle.dumps(store))
+    np.testing.assert_array_equal(reopened.get('key')['score'], np.arange(3.0))
+    np.testing.assert_array_equal(cache.ResultStore(path).get('key')['score'], np.arange(3.0))
+
+    reopened.clear()
+    assert len(store) == 0
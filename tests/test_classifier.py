@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from HippoNetworkUnit.classifier import LayerClassifier
+
+# heights of the boundaries OUT|SO, SO|SP, SP|SR, SR|SLM and SLM|OUT
+HEIGHTS = (0.0, 40.0, 90.0, 150.0, 200.0)
+BOUNDS = ((0.0, 0.0, -30.0), (300.0, 300.0, 230.0))
+
+
+def wavy_boundary(height, n=61):
+    """ Points and normals of the surface z = height + 10 sin(x / 40) cos(y / 50) """
+
+    x, y = (axis.ravel() for axis in np.meshgrid(np.linspace(0, 300, n), np.linspace(0, 300, n), indexing='ij'))
+    z = height + 10 * np.sin(x / 40) * np.cos(y / 50)
+    normals = np.stack([-np.cos(x / 40) * np.cos(y / 50) / 4, np.sin(x / 40) * np.sin(y / 50) / 5, np.ones(len(x))],
+                       axis=1)
+    return np.stack([x, y, z], axis=1), normals
+
+
+@pytest.fixture(scope='module')
+def classifier():
+    # the normals of the last boundaries point towards the first layers, and are flipped
+    boundaries = [wavy_boundary(height) for height in HEIGHTS]
+    boundaries[3] = (boundaries[3][0], -boundaries[3][1])
+    return LayerClassifier(boundaries).build_grid(8.0, BOUNDS)
+
+
+@pytest.fixture(scope='module')
+def points():
+    rng = np.random.default_rng(0)
+    # within the grid, and around it
+    return np.concatenate([rng.uniform(*BOUNDS, size=(20000, 3)),
+                           rng.uniform((-20.0, -20.0, -60.0), (320.0, 320.0, 260.0), size=(2000, 3))])
+
+
+def test_classify_layers(classifier):
+    assert classifier.layers == ('SO', 'SP', 'SR', 'SLM', 'OUT')
+    points = np.array([[150.0, 150.0, height] for height in (-20.0, 20.0, 65.0, 120.0, 175.0, 220.0)])
+    np.testing.assert_array_equal(classifier.classify(points), [4, 0, 1, 2, 3, 4])
+
+
+def test_grid_matches_exact(classifier, points):
+    exact = classifier.classify_exact(points)
+    np.testing.assert_array_equal(classifier.classify(points), exact)
+    np.testing.assert_array_equal(classifier.classify(points, batch_size=3000, n_workers=3), exact)
+    # without the exact queries, the points outside the grid are OUT
+    high = classifier.origin + classifier.spacing * np.array(classifier.grid.shape)
+    inside = np.all((points >= classifier.origin) & (points < high), axis=1)
+    assert 0 < np.sum(~inside) < len(points)
+    codes = classifier.classify(points, outside_grid='out')
+    np.testing.assert_array_equal(codes[inside], exact[inside])
+    assert np.all(codes[~inside] == 4)
+    with pytest.raises(ValueError):
+        classifier.classify(points, outside_grid='nearest')
+
+
+def test_save_load(classifier, points, tmp_path):
+    classifier.save(str(tmp_path / 'with_grid.npz'))
+    loaded = LayerClassifier.load(str(tmp_path / 'with_grid.npz'))
+    assert loaded.layers == classifier.layers
+    np.testing.assert_array_equal(loaded.grid, classifier.grid)
+    np.testing.assert_array_equal(loaded.classify(points), classifier.classify(points))
+
+    LayerClassifier([wavy_boundary(height) for height in HEIGHTS], ['A', 'B', 'C', 'D'], 'X').save(
+        str(tmp_path / 'without_grid.npz'))
+    loaded = LayerClassifier.load(str(tmp_path / 'without_grid.npz'))
+    assert loaded.layers == ('A', 'B', 'C', 'D', 'X') and loaded.grid is None
+    np.testing.assert_array_equal(loaded.classify(points), classifier.classify_exact(points))
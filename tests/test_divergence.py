@@ -0,0 +1,28 @@
+import numpy as np
+
+from HippoNetworkUnit.scores import divergence
+from HippoNetworkUnit.scores.score_LogLikelihoodRatio import Log_LikelihoodRatioScore
+
+# m-types with empty layers: nothing observed nor predicted, nothing observed, and no empty layer
+OBSERVATION = np.array([[0.3, 0.3, 0.2, 0.2, 0.0],
+                        [0.3, 0.3, 0.2, 0.2, 0.0],
+                        [0.3, 0.3, 0.2, 0.1, 0.1]])
+PREDICTION = np.array([[0.25, 0.35, 0.2, 0.2, 0.0],
+                       [0.25, 0.35, 0.1, 0.2, 0.1],
+                       [0.25, 0.35, 0.2, 0.1, 0.1]])
+
+
+def test_log_likelihood_ratio_empty_layers():
+    batch = Log_LikelihoodRatioScore.compute_batch(OBSERVATION, PREDICTION)
+    assert np.all(np.isfinite(batch.statistic_n)) and np.all(np.isfinite(batch.pvalue))
+    for i in range(len(OBSERVATION)):
+        score = Log_LikelihoodRatioScore.compute(OBSERVATION[i].copy(), PREDICTION[i].copy()).score
+        np.testing.assert_allclose(score.statistic_n, batch.statistic_n[i], rtol=1e-12)
+        np.testing.assert_allclose(score.pvalue, batch.pvalue[i], rtol=1e-12)
+
+
+def test_log_likelihood_terms_match_kernel():
+    results = divergence.compute_divergences(OBSERVATION, PREDICTION, ('Log_LikelihoodRatioScore',))
+    terms = divergence.TERMS['Log_LikelihoodRatioScore'](OBSERVATION * divergence.SCALE,
+                                                         PREDICTION * divergence.SCALE)
+    np.testing.assert_allclose(terms.sum(axis=-1), results['Log_LikelihoodRatioScore'].statistic, rtol=1e-12)
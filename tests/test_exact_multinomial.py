@@ -0,0 +1,73 @@
+import itertools
+
+import numpy as np
+import pytest
+from scipy.stats import multinomial
+
+from HippoNetworkUnit.scores import divergence, exact_multinomial
+
+PROBABILITIES = np.array([0.1, 0.2, 0.3, 0.4])
+
+
+def brute_force_pvalue(terms, counts, probabilities):
+    """ p-value of the counts over all the outcomes """
+
+    n, expected = sum(counts), sum(counts) * probabilities
+    observed = exact_multinomial.count_terms(terms, counts, expected).sum()
+    pval = 0.0
+    for outcome in itertools.product(range(n + 1), repeat=len(counts) - 1):
+        if sum(outcome) <= n:
+            outcome = outcome + (n - sum(outcome),)
+            stat = exact_multinomial.count_terms(terms, outcome, expected).sum()
+            if stat >= observed - exact_multinomial.RTOL * max(abs(observed), 1.0):
+                pval += multinomial.pmf(outcome, n, probabilities)
+    return pval
+
+
+@pytest.mark.parametrize('score', ['PearsonChiSquaredScore', 'Log_LikelihoodRatioScore', 'NeymanScore'])
+@pytest.mark.parametrize('counts', [(0, 3, 7, 10), (5, 5, 5, 5), (1, 0, 0, 19)])
+def test_null_distribution_matches_brute_force(score, counts):
+    terms = divergence.TERMS[score]
+    expected = brute_force_pvalue(terms, counts, PROBABILITIES)
+
+    exact = exact_multinomial.MultinomialNullDistribution(terms, sum(counts), PROBABILITIES, pvalue_rtol=0.0)
+    assert exact.resolution == 0.0
+    assert exact.sf(exact.statistic(counts)) == pytest.approx(expected, abs=1e-12)
+
+    # the merged statistics round the p-values up
+    merged = exact_multinomial.MultinomialNullDistribution(terms, sum(counts), PROBABILITIES, pvalue_rtol=1e-2)
+    assert expected - 1e-12 <= merged.sf(merged.statistic(counts)) <= expected * 1.01 + 1e-12
+
+    # the FFT lattice, as for larger n
+    lattice = exact_multinomial.MultinomialNullDistribution(terms, sum(counts), PROBABILITIES, max_outcomes=0)
+    assert lattice.resolution > 0.0
+    assert lattice.sf(lattice.statistic(counts)) == pytest.approx(expected, abs=2e-2)
+
+
+def test_cache_is_bounded_by_bytes(monkeypatch):
+    terms = divergence.TERMS['PearsonChiSquaredScore']
+    exact_multinomial.clear_cache()
+    size = exact_multinomial.get_null_distribution(terms, 20, tuple(PROBABILITIES)).nbytes
+    monkeypatch.setattr(exact_multinomial, 'CACHE_BYTES', 2 * size)
+    for n in (21, 22, 23):
+        exact_multinomial.get_null_distribution(terms, n, tuple(PROBABILITIES))
+    assert sum(value.nbytes for value in exact_multinomial._cache.values()) <= 2 * size
+    assert (terms, 23, tuple(PROBABILITIES), 1e-12) in exact_multinomial._cache
+    exact_multinomial.clear_cache()
+
+
+def test_cache_holds_the_mtypes_of_a_model():
+    rng = np.random.default_rng(0)
+    observation = rng.dirichlet(np.ones(5) * 3, size=10)
+    prediction = rng.dirichlet(np.ones(5) * 3, size=10)
+    exact_multinomial.clear_cache()
+    first = divergence.compute_divergences(observation, prediction, ('PearsonChiSquaredScore',), 'exact')
+    assert exact_multinomial.cache_info()['misses'] == 10
+
+    # scoring the same model again only reads the cache
+    second = divergence.compute_divergences(observation, prediction, ('PearsonChiSquaredScore',), 'exact')
+    info = exact_multinomial.cache_info()
+    assert (info['hits'], info['misses'], info['size']) == (10, 10, 10)
+    assert info['nbytes'] <= exact_multinomial.CACHE_BYTES
+    np.testing.assert_array_equal(first['PearsonChiSquaredScore'].pvalue, second['PearsonChiSquaredScore'].pvalue)
+    exact_multinomial.clear_cache()
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from HippoNetworkUnit import scores
+from HippoNetworkUnit.scores.divergence import SCORE_TYPES
+from HippoNetworkUnit.scores.fastpath import FastScorer
+
+# m-types with: nothing observed nor predicted in a layer, nothing observed, a masked (NaN) layer,
+# masked and empty layers, and no empty layer
+OBSERVATION = np.array([[0.3, 0.3, 0.2, 0.2, 0.0],
+                        [0.3, 0.3, 0.2, 0.2, 0.0],
+                        [0.3, 0.3, 0.2, 0.2, np.nan],
+                        [0.4, 0.0, 0.0, 0.6, np.nan],
+                        [0.3, 0.3, 0.2, 0.1, 0.1]])
+PREDICTION = np.array([[0.25, 0.35, 0.2, 0.2, 0.0],
+                       [0.25, 0.35, 0.1, 0.2, 0.1],
+                       [0.25, 0.35, 0.2, 0.1, 0.1],
+                       [0.5, 0.0, 0.1, 0.4, 0.2],
+                       [0.25, 0.35, 0.2, 0.1, 0.1]])
+
+
+@pytest.mark.parametrize('pvalue_method', ['asymptotic', 'closed_form'])
+@pytest.mark.parametrize('score_type', SCORE_TYPES)
+def test_fast_scorer_matches_compute_batch(score_type, pvalue_method):
+    statistic_n, pvalue = np.empty(len(OBSERVATION)), np.empty(len(OBSERVATION))
+    FastScorer(score_type, OBSERVATION.shape, pvalue_method).compute_into(OBSERVATION, PREDICTION, statistic_n, pvalue)
+    if score_type == 'KLdivScore':
+        # compute_batch returns the divergences
+        batch_statistic_n = scores.KLdivScore.compute_batch(OBSERVATION, PREDICTION)
+        batch_pvalue = np.full(len(OBSERVATION), np.nan)
+    else:
+        batch = getattr(scores, score_type).compute_batch(OBSERVATION, PREDICTION, pvalue_method=pvalue_method)
+        batch_statistic_n, batch_pvalue = batch.statistic_n, batch.pvalue
+
+    for i in range(len(OBSERVATION)):
+        np.testing.assert_allclose(statistic_n[i], batch_statistic_n[i], rtol=1e-12, err_msg="row %d" % i)
+        np.testing.assert_allclose(pvalue[i], batch_pvalue[i], rtol=1e-10, err_msg="row %d" % i)
+    if score_type == 'Log_LikelihoodRatioScore':
+        assert np.all(np.isfinite(statistic_n)) and np.all(np.isfinite(pvalue))
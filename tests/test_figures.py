@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+
+from HippoNetworkUnit import figures
+
+
+def test_render_and_flush_from_several_threads():
+    saved = []
+
+    def save(index, filename):
+        saved.append(filename)
+
+    def judge(thread):
+        for i in range(200):
+            figures.render_in_background(save, 'figure_%d_%d' % (thread, i), i)
+            if i % 10 == 0:
+                figures.flush_figures()
+
+    threads = [threading.Thread(target=judge, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    figures.flush_figures()
+
+    assert sorted(saved) == sorted('figure_%d_%d' % (thread, i) for thread in range(4) for i in range(200))
+    assert not figures._pending
+
+
+def test_pending_figure_raises_the_rendering_errors():
+    def fail(filename):
+        raise ValueError(filename)
+
+    pending = figures.render_in_background(fail, 'broken.png')
+    with pytest.raises(ValueError, match='broken.png'):
+        pending.wait()
+    assert pending.done() and repr(pending) == '<PendingFigure broken.png (done)>'
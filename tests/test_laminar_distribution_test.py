@@ -0,0 +1,84 @@
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+import pytest
+import sciunit
+from matplotlib import pyplot as plt
+
+from HippoNetworkUnit import capabilities, tests
+from HippoNetworkUnit.utils import CA1_laminar_distribution_synapses, CA1_laminar_distribution_synapses_neurons
+
+
+def make_test(observation, tmp_path, test_class=tests.CA1_laminar_distribution_synapses_PearsonTest):
+    test = test_class(observation=observation)
+    test.figures_mode = 'sync'
+    test.result_store = None
+    test.verbose = 0
+    test.directory_output = str(tmp_path) + '/'
+    return test
+
+
+def test_judge_with_nan_scores(observation, prediction, tmp_path):
+    # nothing observed (OUT) nor predicted out of the layers: a 0/0 Pearson term
+    prediction['PPA']['OUT']['value'] = '0.0000'
+    score = make_test(observation, tmp_path).judge(
+        CA1_laminar_distribution_synapses(name='model', CA1_laminar_distribution_synapses_model=prediction))
+    scores_cell = score.related_data['scores_cell']['PearsonChiSquaredScore']
+    assert np.isnan(scores_cell.loc['PPA'].iloc[0])
+    assert np.isfinite(scores_cell.drop('PPA').iloc[:, 0]).all()
+    assert score.related_data['figures']
+    assert all(os.path.getsize(filename) > 0 for filename in score.related_data['figures'])
+
+
+def test_plot_scores_annotates_the_bars_with_scores(observation, tmp_path):
+    scores_cell = pd.DataFrame({'Pearson-score': [1.0, np.nan, 3.0], 'p-value': [0.5, np.nan, 0.25]},
+                               index=['AA', 'BP', 'BS'])
+    figure, ax = plt.subplots()
+    try:
+        make_test(observation, tmp_path).plot_scores(scores_cell, ax)
+        assert [text.get_text() for text in ax.texts] == ['p = 0.50', 'p = 0.25']
+    finally:
+        plt.close(figure)
+
+
+class NeuronTest(tests.CA1_laminar_distribution_synapses_PearsonTest):
+    prediction_mode = 'neuron'
+
+
+def neurons_model(prediction, n_per_mtype=5, seed=2):
+    """ Neurons whose synapse counts scatter around the fractions of `prediction` """
+
+    rng = np.random.default_rng(seed)
+    mtypes = sorted(prediction)
+    layers = list(prediction[mtypes[0]])
+    counts = np.concatenate([rng.multinomial(1000, [float(prediction[mtype][layer]['value']) for layer in layers],
+                                             size=n_per_mtype) for mtype in mtypes])
+    return CA1_laminar_distribution_synapses_neurons(name='neurons', counts=counts,
+                                                    mtypes=np.repeat(mtypes, n_per_mtype), layers=layers)
+
+
+def test_required_capabilities_depend_on_the_prediction_mode(observation, tmp_path):
+    assert make_test(observation, tmp_path).required_capabilities == \
+        (capabilities.Provides_CA1_laminar_distribution_synapses_info,)
+    assert make_test(observation, tmp_path, NeuronTest).required_capabilities == \
+        (capabilities.Provides_CA1_laminar_distribution_synapses_per_neuron_info,)
+
+
+def test_judge_neurons(observation, prediction, tmp_path):
+    model = neurons_model(prediction)
+    score = make_test(observation, tmp_path, NeuronTest).judge(model)
+    statistics = score.related_data['neuron_statistics']
+    assert statistics.mtypes == tuple(sorted(prediction))
+    np.testing.assert_array_equal(statistics.n_neurons, 5)
+    assert np.all(np.isfinite(statistics.std))
+    assert np.isfinite(score.score)
+
+    # a model of the other prediction mode does not have the required capability
+    mtype_model = CA1_laminar_distribution_synapses(name='model', CA1_laminar_distribution_synapses_model=prediction)
+    assert isinstance(make_test(observation, tmp_path, NeuronTest).judge(mtype_model), sciunit.scores.NAScore)
+    with pytest.raises(sciunit.errors.CapabilityError):
+        make_test(observation, tmp_path).judge(model, deep_error=True)
@@ -0,0 +1,46 @@
+import numpy as np
+
+from HippoNetworkUnit import scores
+from HippoNetworkUnit.scores import divergence, montecarlo
+
+OBSERVATION = np.array([[0.1, 0.4, 0.3, 0.15, 0.05],
+                        [0.2, 0.2, 0.2, 0.2, 0.2],
+                        [0.05, 0.05, 0.5, 0.3, 0.1],
+                        [0.3, 0.3, 0.2, 0.1, 0.1]])
+PREDICTION = np.array([[0.15, 0.35, 0.3, 0.1, 0.1],
+                       [0.1, 0.3, 0.3, 0.2, 0.1],
+                       [0.1, 0.1, 0.4, 0.3, 0.1],
+                       [0.25, 0.35, 0.2, 0.1, 0.1]])
+OPTIONS = dict(n_counts=40, seed=7, block_size=500, blocks_per_round=4, max_samples=20000)
+
+
+def pvalues(rows, terms_list=(divergence.TERMS['PearsonChiSquaredScore'],), **options):
+    mask = np.ones(OBSERVATION[rows].shape, dtype=bool)
+    return montecarlo.montecarlo_pvalues(list(terms_list), OBSERVATION[rows], PREDICTION[rows], mask,
+                                         **dict(OPTIONS, **options))
+
+
+def test_pvalues_do_not_depend_on_the_batch():
+    batch = pvalues([0, 1, 2, 3])[0]
+    np.testing.assert_array_equal(pvalues([0])[0], batch[[0]])
+    np.testing.assert_array_equal(pvalues([2, 0])[0], batch[[2, 0]])
+    # nor on the other statistics computed on the same samples
+    both = pvalues([0, 1, 2, 3], (divergence.TERMS['Log_LikelihoodRatioScore'],
+                                  divergence.TERMS['PearsonChiSquaredScore']))
+    np.testing.assert_array_equal(both[1], batch)
+
+
+def test_pvalues_do_not_depend_on_the_workers():
+    np.testing.assert_array_equal(pvalues([0, 1, 2, 3], n_workers=1), pvalues([0, 1, 2, 3], n_workers=3))
+
+
+def test_pvalues_depend_on_the_seed():
+    assert not np.array_equal(pvalues([0, 1, 2, 3], seed=7), pvalues([0, 1, 2, 3], seed=8))
+
+
+def test_compute_matches_compute_batch():
+    batch = scores.PearsonChiSquaredScore.compute_batch(OBSERVATION, PREDICTION, 'montecarlo', **OPTIONS)
+    for i in range(len(OBSERVATION)):
+        score = scores.PearsonChiSquaredScore.compute(OBSERVATION[i].copy(), PREDICTION[i].copy(),
+                                                      'montecarlo', **OPTIONS)
+        assert score.score.pvalue == batch.pvalue[i]
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from HippoNetworkUnit import morphology
+
+# soma at the origin, an axon rising through SO, SP and SR with a branch in SO, and a dendrite
+# below the soma; the rows are not in the order of the ids
+SWC = b"""# tiny morphology
+1 1 0 0 0 5 -1
+2 2 0 0 5 1 1
+5 2 10 0 5 1 2  # branch
+3 2 0 0 25 1 2
+4 3 0 0 -10 1 1
+"""
+
+
+class SlabClassifier(object):
+    """ Layers of 10 um along z from z = 0: SO, SP, SR, SLM, then OUT """
+
+    layers = ('SO', 'SP', 'SR', 'SLM', 'OUT')
+
+    def classify(self, points):
+        codes = np.floor(np.asarray(points)[:, 2] / 10.0).astype(int)
+        return np.where((codes >= 0) & (codes < 4), codes, 4)
+
+
+@pytest.fixture
+def swc_path(tmp_path):
+    path = tmp_path / 'tiny.swc'
+    path.write_bytes(SWC)
+    return str(path)
+
+
+def test_read_swc(swc_path):
+    neuron = morphology.read_swc(swc_path)
+    np.testing.assert_array_equal(neuron.ids, [1, 2, 5, 3, 4])
+    np.testing.assert_array_equal(neuron.types, [1, 2, 2, 2, 3])
+    np.testing.assert_array_equal(neuron.parents, [-1, 0, 1, 1, 0])
+    np.testing.assert_array_equal(neuron.points[2], [10, 0, 5])
+    np.testing.assert_array_equal(neuron.radii, [5, 1, 1, 1, 1])
+    np.testing.assert_array_equal(morphology.segment_lengths(neuron), [0, 5, 10, 20, 10])
+
+
+@pytest.mark.parametrize('content, message', [(SWC.replace(b'3 2 0 0 25 1 2', b'3 2 0 0 25 1 7'), 'unknown parent 7'),
+                                              (SWC + b'6 2 0 0\n', '7 columns')])
+def test_read_invalid_swc(tmp_path, content, message):
+    path = tmp_path / 'invalid.swc'
+    path.write_bytes(content)
+    with pytest.raises(ValueError, match=message):
+        morphology.read_swc(str(path))
+
+
+def test_layer_lengths(swc_path):
+    neuron = morphology.read_swc(swc_path)
+    classifier = SlabClassifier()
+    # pieces of 5 um: the midpoints of the rising axon at z = 2.5, 7.5, 12.5, 17.5 and 22.5
+    np.testing.assert_allclose(morphology.layer_lengths(neuron, classifier), [20, 10, 5, 0, 0])
+    # a single piece from z = 5 to 25, whose midpoint is in SP
+    np.testing.assert_allclose(morphology.layer_lengths(neuron, classifier, resolution=20.0), [15, 20, 0, 0, 0])
+    np.testing.assert_allclose(morphology.layer_lengths(neuron, classifier, types=(morphology.BASAL_DENDRITE,)),
+                               [0, 0, 0, 0, 10])
+    np.testing.assert_allclose(morphology.bouton_counts(neuron, classifier, bouton_density=0.5), [10, 5, 2.5, 0, 0])
+
+
+def test_morphology_model(tmp_path):
+    for mtype, name in (('PC', 'a'), ('PC', 'b'), ('BS', 'c')):
+        (tmp_path / mtype).mkdir(exist_ok=True)
+        (tmp_path / mtype / (name + '.swc')).write_bytes(SWC)
+    paths, mtypes, counts = morphology.count_boutons(str(tmp_path), SlabClassifier(), n_workers=1)
+    assert mtypes == ['BS', 'PC', 'PC']
+    np.testing.assert_allclose(counts, [[4, 2, 1, 0, 0]] * 3)
+    np.testing.assert_array_equal(morphology.count_boutons(str(tmp_path), SlabClassifier(), n_workers=2)[2], counts)
+
+    model = morphology.morphology_model(str(tmp_path), SlabClassifier(), name='tiny', n_workers=1)
+    prediction = model.get_CA1_laminar_distribution_synapses_info()
+    assert sorted(prediction) == ['BS', 'PC']
+    np.testing.assert_allclose([prediction['PC'][layer]['value'] for layer in SlabClassifier.layers],
+                               [4 / 7.0, 2 / 7.0, 1 / 7.0, 0, 0])
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from HippoNetworkUnit.neurons import aggregate_neurons
+
+LAYERS = ('SO', 'SP', 'OUT')
+COUNTS = [[1, 3, 0],
+          [0, 0, 0],
+          [3, 1, 0],
+          [2, 2, 4]]
+
+
+def test_aggregate_neurons_by_name():
+    table, statistics = aggregate_neurons(COUNTS, ['PC', 'PC', 'PC', 'BS'], LAYERS)
+    # the m-types in sorted order; the fractions of the synapses of all the neurons of each m-type
+    assert table.mtypes == ('BS', 'PC') and table.layers == LAYERS
+    np.testing.assert_allclose(table.values, [[0.25, 0.25, 0.5], [0.5, 0.5, 0.0]])
+    # the neuron without synapses is left out of the statistics
+    np.testing.assert_array_equal(statistics.n_neurons, [1, 2])
+    np.testing.assert_array_equal(statistics.counts, [[2, 2, 4], [4, 4, 0]])
+    np.testing.assert_allclose(statistics.mean, [[0.25, 0.25, 0.5], [0.5, 0.5, 0.0]])
+    np.testing.assert_allclose(statistics.std[1], [np.std([0.25, 0.75], ddof=1)] * 2 + [0.0])
+    # NaN with less than 2 neurons
+    assert np.all(np.isnan(statistics.std[0]))
+
+
+def test_aggregate_neurons_by_code():
+    table, statistics = aggregate_neurons(COUNTS, [2, 2, 2, 0], LAYERS, mtype_names=['BS', 'OLM', 'PC'])
+    assert table.mtypes == ('BS', 'OLM', 'PC')
+    # an m-type without neurons has no fractions
+    assert np.all(np.isnan(table['OLM'])) and statistics.n_neurons[1] == 0
+    np.testing.assert_allclose(table['PC'], [0.5, 0.5, 0.0])
+    # the m-type names given in another order than the sorted one
+    table, _ = aggregate_neurons(COUNTS, ['PC', 'PC', 'PC', 'BS'], LAYERS, mtype_names=['PC', 'BS'])
+    np.testing.assert_allclose(table.values, [[0.5, 0.5, 0.0], [0.25, 0.25, 0.5]])
+
+
+@pytest.mark.parametrize('counts, mtypes, mtype_names', [
+    (np.ones((4, 2)), ['PC'] * 4, None),
+    (COUNTS, ['PC'] * 3, None),
+    (-np.ones((4, 3)), ['PC'] * 4, None),
+    (COUNTS, [0, 1, 2, 3], None),
+    (COUNTS, [0, 1, 2, 3], ['PC', 'BS']),
+    (COUNTS, ['PC', 'PC', 'PC', 'BS'], ['PC']),
+])
+def test_aggregate_neurons_invalid(counts, mtypes, mtype_names):
+    with pytest.raises(ValueError):
+        aggregate_neurons(counts, mtypes, LAYERS, mtype_names)
@@ -0,0 +1,51 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from HippoNetworkUnit.predictions import PredictionError, read_predictions, iter_models
+
+PREDICTION = {'PC': {'SO': {'value': '0.1'}, 'SP': {'value': '0.9'}}}
+
+
+@pytest.fixture
+def predictions_file(tmp_path):
+    path = tmp_path / 'predictions.jsonl'
+    path.write_text('\n'.join([
+        json.dumps({'name': 'first', 'prediction': PREDICTION}),
+        '',
+        '{"name": "truncated", "prediction": {"PC": ',
+        json.dumps(PREDICTION),
+        json.dumps([1, 2]),
+        json.dumps({'prediction': {'PC': {'SO': {'value': '2.0'}}}}),
+    ]) + '\n')
+    return str(path)
+
+
+def test_read_predictions_reports_the_malformed_line(predictions_file):
+    records = read_predictions(predictions_file)
+    name, table = next(records)
+    assert name == 'first'
+    np.testing.assert_array_equal(table['PC'], [0.1, 0.9, 0.0])
+    # the blank line 2 is ignored, the invalid JSON of line 3 is reported
+    with pytest.raises(PredictionError) as error:
+        next(records)
+    assert error.value.line == 3 and error.value.source == predictions_file
+    assert str(error.value).startswith('%s, line 3: ' % predictions_file)
+
+
+def test_read_predictions_skips_the_malformed_lines(predictions_file):
+    with pytest.warns(UserWarning) as warnings:
+        names = [name for name, table in read_predictions(predictions_file, errors='skip')]
+    assert names == ['first', 'model_4']
+    assert [str(warning.message).split(':')[0] for warning in warnings] == \
+        ['%s, line %d' % (predictions_file, line) for line in (3, 5, 6)]
+
+
+def test_iter_models_from_a_file_object():
+    source = io.BytesIO((json.dumps(PREDICTION) + '\n').encode())
+    models = list(iter_models(source, layers=('SO', 'SP', 'SR', 'SLM', 'OUT'), name='mine_%d'))
+    assert [model.name for model in models] == ['mine_1']
+    with pytest.raises(ValueError):
+        list(read_predictions(source, errors='ignore'))
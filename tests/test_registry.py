@@ -0,0 +1,56 @@
+import sys
+
+import pytest
+
+from HippoNetworkUnit import registry, scores
+
+
+@pytest.fixture
+def plugin(tmp_path, monkeypatch):
+    """ An installed distribution with an entry point of a score, whose module is not imported """
+
+    (tmp_path / 'hnu_plugin_scores.py').write_text("class MyScore(object):\n    pass\n")
+    dist_info = tmp_path / 'hnu_plugin-1.0.dist-info'
+    dist_info.mkdir()
+    (dist_info / 'METADATA').write_text("Metadata-Version: 2.1\nName: hnu-plugin\nVersion: 1.0\n")
+    (dist_info / 'entry_points.txt').write_text(
+        "[HippoNetworkUnit.scores]\n"
+        "MyScore = hnu_plugin_scores:MyScore\n"
+        "PearsonChiSquaredScore = hnu_plugin_scores:MyScore\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    # the index and the resolved components are rebuilt, and restored after the test
+    monkeypatch.setattr(registry, '_index', dict())
+    monkeypatch.setitem(registry._resolved, 'scores', dict())
+    monkeypatch.setitem(registry._registered, 'scores', dict())
+    yield
+    sys.modules.pop('hnu_plugin_scores', None)
+
+
+def test_resolve_builtin():
+    from HippoNetworkUnit.scores.score_Pearson_ChiSquared import PearsonChiSquaredScore
+    assert registry.resolve('scores', 'PearsonChiSquaredScore') is PearsonChiSquaredScore
+    assert scores.PearsonChiSquaredScore is PearsonChiSquaredScore
+    assert 'CA1_laminar_distribution_synapses_PearsonTest' in registry.names('tests')
+
+
+def test_resolve_entry_point(plugin):
+    assert 'MyScore' in registry.names('scores')
+    # the entry points are read, but their modules are only imported when resolved
+    assert 'hnu_plugin_scores' not in sys.modules
+    my_score = registry.resolve('scores', 'MyScore')
+    assert my_score.__module__ == 'hnu_plugin_scores' and my_score.__name__ == 'MyScore'
+    # entry points cannot replace the built-in components
+    assert registry.resolve('scores', 'PearsonChiSquaredScore').__module__ == \
+        'HippoNetworkUnit.scores.score_Pearson_ChiSquared'
+
+
+def test_register_and_unknown(plugin):
+    registry.register('scores', 'OrderedScore', 'collections:OrderedDict')
+    from collections import OrderedDict
+    assert registry.resolve('scores', 'OrderedScore') is OrderedDict
+    with pytest.raises(KeyError):
+        registry.resolve('scores', 'NoSuchScore')
+    with pytest.raises(ValueError):
+        registry.register('scores', 'BadScore', 'collections.OrderedDict')
+    with pytest.raises(ValueError):
+        registry.resolve('models', 'PearsonChiSquaredScore')
@@ -0,0 +1,54 @@
+import copy
+
+import numpy as np
+
+from HippoNetworkUnit import tests
+from HippoNetworkUnit.sweep import sweep, collect_scores, write_summary
+
+
+def make_test(observation, tmp_path):
+    test = tests.CA1_laminar_distribution_synapses_PearsonTest(observation=observation)
+    test.figures_mode = 'none'
+    test.result_store = None
+    test.verbose = 0
+    test.directory_output = str(tmp_path)
+    return test
+
+
+def make_predictions(prediction, n_models):
+    """ Predictions with their OUT fraction moved to the other layers in different amounts """
+
+    predictions = []
+    for i in range(n_models):
+        model = copy.deepcopy(prediction)
+        for layers in model.values():
+            shift = float(layers['OUT']['value']) * i / n_models
+            layers['OUT']['value'] = str(float(layers['OUT']['value']) - shift)
+            layers['SR']['value'] = str(float(layers['SR']['value']) + shift)
+        predictions.append(model)
+    return predictions
+
+
+def test_sweep_does_not_depend_on_the_workers(observation, prediction, tmp_path):
+    predictions = make_predictions(prediction, 6)
+    predictions.insert(3, {'PC': {'SO': {'value': 'not a number'}}})
+    serial = sorted(sweep(make_test(observation, tmp_path), predictions, n_workers=1), key=lambda result: result.index)
+    parallel = sorted(sweep(make_test(observation, tmp_path), predictions, n_workers=2, chunk_size=2),
+                      key=lambda result: result.index)
+
+    assert [result.index for result in parallel] == list(range(7))
+    assert [result.model_name for result in parallel] == [result.model_name for result in serial]
+    # the errors of a model are reported, and do not stop the sweep
+    assert [result.error is not None for result in parallel] == [i == 3 for i in range(7)]
+    assert [result.error is not None for result in serial] == [i == 3 for i in range(7)]
+    for a, b in zip(serial, parallel):
+        if a.error is None:
+            assert float(a.score) == float(b.score)
+            np.testing.assert_array_equal(a.scores_cell['PearsonChiSquaredScore'].values,
+                                          b.scores_cell['PearsonChiSquaredScore'].values)
+
+    model_names, mtypes, values = collect_scores(parallel)['PearsonChiSquaredScore']
+    assert model_names == ['model_%d' % i for i in range(7) if i != 3]
+    assert values.shape == (6, len(mtypes)) and np.all(np.isfinite(values))
+    assert write_summary(parallel, str(tmp_path / 'summary.png')) == str(tmp_path / 'summary.png')
+    assert (tmp_path / 'summary.png').stat().st_size > 0
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from HippoNetworkUnit.synapses import count_synapses
+
+h5py = pytest.importorskip('h5py')
+
+MTYPES = ['PC', 'PVBC', 'OLM']
+LAYERS = ['SO', 'SP', 'SR', 'SLM']
+
+
+@pytest.mark.parametrize('encoding, mtype_names', [('utf-8', MTYPES + ['Ivy\u03b1']), ('ascii', MTYPES), (None, MTYPES)])
+def test_count_synapses_hdf5_strings(tmp_path, encoding, mtype_names):
+    # variable-length strings of the given encoding (read as object arrays of bytes), or fixed-length bytes
+    mtypes = ['PC', 'OLM', 'PC', 'PVBC', 'OLM', 'PC', mtype_names[-1]]
+    layers = ['SR', 'SLM', 'SR', 'SP', 'SO', 'SP', 'SO']
+    path = str(tmp_path / 'synapses.h5')
+    with h5py.File(path, 'w') as file_:
+        group = file_.create_group('synapses')
+        for name, column in (('mtype', mtypes), ('layer', layers)):
+            if encoding is None:
+                group.create_dataset(name, data=np.array([value.encode('utf-8') for value in column]))
+            else:
+                group.create_dataset(name, data=np.array(column, dtype=object), dtype=h5py.string_dtype(encoding))
+
+    expected = np.zeros((len(mtype_names), len(LAYERS)), dtype=np.int64)
+    for mtype, layer in zip(mtypes, layers):
+        expected[mtype_names.index(mtype), LAYERS.index(layer)] += 1
+    counts = count_synapses(path, mtype_names, LAYERS, group='synapses', chunk_size=4)
+    np.testing.assert_array_equal(counts, expected)
+
+
+def test_count_synapses_unknown_name(tmp_path):
+    path = str(tmp_path / 'synapses.h5')
+    with h5py.File(path, 'w') as file_:
+        file_.create_dataset('mtype', data=np.array(['PC', 'BC'], dtype=object), dtype=h5py.string_dtype())
+        file_.create_dataset('layer', data=np.array(['SO', 'SP'], dtype=object), dtype=h5py.string_dtype())
+    with pytest.raises(ValueError, match="Unknown m-type 'BC'"):
+        count_synapses(path, MTYPES, LAYERS)
@@ -0,0 +1,51 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from HippoNetworkUnit.table import LaminarDistributionTable, LAYERS
+
+
+def test_from_dict_aligns_the_layers_by_name():
+    table = LaminarDistributionTable.from_dict({
+        'PC': {'SO': {'mean': '0.1'}, 'SP': {'mean': '0.2'}, 'SR': {'mean': '0.3'}, 'SLM': {'mean': '0.4'}},
+        # other order, without SLM, and an "out" layer
+        'OLM': {'SR': {'value': 0.5}, 'out': {'value': 0.1}, 'SO': {'value': 0.4}},
+    })
+    assert table.mtypes == ('PC', 'OLM')
+    # the layers found, in order, with OUT last
+    assert table.layers == ('SO', 'SP', 'SR', 'SLM', 'OUT')
+    np.testing.assert_array_equal(table['PC'], [0.1, 0.2, 0.3, 0.4, 0.0])
+    # the missing OUT is 0.0, other missing layers are NaN
+    np.testing.assert_array_equal(table['OLM'], [0.4, np.nan, 0.5, np.nan, 0.1])
+
+
+def test_from_dict_with_given_layers():
+    data = {'PC': {'SP': {'mean': 0.5}, 'SO': {'mean': 0.5}}, 'BS': {'SP': {'mean': 0.25}, 'SO': {'mean': 0.75}}}
+    table = LaminarDistributionTable.from_dict(data, layers=LAYERS)
+    assert table.layers == LAYERS
+    np.testing.assert_array_equal(table.values, [[0.5, 0.5, np.nan, np.nan, 0.0], [0.75, 0.25, np.nan, np.nan, 0.0]])
+    with pytest.raises(ValueError, match='Unknown layer'):
+        LaminarDistributionTable.from_dict(data, layers=('SO',))
+
+
+def test_select_and_round_trips():
+    table = LaminarDistributionTable(np.arange(10).reshape(2, 5) / 10.0, ['PC', 'BS'])
+    selected = table.select(['BS', 'PC'], ['OUT', 'SO'])
+    np.testing.assert_array_equal(selected.values, [[0.9, 0.5], [0.4, 0.0]])
+    assert table.select() is table
+    with pytest.raises(KeyError):
+        table.select(['AA'])
+
+    assert LaminarDistributionTable.from_dict(table.to_dict()) == table
+    assert pickle.loads(pickle.dumps(table)) == table
+    assert not table.values.flags.writeable
+
+
+def test_invalid_tables():
+    with pytest.raises(ValueError, match='shape'):
+        LaminarDistributionTable(np.zeros((2, 4)), ['PC', 'BS'])
+    with pytest.raises(ValueError, match='unique'):
+        LaminarDistributionTable(np.zeros((2, 5)), ['PC', 'PC'])
+    with pytest.raises(ValueError, match='larger than 1.0'):
+        LaminarDistributionTable(np.full((1, 5), 1.5), ['PC'])